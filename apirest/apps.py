@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApirestConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apirest'
+
+    def ready(self):
+        from apirest import signals  # noqa: F401
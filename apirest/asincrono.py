@@ -0,0 +1,159 @@
+"""
+Lecturas de la API como vistas async para el punto de entrada ASGI.
+
+Cada vista reutiliza el ViewSet correspondiente (filtros de `get_queryset`,
+serializers y paginación) y solo cambia la forma de ejecutar las consultas:
+listados, detalles y compras usan el ORM async (`acount`, `aget`, `async for`).
+Las estadísticas ejecutan la acción sync del ViewSet con `sync_to_async`, que
+es también lo que hace el ORM async por dentro, ya que mysqlclient no tiene
+driver async.
+
+Bajo ASGI, Django da a cada request su propio hilo para el código sync
+(`ThreadSensitiveContext`), así que una lectura lenta ocupa ese hilo pero no el
+event loop: un worker atiende muchas lecturas lentas a la vez. Bajo WSGI estas
+rutas funcionan igual, pero sin esa ventaja.
+
+Las respuestas son idénticas a las de las rutas sync (ver `apirest/urls.py`).
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404, HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .autenticacion import JWTAutenticacionCacheada
+from .condicional import coincide_etag
+from .pagination import VentaPagination
+from .serializers import VentaListSerializer
+from .views import ClienteViewSet, ProductoViewSet, VentaViewSet
+
+_autenticador = JWTAutenticacionCacheada()
+
+
+def _json(data, estado=status.HTTP_200_OK, headers=None):
+    respuesta = HttpResponse(JSONRenderer().render(data), status=estado, content_type='application/json')
+    for nombre, valor in (headers or {}).items():
+        respuesta[nombre] = valor
+    return respuesta
+
+
+async def _autenticar(request):
+    """Usuario por JWT (desde el caché de usuarios) o, si no hay token, por sesión."""
+    resultado = await sync_to_async(_autenticador.authenticate)(request)
+    if resultado is not None:
+        return resultado[0]
+    return await request.auser()
+
+
+async def _queryset(vista):
+    # get_queryset puede consultar (p. ej. el índice de búsqueda al reconstruirse)
+    return await sync_to_async(vista.get_queryset)()
+
+
+async def _listar(vista):
+    queryset = await _queryset(vista)
+    pagina = await vista.paginator.apaginate_queryset(queryset, vista.request, view=vista)
+    serializer = vista.get_serializer(pagina, many=True)
+    return vista.paginator.get_paginated_response(serializer.data).data
+
+
+async def _detalle(vista):
+    queryset = await _queryset(vista)
+    try:
+        obj = await queryset.aget(pk=vista.kwargs['pk'])
+    except (ObjectDoesNotExist, ValueError):
+        raise Http404
+    return vista.get_serializer(obj).data
+
+
+async def _estadisticas(vista):
+    respuesta = await sync_to_async(vista.estadisticas)(vista.request)
+    return respuesta.data
+
+
+async def _compras(vista):
+    queryset = await _queryset(vista)
+    pk = vista.kwargs['pk']
+    if not await queryset.filter(pk=pk).aexists():
+        raise Http404
+    ventas = vista.get_compras(pk)
+    paginator = VentaPagination()
+    if paginator.usa_cursor(vista.request):
+        pagina = await paginator.apaginate_queryset(ventas, vista.request, view=vista)
+        return paginator.get_paginated_response(VentaListSerializer(pagina, many=True).data).data
+    return VentaListSerializer([venta async for venta in ventas], many=True).data
+
+
+ACCIONES = {
+    'list': _listar,
+    'retrieve': _detalle,
+    'estadisticas': _estadisticas,
+    'compras': _compras,
+}
+
+
+def vista_async(viewset, accion):
+    """Vista async de solo lectura para `accion` de `viewset`."""
+    manejador = ACCIONES[accion]
+
+    async def vista(request, pk=None):
+        kwargs = {'pk': pk} if pk is not None else {}
+        instancia = viewset(args=(), kwargs=kwargs, action=accion, format_kwarg=None)
+        try:
+            if request.method not in ('GET', 'HEAD'):
+                raise exceptions.MethodNotAllowed(request.method)
+            drf_request = Request(request, authenticators=())
+            drf_request.user = await _autenticar(request)
+            drf_request.accepted_renderer = JSONRenderer()
+            drf_request.accepted_media_type = JSONRenderer.media_type
+            instancia.request = drf_request
+            try:
+                instancia.check_permissions(drf_request)
+            except exceptions.PermissionDenied:
+                # Como APIView.permission_denied: sin credenciales es 401, no 403
+                if not drf_request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                raise
+
+            etag = None
+            if accion in getattr(instancia, 'etag_acciones', ()):
+                etag = await sync_to_async(instancia.calcular_etag)(drf_request)
+                if coincide_etag(etag, request.headers.get('If-None-Match')):
+                    respuesta = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+                    respuesta['ETag'] = etag
+                    return respuesta
+
+            data = await manejador(instancia)
+            return _json(data, headers={'ETag': etag} if etag else None)
+        except Http404:
+            return _error(exceptions.NotFound())
+        except exceptions.APIException as exc:
+            return _error(exc)
+
+    vista.__name__ = f'{viewset.__name__}_{accion}_async'
+    vista.presupuesto_consultas = viewset.presupuesto_consultas[accion]
+    return vista
+
+
+def _error(exc):
+    # Igual que rest_framework.views.exception_handler
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    headers = {}
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        exc.status_code = status.HTTP_401_UNAUTHORIZED
+        headers['WWW-Authenticate'] = _autenticador.authenticate_header(None)
+    return _json(data, exc.status_code, headers)
+
+
+RUTAS = [
+    ('productos/', ProductoViewSet, 'list', 'productos-list'),
+    ('productos/estadisticas/', ProductoViewSet, 'estadisticas', 'productos-estadisticas'),
+    ('productos/<int:pk>/', ProductoViewSet, 'retrieve', 'productos-detail'),
+    ('ventas/', VentaViewSet, 'list', 'ventas-list'),
+    ('ventas/estadisticas/', VentaViewSet, 'estadisticas', 'ventas-estadisticas'),
+    ('ventas/<int:pk>/', VentaViewSet, 'retrieve', 'ventas-detail'),
+    ('clientes/', ClienteViewSet, 'list', 'clientes-list'),
+    ('clientes/<int:pk>/', ClienteViewSet, 'retrieve', 'clientes-detail'),
+    ('clientes/<int:pk>/compras/', ClienteViewSet, 'compras', 'clientes-compras'),
+]
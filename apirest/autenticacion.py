@@ -0,0 +1,153 @@
+"""
+Autenticación JWT sin consultar `auth_user` en cada request.
+
+`JWTAuthentication` de simplejwt carga el usuario desde la base de datos en
+cada llamada. `JWTAutenticacionCacheada` lo resuelve desde un LRU acotado en
+memoria del proceso y, opcionalmente, desde un caché compartido (un alias de
+`CACHES`, p. ej. Redis o Memcached). Las entradas se guardan bajo
+(id de usuario, versión) y la versión se incrementa cada vez que el usuario se
+guarda o se elimina (ver `apirest/signals.py`).
+
+Configuración (`settings.JWT_CACHE_USUARIOS`):
+
+- `MAXIMO`: entradas del LRU por proceso, y también usuarios cuya versión
+  local se recuerda (ver `CacheUsuarios.invalidar`).
+- `TTL`: segundos que vive una entrada. Sin caché compartido la invalidación
+  solo llega al proceso que guardó el usuario: los demás pueden seguir
+  aceptando sus tokens (desactivado, eliminado o con otra contraseña) hasta
+  `TTL` segundos después.
+- `CACHE`: alias del caché compartido, o None para usar solo el LRU. Con caché
+  compartido la versión vive ahí y la invalidación llega a todos los procesos
+  de inmediato, a cambio de una lectura del caché por request.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from pc_shop.metricas import registrar_cache
+
+CONFIGURACION = {'MAXIMO': 10000, 'TTL': 60, 'CACHE': None}
+
+
+def configuracion():
+    return {**CONFIGURACION, **getattr(settings, 'JWT_CACHE_USUARIOS', {})}
+
+
+class CacheUsuarios:
+    """LRU de usuarios por (id, versión), con caché compartido opcional."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        # Sin caché compartido: versión local por usuario invalidado, de un contador del proceso
+        self._versiones = OrderedDict()
+        self._contador = 0
+        # La mayor versión descartada del LRU de versiones: la de los usuarios que no están en él
+        self._piso = 0
+
+    def _compartido(self):
+        alias = configuracion()['CACHE']
+        return caches[alias] if alias else None
+
+    def version(self, user_id):
+        compartido = self._compartido()
+        if compartido is not None:
+            return compartido.get(f'auth:usuario:{user_id}:version', 0)
+        with self._lock:
+            return self._versiones.get(user_id, self._piso)
+
+    def obtener(self, user_id, cargar):
+        """Usuario `user_id` desde el LRU, el caché compartido o `cargar()`.
+
+        La versión se lee antes de cargar: si el usuario cambia mientras tanto,
+        lo cargado queda bajo la versión anterior y no se vuelve a usar.
+        """
+        config = configuracion()
+        version = self.version(user_id)
+        clave = (user_id, version)
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[1] > ahora:
+                self._entradas.move_to_end(clave)
+                registrar_cache('usuarios_jwt', True)
+                return copy.copy(entrada[0])
+        registrar_cache('usuarios_jwt', False)
+
+        compartido = self._compartido()
+        clave_compartida = f'auth:usuario:{user_id}:{version}'
+        user = compartido.get(clave_compartida) if compartido is not None else None
+        if user is None:
+            user = cargar()
+            if compartido is not None:
+                compartido.set(clave_compartida, user, config['TTL'])
+
+        with self._lock:
+            self._entradas[clave] = (user, ahora + config['TTL'])
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > config['MAXIMO']:
+                self._entradas.popitem(last=False)
+        # Cada request recibe su propia copia: las vistas pueden modificarla
+        return copy.copy(user)
+
+    def invalidar(self, user_id):
+        compartido = self._compartido()
+        if compartido is not None:
+            clave = f'auth:usuario:{user_id}:version'
+            try:
+                compartido.incr(clave)
+            except ValueError:
+                compartido.add(clave, 1, timeout=None)
+        with self._lock:
+            # Una versión nueva para que una carga en curso quede bajo la anterior
+            self._contador += 1
+            self._versiones[user_id] = self._contador
+            self._versiones.move_to_end(user_id)
+            while len(self._versiones) > configuracion()['MAXIMO']:
+                # Sube el piso: nada guardado bajo una versión anterior vuelve a coincidir
+                _, descartada = self._versiones.popitem(last=False)
+                self._piso = max(self._piso, descartada)
+            for clave in [c for c in self._entradas if c[0] == user_id]:
+                del self._entradas[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+usuarios = CacheUsuarios()
+
+
+class JWTAutenticacionCacheada(JWTAuthentication):
+    """`JWTAuthentication` que resuelve el usuario desde `usuarios` (ver arriba)."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        def cargar():
+            try:
+                return self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        user = usuarios.obtener(user_id, cargar)
+
+        # Mismas verificaciones y mensajes (traducidos por simplejwt) que JWTAuthentication.get_user
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
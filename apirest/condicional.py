@@ -0,0 +1,70 @@
+"""
+GET condicional (ETag / If-None-Match) para los endpoints del catálogo.
+
+El ETag se deriva de las versiones de las tablas del catálogo
+(`inventario/versiones.py`) y de la URL pedida, así que se calcula con una
+sola consulta por clave primaria. Si coincide con el If-None-Match del
+cliente se responde 304 antes de ejecutar la consulta del listado o los
+serializers.
+"""
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from inventario.versiones import TABLAS_CATALOGO, firma
+
+
+class _NoModificado(Exception):
+    pass
+
+
+def coincide_etag(etag, if_none_match):
+    if not if_none_match:
+        return False
+    candidatos = parse_etags(if_none_match)
+    if '*' in candidatos:
+        return True
+    # Comparación débil (RFC 9110 §13.1.2): se ignora el prefijo W/
+    valor = etag.removeprefix('W/')
+    return any(c.removeprefix('W/') == valor for c in candidatos)
+
+
+class ETagMixin:
+    """Agrega ETag a las acciones de lectura y responde 304 cuando no hubo cambios.
+
+    El ETag depende de todas las tablas de `etag_tablas`: los listados de
+    productos incluyen nombres de marca/proveedor/categoría y los de marcas,
+    proveedores y categorías incluyen conteos de productos.
+    """
+    etag_acciones = ('list', 'retrieve', 'productos')
+    etag_tablas = TABLAS_CATALOGO
+
+    def calcular_etag(self, request):
+        partes = (
+            firma(self.etag_tablas),
+            request.build_absolute_uri(),
+            request.accepted_media_type or '',
+        )
+        return '"%s"' % hashlib.sha1('|'.join(partes).encode()).hexdigest()
+
+    def initial(self, request, *args, **kwargs):
+        # Autenticación, permisos y negociación de contenido van primero
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method in ('GET', 'HEAD') and self.action in self.etag_acciones:
+            self.etag = self.calcular_etag(request)
+            if coincide_etag(self.etag, request.headers.get('If-None-Match')):
+                raise _NoModificado
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _NoModificado):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'etag', None) and response.status_code in (200, 304):
+            response['ETag'] = self.etag
+        return response
@@ -0,0 +1,168 @@
+import asyncio
+import io
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not valores:
+        return None
+    return valores[max(0, math.ceil(len(valores) * p / 100) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara lecturas concurrentes de la API por WSGI (hilos de worker) y por ASGI '
+        '(rutas sync y async) contra la base configurada, con latencia opcional por consulta '
+        'para simular un MySQL lento. Ej: benchmark_async --ruta productos/ --latencia-ms 50'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', required=True, help='Usuario con el que se firma el token JWT')
+        parser.add_argument('--ruta', default='productos/', help="Ruta bajo /apirest/ (default: productos/)")
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones por modo (default: 200)')
+        parser.add_argument('--concurrencia', type=int, default=50, help='Peticiones simultáneas (default: 50)')
+        parser.add_argument('--hilos-wsgi', type=int, default=4,
+                            help='Hilos del worker WSGI, como --threads de gunicorn (default: 4)')
+        parser.add_argument('--latencia-ms', type=float, default=0,
+                            help='Demora agregada a cada consulta SQL (default: 0)')
+        parser.add_argument('--json', action='store_true', help='Imprime el resultado como JSON')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f'No existe el usuario {options["usuario"]}')
+        self.token = str(RefreshToken.for_user(user).access_token)
+        if options['latencia_ms']:
+            self.simular_latencia(options['latencia_ms'] / 1000)
+
+        ruta = options['ruta'].lstrip('/')
+        n = options['peticiones']
+        modos = [
+            ('wsgi', f'/apirest/{ruta}', lambda url: self.wsgi(url, n, options['hilos_wsgi'])),
+            ('asgi-sync', f'/apirest/{ruta}', lambda url: self.asgi(url, n, options['concurrencia'])),
+            ('asgi-async', f'/apirest/async/{ruta}', lambda url: self.asgi(url, n, options['concurrencia'])),
+        ]
+        resultados = {}
+        for nombre, url, ejecutar in modos:
+            self.stderr.write(f'{nombre}: {n} peticiones a {url} ...')
+            resultados[nombre] = self.resumir(*ejecutar(url))
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados, indent=2))
+            return
+        self.stdout.write(f'{"modo":<12}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"errores":>9}')
+        for nombre, r in resultados.items():
+            self.stdout.write(
+                f'{nombre:<12}{r["req_s"]:>9.1f}{r["p50_ms"]:>9.1f}{r["p95_ms"]:>9.1f}'
+                f'{r["p99_ms"]:>9.1f}{r["errores"]:>9}'
+            )
+
+    def simular_latencia(self, segundos):
+        def demora(execute, sql, params, many, context):
+            time.sleep(segundos)
+            return execute(sql, params, many, context)
+
+        def instalar(sender, connection, **kwargs):
+            if demora not in connection.execute_wrappers:
+                connection.execute_wrappers.append(demora)
+
+        # Cada hilo abre su propia conexión: la señal cubre las que se creen después
+        connection_created.connect(instalar, weak=False)
+        for conexion in connections.all(initialized_only=True):
+            instalar(None, conexion)
+
+    def resumir(self, duraciones, estados, segundos):
+        duraciones = sorted(duraciones)
+        return {
+            'peticiones': len(duraciones),
+            'segundos': round(segundos, 3),
+            'req_s': len(duraciones) / segundos if segundos else 0,
+            'p50_ms': percentil(duraciones, 50) * 1000,
+            'p95_ms': percentil(duraciones, 95) * 1000,
+            'p99_ms': percentil(duraciones, 99) * 1000,
+            'errores': sum(1 for estado in estados if estado >= 400),
+        }
+
+    # ----- WSGI: un worker con N hilos -----
+
+    def wsgi(self, url, n, hilos):
+        aplicacion = get_wsgi_application()
+        partes = urlsplit(url)
+
+        def una():
+            environ = {
+                'PATH_INFO': partes.path,
+                'QUERY_STRING': partes.query,
+                'HTTP_AUTHORIZATION': f'Bearer {self.token}',
+                'wsgi.input': io.BytesIO(),
+            }
+            setup_testing_defaults(environ)
+            estado = []
+            inicio = time.perf_counter()
+            respuesta = aplicacion(environ, lambda status, headers, exc_info=None: estado.append(status))
+            b''.join(respuesta)
+            respuesta.close()
+            return time.perf_counter() - inicio, int(estado[0].split()[0])
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            resultados = list(pool.map(lambda _: una(), range(n)))
+        return [d for d, _ in resultados], [e for _, e in resultados], time.perf_counter() - inicio
+
+    # ----- ASGI: un event loop, N peticiones simultáneas -----
+
+    def asgi(self, url, n, concurrencia):
+        return asyncio.run(self._asgi(url, n, concurrencia))
+
+    async def _asgi(self, url, n, concurrencia):
+        aplicacion = get_asgi_application()
+        partes = urlsplit(url)
+        limite = asyncio.Semaphore(concurrencia)
+
+        async def una():
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'root_path': '',
+                'path': partes.path, 'raw_path': partes.path.encode(),
+                'query_string': partes.query.encode(),
+                'headers': [(b'host', b'127.0.0.1'), (b'authorization', f'Bearer {self.token}'.encode())],
+                'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80),
+            }
+            enviado = False
+            estado = []
+
+            async def receive():
+                nonlocal enviado
+                if not enviado:
+                    enviado = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # El cliente no se desconecta: Django cancela esta espera al terminar
+                await asyncio.Future()
+
+            async def send(mensaje):
+                if mensaje['type'] == 'http.response.start':
+                    estado.append(mensaje['status'])
+
+            async with limite:
+                inicio = time.perf_counter()
+                await aplicacion(scope, receive, send)
+                return time.perf_counter() - inicio, estado[0]
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(una() for _ in range(n)))
+        return [d for d, _ in resultados], [e for _, e in resultados], time.perf_counter() - inicio
@@ -0,0 +1,374 @@
+import json
+import platform
+import statistics
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apirest.management.commands.benchmark_async import percentil
+from inventario.models import Producto
+from ventas.models import Cliente, DetalleVenta, Venta
+
+# Parámetros de `generar_datos` por escala
+ESCALAS = {
+    'chica': {'ventas': 5000, 'clientes': 500, 'productos': 200, 'vendedores': 5},
+    'mediana': {'ventas': 200000, 'clientes': 20000, 'productos': 5000, 'vendedores': 20},
+    'grande': {'ventas': 1000000, 'clientes': 200000, 'productos': 50000, 'vendedores': 50},
+}
+
+# Vistas HTML medidas: listados y detalles de la app principal y de las apps divididas
+ESPACIOS_HTML = (None, 'inventario', 'ventas')
+PREFIJOS_HTML = ('lista_', 'detalle_')
+
+# Objeto usado en las rutas con <pk>, por basename del router o nombre de la vista HTML
+OBJETOS_HTML = {'detalle_producto': 'productos', 'detalle_venta': 'ventas', 'detalle_cliente': 'clientes'}
+
+# Variantes de query string por ruta (las async usan las de su ruta sync). Los
+# valores entre llaves se completan con los ids y fechas del set de datos.
+VARIANTES = {
+    'productos-list': [{}, {'search': 'prod'}, {'marca': '{marcas}'}, {'precio_min': 10000, 'precio_max': 50000}],
+    'clientes-list': [{}, {'search': 'cliente'}],
+    'ventas-list': [
+        {}, {'paginacion': 'cursor'}, {'cliente': '{clientes}'}, {'producto': '{productos}'},
+        {'fecha_desde': '{hace_30}', 'fecha_hasta': '{hoy}'},
+    ],
+    'ventas-estadisticas': [{}, {'fecha_desde': '{hace_30}'}, {'cliente': '{clientes}'}],
+    'ventas-serie': [
+        {'intervalo': 'mes'}, {'fecha_desde': '{hace_30}', 'fecha_hasta': '{hoy}'},
+        {'intervalo': 'hora', 'fecha_desde': '{hace_30}', 'fecha_hasta': '{hoy}'},
+        {'intervalo': 'semana', 'cliente': '{clientes}'},
+    ],
+    'ventas-ranking': [
+        {}, {'por': 'clientes', 'ventana': 'anio'},
+        {'por': 'vendedores', 'criterio': 'unidades', 'fecha_desde': '{hace_30}', 'fecha_hasta': '{hoy}'},
+    ],
+    # Sin filtro exportaría el libro completo
+    'ventas-exportar': [{'cliente': '{clientes}'}, {'cliente': '{clientes}', 'formato': 'ndjson', 'gzip': '1'}],
+    'clientes-compras': [{}, {'paginacion': 'cursor'}],
+    'lista_productos': [{}, {'page': 2}, {'buscar': 'prod'}],
+    'lista_ventas': [{}, {'page': 2}],
+    'lista_clientes': [{}, {'page': 2}],
+}
+
+
+def _escrituras():
+    """Rutas sin GET que se miden con POST: nombre -> función(contexto, n) que arma el cuerpo."""
+    return {
+        'token_obtain_pair': lambda ctx, n: {'username': ctx['usuario'].username, 'password': ctx['clave']},
+        'token_refresh': lambda ctx, n: {'refresh': ctx['refresh']},
+        'register': lambda ctx, n: {
+            'username': f'{ctx["prefijo"]}reg_{uuid.uuid4().hex[:10]}',
+            'password': 'Benchmark.123', 'password_confirm': 'Benchmark.123',
+        },
+        'ventas-bulk': lambda ctx, n: [
+            {'cliente': ctx['ids']['clientes'], 'producto': ctx['ids']['productos'], 'cantidad': 1}
+            for _ in range(50)
+        ],
+    }
+
+
+def _recorrer(patrones, espacio=None):
+    for patron in patrones:
+        if isinstance(patron, URLResolver):
+            anidado = ':'.join(filter(None, (espacio, patron.namespace))) or None
+            yield from _recorrer(patron.url_patterns, anidado if patron.namespace else espacio)
+        elif patron.name:
+            yield espacio, patron
+
+
+def _metodos(callback):
+    acciones = getattr(callback, 'actions', None)
+    if acciones:
+        return {metodo.upper() for metodo in acciones}
+    clase = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+    if clase is not None:
+        return {m.upper() for m in clase.http_method_names if hasattr(clase, m)} - {'HEAD', 'OPTIONS'}
+    return {'GET'}
+
+
+def _objeto(nombre):
+    nombre = OBJETOS_HTML.get(nombre, nombre.removeprefix('async-'))
+    for basename in ('detalle-ventas', 'productos', 'marcas', 'proveedores', 'categorias',
+                     'clientes', 'ventas', 'usuarios'):
+        if nombre.startswith(basename):
+            return basename
+    return None
+
+
+def rutas():
+    """(espacio, nombre, métodos, usa_pk) de cada ruta de apirest y de cada listado/detalle HTML."""
+    vistas = {}
+    for espacio, patron in _recorrer(get_resolver().url_patterns):
+        argumentos = set(patron.pattern.regex.groupindex)
+        if 'format' in argumentos or argumentos - {'pk'}:
+            continue
+        if espacio == 'api' or (espacio in ESPACIOS_HTML and patron.name.startswith(PREFIJOS_HTML)):
+            vistas.setdefault((espacio, patron.name), (_metodos(patron.callback), 'pk' in argumentos))
+    return [(espacio, nombre, metodos, pk) for (espacio, nombre), (metodos, pk) in vistas.items()]
+
+
+def comparar(actual, base, umbral=0.2, minimo_ms=1.0):
+    """Diferencias con la línea base: (clave, cambios, es_regresion) por escenario en ambos reportes.
+
+    Es regresión un p95 que sube más de `umbral` (y más de `minimo_ms`), o
+    cualquier aumento de consultas SQL, que no dependen del ruido de la máquina.
+    """
+    filas = []
+    for clave in sorted(actual.keys() & base.keys()):
+        a, b = actual[clave], base[clave]
+        cambios = {
+            'p95_ms': (b['p95_ms'], a['p95_ms']),
+            'consultas': (b['consultas'], a['consultas']),
+            'bytes': (b['bytes'], a['bytes']),
+        }
+        lento = a['p95_ms'] > b['p95_ms'] * (1 + umbral) and a['p95_ms'] - b['p95_ms'] > minimo_ms
+        filas.append((clave, cambios, lento or a['consultas'] > b['consultas']))
+    return filas
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide latencia (p50/p95/p99), consultas SQL y bytes de cada ruta de apirest y de cada listado '
+        'y detalle HTML, con datos generados a la escala pedida. Escribe un reporte JSON y lo compara '
+        'con una línea base. Ej: benchmark_endpoints --escala mediana --base benchmark_base.json'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', choices=ESCALAS, default='chica', help='Tamaño del set de datos (default: chica)')
+        parser.add_argument('--prefijo', default='ZZ_BENCH_', help='Prefijo de los datos generados (default: ZZ_BENCH_)')
+        parser.add_argument('--sin-generar', action='store_true',
+                            help='Usa los datos ya generados con --prefijo en lugar de crearlos')
+        parser.add_argument('--eliminar', action='store_true', help='Elimina los datos generados al terminar')
+        parser.add_argument('--procesos', type=int, default=1, help='Procesos para generar ventas (default: 1)')
+        parser.add_argument('--iteraciones', type=int, default=30, help='Peticiones medidas por escenario (default: 30)')
+        parser.add_argument('--calentamiento', type=int, default=3, help='Peticiones previas sin medir (default: 3)')
+        parser.add_argument('--filtro', help='Solo escenarios cuya clave contenga este texto')
+        parser.add_argument('--salida', default='benchmark.json', help='Reporte JSON (default: benchmark.json)')
+        parser.add_argument('--base', help='Reporte con el que comparar')
+        parser.add_argument('--umbral', type=float, default=0.2, help='Alza tolerada del p95 (default: 0.2 = 20%%)')
+        parser.add_argument('--minimo-ms', type=float, default=1.0,
+                            help='Alza mínima del p95 en ms para contar como regresión (default: 1.0)')
+        parser.add_argument('--estricto', action='store_true', help='Termina con error si hay regresiones')
+        parser.add_argument('--host', help='Encabezado Host (default: el primero de ALLOWED_HOSTS, o localhost)')
+
+    def handle(self, *args, **options):
+        self.prefijo = options['prefijo']
+        if not options['sin_generar']:
+            call_command(
+                'generar_datos', prefijo=self.prefijo, procesos=options['procesos'],
+                stdout=self.stderr, **ESCALAS[options['escala']]
+            )
+        try:
+            reporte = self.ejecutar(options)
+        finally:
+            if options['eliminar']:
+                call_command('generar_datos', prefijo=self.prefijo, eliminar=True, stdout=self.stderr)
+
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(f'Reporte: {options["salida"]}')
+
+        if options['base']:
+            try:
+                with open(options['base'], encoding='utf-8') as archivo:
+                    base = json.load(archivo)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'No se pudo leer la línea base {options["base"]}: {exc}')
+            regresiones = self.mostrar_comparacion(reporte, base, options)
+            if regresiones and options['estricto']:
+                raise CommandError(f'{regresiones} escenarios con regresión respecto de {options["base"]}')
+
+    # ----- preparación -----
+
+    def contexto(self):
+        productos = Producto.objects.filter(nombre__startswith=self.prefijo)
+        producto = productos.annotate(n=Count('ventas')).order_by('-n', 'id').first()
+        if producto is None:
+            raise CommandError(f'No hay datos con el prefijo {self.prefijo}; quita --sin-generar')
+        cliente = (
+            Cliente.objects.filter(nombre__startswith=self.prefijo)
+            .annotate(n=Count('compras')).order_by('-n', 'id').first()
+        )
+        usuario, _ = User.objects.get_or_create(
+            username=f'{self.prefijo}admin', defaults={'is_staff': True, 'is_superuser': True}
+        )
+        clave = uuid.uuid4().hex
+        usuario.set_password(clave)
+        usuario.save()
+        refresh = RefreshToken.for_user(usuario)
+        hoy = timezone.localdate()
+        # Los más vendidos: el peor caso de cada detalle
+        ids = {
+            'productos': producto.pk,
+            'marcas': producto.marca_id,
+            'proveedores': producto.proveedor_id,
+            'categorias': producto.categoria_id,
+            'clientes': cliente.pk,
+            'ventas': Venta.objects.filter(cliente=cliente).values_list('pk', flat=True).first(),
+            'detalle-ventas': DetalleVenta.objects.values_list('pk', flat=True).first(),
+            'usuarios': usuario.pk,
+        }
+        return {
+            'prefijo': self.prefijo,
+            'usuario': usuario,
+            'clave': clave,
+            'refresh': str(refresh),
+            'acceso': str(refresh.access_token),
+            'ids': ids,
+            'valores': {**ids, 'hoy': hoy.isoformat(), 'hace_30': (hoy - timedelta(days=30)).isoformat()},
+        }
+
+    def escenarios(self, ctx):
+        """(clave, método, url, cuerpo(n) o None, es_api); y las rutas omitidas con el motivo."""
+        escrituras = _escrituras()
+        lista, omitidas = [], []
+        for espacio, nombre, metodos, usa_pk in rutas():
+            ruta = f'{espacio}:{nombre}' if espacio else nombre
+            kwargs = {}
+            if usa_pk:
+                objeto = _objeto(nombre)
+                if ctx['ids'].get(objeto) is None:
+                    omitidas.append({'ruta': ruta, 'motivo': 'sin objetos para <pk>'})
+                    continue
+                kwargs['pk'] = ctx['ids'][objeto]
+            url = reverse(ruta, kwargs=kwargs)
+            if 'GET' in metodos:
+                for variante in VARIANTES.get(nombre.removeprefix('async-'), [{}]):
+                    params = {k: str(v).format(**ctx['valores']) for k, v in variante.items()}
+                    consulta = '&'.join(f'{k}={v}' for k, v in params.items())
+                    sufijo = f'?{consulta}' if consulta else ''
+                    lista.append((f'GET {ruta}{sufijo}', 'GET', url + sufijo, None, espacio == 'api'))
+            elif nombre in escrituras:
+                cuerpo = escrituras[nombre]
+                lista.append((f'POST {ruta}', 'POST', url, lambda n, c=cuerpo: c(ctx, n), espacio == 'api'))
+            else:
+                omitidas.append({'ruta': ruta, 'motivo': f'sin GET ({", ".join(sorted(metodos))})'})
+        return lista, omitidas
+
+    # ----- medición -----
+
+    def ejecutar(self, options):
+        ctx = self.contexto()
+        host = options['host'] or next(
+            (h.lstrip('.') for h in settings.ALLOWED_HOSTS if h not in ('*', '.')), 'localhost'
+        )
+        # Una vista rota cuenta como error 500 en su escenario, no corta la corrida
+        api = Client(raise_request_exception=False, HTTP_HOST=host, HTTP_AUTHORIZATION=f'Bearer {ctx["acceso"]}')
+        html = Client(raise_request_exception=False, HTTP_HOST=host)
+        html.force_login(ctx['usuario'])
+
+        escenarios, omitidas = self.escenarios(ctx)
+        if options['filtro']:
+            escenarios = [e for e in escenarios if options['filtro'] in e[0]]
+        resultados = {}
+        for clave, metodo, url, cuerpo, es_api in escenarios:
+            cliente = api if es_api else html
+            resultados[clave] = self.medir(cliente, metodo, url, cuerpo, options)
+            r = resultados[clave]
+            self.stdout.write(
+                f'{r["p50_ms"]:>8.1f}{r["p95_ms"]:>8.1f}{r["p99_ms"]:>8.1f} ms'
+                f'{r["consultas"]:>5} q{r["bytes"] / 1024:>9.1f} KB  {r["estado"]}  {clave}'
+            )
+
+        return {
+            'fecha': timezone.now().isoformat(),
+            'escala': options['escala'],
+            'datos': {
+                'productos': Producto.objects.filter(nombre__startswith=self.prefijo).count(),
+                'clientes': Cliente.objects.filter(nombre__startswith=self.prefijo).count(),
+                'ventas': Venta.objects.filter(cliente__nombre__startswith=self.prefijo).count(),
+            },
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base_de_datos': connection.vendor,
+                'maquina': platform.node(),
+            },
+            'iteraciones': options['iteraciones'],
+            'resultados': resultados,
+            'omitidas': omitidas,
+        }
+
+    def medir(self, cliente, metodo, url, cuerpo, options):
+        duraciones, consultas, estados = [], [], []
+        tamano = 0
+        for n in range(options['calentamiento'] + options['iteraciones']):
+            contador = [0]
+
+            def contar(execute, sql, params, many, context):
+                contador[0] += 1
+                return execute(sql, params, many, context)
+
+            with ExitStack() as pila:
+                for alias in connections:
+                    pila.enter_context(connections[alias].execute_wrapper(contar))
+                inicio = time.perf_counter()
+                if metodo == 'GET':
+                    respuesta = cliente.get(url)
+                else:
+                    respuesta = cliente.post(url, cuerpo(n), content_type='application/json')
+                # El streaming consulta mientras se consume
+                contenido = b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+                duracion = time.perf_counter() - inicio
+            if n == 0:
+                frio = duracion
+            if n < options['calentamiento']:
+                continue
+            duraciones.append(duracion)
+            consultas.append(contador[0])
+            estados.append(respuesta.status_code)
+            tamano = len(contenido)
+
+        duraciones.sort()
+        return {
+            'metodo': metodo,
+            'url': url,
+            'p50_ms': round(percentil(duraciones, 50) * 1000, 3),
+            'p95_ms': round(percentil(duraciones, 95) * 1000, 3),
+            'p99_ms': round(percentil(duraciones, 99) * 1000, 3),
+            'media_ms': round(statistics.fmean(duraciones) * 1000, 3),
+            'primera_ms': round(frio * 1000, 3),
+            # La mediana: una petición con caché frío no cambia el número
+            'consultas': int(statistics.median(consultas)),
+            'consultas_max': max(consultas),
+            'bytes': tamano,
+            'estado': max(set(estados), key=estados.count),
+            'errores': sum(1 for estado in estados if estado >= 500),
+        }
+
+    def mostrar_comparacion(self, reporte, base, options):
+        actual, anterior = reporte['resultados'], base.get('resultados', {})
+        self.stdout.write(f'\nComparación con {options["base"]} ({base.get("fecha", "?")}):')
+        regresiones = 0
+        for clave, cambios, es_regresion in comparar(actual, anterior, options['umbral'], options['minimo_ms']):
+            (p95_antes, p95), (q_antes, q), (b_antes, b) = cambios.values()
+            variacion = (p95 - p95_antes) / p95_antes * 100 if p95_antes else 0
+            linea = (
+                f'{p95_antes:>8.1f} -> {p95:>8.1f} ms ({variacion:+6.1f}%)  '
+                f'{q_antes:>4} -> {q:<4} q  {b - b_antes:+9d} B  {clave}'
+            )
+            if es_regresion:
+                regresiones += 1
+                self.stdout.write(self.style.ERROR(f'REGRESIÓN {linea}'))
+            elif variacion < -options['umbral'] * 100 or q < q_antes:
+                self.stdout.write(self.style.SUCCESS(f'mejora    {linea}'))
+        for clave in sorted(actual.keys() - anterior.keys()):
+            self.stdout.write(f'nuevo      {clave}')
+        for clave in sorted(anterior.keys() - actual.keys()):
+            self.stdout.write(f'ausente    {clave}')
+        mensaje = f'{regresiones} regresiones en {len(actual.keys() & anterior.keys())} escenarios comparados'
+        self.stdout.write(self.style.ERROR(mensaje) if regresiones else self.style.SUCCESS(mensaje))
+        return regresiones
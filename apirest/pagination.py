@@ -0,0 +1,151 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginación por cursor sobre (fecha, id), de la venta más reciente a la más antigua.
+
+    Cada página filtra `(fecha, id) < cursor` en lugar de usar OFFSET, así que
+    el costo no depende de la profundidad. No hay COUNT(*) salvo que se pida
+    `?incluir_total=1`.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    total_query_param = 'incluir_total'
+    page_size = 20
+    max_page_size = 500
+    ordering = ('-fecha', '-id')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, venta):
+        payload = json.dumps([venta.fecha.isoformat(), venta.pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            fecha, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(fecha), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound('Cursor inválido.')
+
+    def _consultas(self, queryset, request):
+        """(queryset a contar o None, queryset de la página con una fila extra)."""
+        self.request = request
+        self.page_size_actual = self.get_page_size(request)
+        self.count = None
+        contar = request.query_params.get(self.total_query_param) in ('1', 'true')
+
+        pagina = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            fecha, pk = self.decode_cursor(cursor)
+            pagina = pagina.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, id__lt=pk))
+
+        # Se pide una fila extra solo para saber si existe página siguiente
+        return (queryset if contar else None), pagina[:self.page_size_actual + 1]
+
+    def _pagina(self, filas):
+        self.has_next = len(filas) > self.page_size_actual
+        filas = filas[:self.page_size_actual]
+        self.next_cursor = self.encode_cursor(filas[-1]) if self.has_next else None
+        return filas
+
+    def paginate_queryset(self, queryset, request, view=None):
+        total, pagina = self._consultas(queryset, request)
+        if total is not None:
+            self.count = total.count()
+        return self._pagina(list(pagina))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        total, pagina = self._consultas(queryset, request)
+        if total is not None:
+            self.count = await total.acount()
+        return self._pagina([fila async for fila in pagina])
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+
+class PaginacionPorNumero(PageNumberPagination):
+    """`PageNumberPagination` con una variante async (ORM async) para `apirest.asincrono`."""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Paginator.count es un cached_property: se precarga para no contar en modo sync
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+
+class VentaPagination(PaginacionPorNumero):
+    """Paginación por número de página, con modo cursor opcional.
+
+    `?paginacion=cursor` (o la presencia de `?cursor=`) activa `KeysetPagination`.
+    """
+    mode_query_param = 'paginacion'
+
+    def usa_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.usa_cursor(request):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.usa_cursor(request):
+            self.keyset = KeysetPagination()
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        return await super().apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from inventario.models import Marca, Proveedor, Categoria, Producto
-from ventas.models import Cliente, Venta, DetalleVenta
+from ventas.models import Cliente, ClienteResumen, Venta, DetalleVenta
 
 # ==================== USUARIOS ====================
 
@@ -39,6 +39,13 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 # ==================== INVENTARIO ====================
 
+def _productos_count(obj):
+    """Usa el conteo anotado por el ViewSet; solo consulta si no viene precalculado."""
+    count = getattr(obj, 'productos_count', None)
+    if count is None:
+        count = obj.productos.count()
+    return count
+
 class MarcaSerializer(serializers.ModelSerializer):
     """Serializador para marcas"""
     productos_count = serializers.SerializerMethodField()
@@ -48,7 +55,7 @@ class MarcaSerializer(serializers.ModelSerializer):
         fields = ['id', 'nombre', 'productos_count']
     
     def get_productos_count(self, obj):
-        return obj.productos.count()
+        return _productos_count(obj)
 
 class ProveedorSerializer(serializers.ModelSerializer):
     """Serializador para proveedores"""
@@ -59,7 +66,7 @@ class ProveedorSerializer(serializers.ModelSerializer):
         fields = ['id', 'nombre', 'telefono', 'email', 'productos_count']
     
     def get_productos_count(self, obj):
-        return obj.productos.count()
+        return _productos_count(obj)
 
 class CategoriaSerializer(serializers.ModelSerializer):
     """Serializador para categorías"""
@@ -70,7 +77,7 @@ class CategoriaSerializer(serializers.ModelSerializer):
         fields = ['id', 'nombre', 'descripcion', 'productos_count']
     
     def get_productos_count(self, obj):
-        return obj.productos.count()
+        return _productos_count(obj)
 
 class ProductoSerializer(serializers.ModelSerializer):
     """Serializador para productos con información detallada"""
@@ -100,23 +107,33 @@ class ProductoListSerializer(serializers.ModelSerializer):
 # ==================== VENTAS ====================
 
 class ClienteSerializer(serializers.ModelSerializer):
-    """Serializador para clientes"""
+    """Serializador para clientes (los totales vienen de `ClienteResumen`)"""
     compras_count = serializers.SerializerMethodField()
     total_comprado = serializers.SerializerMethodField()
+    primera_compra = serializers.DateTimeField(source='resumen.primera_compra', read_only=True)
+    ultima_compra = serializers.DateTimeField(source='resumen.ultima_compra', read_only=True)
     
     class Meta:
         model = Cliente
         fields = [
             'id', 'rut', 'nombre', 'apellido', 'email', 
-            'telefono', 'direccion', 'compras_count', 'total_comprado'
+            'telefono', 'direccion', 'compras_count', 'total_comprado',
+            'primera_compra', 'ultima_compra'
         ]
     
+    def _resumen(self, obj):
+        try:
+            return obj.resumen
+        except ClienteResumen.DoesNotExist:
+            return None
+    
     def get_compras_count(self, obj):
-        return obj.compras.count()
+        resumen = self._resumen(obj)
+        return resumen.compras_count if resumen else 0
     
     def get_total_comprado(self, obj):
-        total = sum(venta.total_venta or 0 for venta in obj.compras.all())
-        return total
+        resumen = self._resumen(obj)
+        return resumen.total_comprado if resumen else 0
 
 class DetalleVentaSerializer(serializers.ModelSerializer):
     """Serializador para detalles de venta"""
@@ -146,10 +163,10 @@ class VentaSerializer(serializers.ModelSerializer):
             'id', 'vendedor', 'vendedor_nombre',
             'cliente', 'cliente_nombre',
             'producto', 'producto_nombre',
-            'cantidad', 'total_venta', 'fecha',
+            'cantidad', 'precio_unitario', 'total_venta', 'fecha',
             'detalles'
         ]
-        read_only_fields = ['total_venta', 'fecha']
+        read_only_fields = ['precio_unitario', 'total_venta', 'fecha']
 
 class VentaListSerializer(serializers.ModelSerializer):
     """Serializador simplificado para listados de ventas"""
@@ -173,3 +190,14 @@ class VentaCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # El método save() del modelo calcula automáticamente el total
         return super().create(validated_data)
+
+class VentaBulkItemSerializer(serializers.Serializer):
+    """Fila de la carga masiva de ventas (mismos campos que VentaCreateSerializer).
+
+    Solo valida la forma de la fila; la existencia de cliente y producto se
+    comprueba para todo el lote de una vez en `ventas.ingesta`.
+    """
+    vendedor = serializers.IntegerField(required=False)  # se ignora: el vendedor es el usuario
+    cliente = serializers.IntegerField()
+    producto = serializers.IntegerField()
+    cantidad = serializers.IntegerField(min_value=1, default=1)
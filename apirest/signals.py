@@ -0,0 +1,19 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apirest.autenticacion import usuarios
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_usuario(sender, instance, update_fields=None, **kwargs):
+    # El login por sesión solo actualiza last_login, que la API no usa
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    pk = instance.pk
+    # Ahora y de nuevo al confirmar: una carga concurrente que leyó la fila
+    # anterior queda guardada bajo una versión que ya no se consulta
+    usuarios.invalidar(pk)
+    transaction.on_commit(lambda: usuarios.invalidar(pk))
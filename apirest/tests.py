@@ -1,11 +1,33 @@
-from django.test import TestCase
+from django.test import AsyncClient, Client, TestCase, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.db import connection
+from django.db.models import Avg, Count, Max, Min
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+from unittest import mock
+from datetime import date, datetime, timezone as dt_timezone
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from inventario.models import Marca, Proveedor, Categoria, Producto
-from ventas.models import Cliente
+from apirest.autenticacion import CacheUsuarios, usuarios
+from apirest.management.commands.benchmark_endpoints import comparar
+from pc_shop.pruebas import PresupuestoConsultasMixin, metodos
+from inventario import busqueda, stock
+from inventario.models import Marca, Proveedor, Categoria, MovimientoStock, Producto, StockProducto
+from ventas import ranking
+from ventas.models import Cliente, DetalleVenta, Venta
 
 class APIAuthTestCase(APITestCase):
     """Tests para autenticación de la API"""
@@ -76,6 +98,348 @@ class InventarioAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertTrue(Producto.objects.filter(nombre='Test Producto').exists())
 
+class CatalogoQueryCountTestCase(APITestCase):
+    """Tests de regresión: el número de consultas no crece con el tamaño de página"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        # El usuario queda en el caché de autenticación
+        self.client.get(reverse('api:usuarios-detail', args=[self.user.id]))
+    
+    def crear_catalogo(self, n):
+        for i in range(n):
+            marca = Marca.objects.create(nombre=f'Marca {i}')
+            proveedor = Proveedor.objects.create(nombre=f'Proveedor {i}')
+            categoria = Categoria.objects.create(nombre=f'Categoria {i}')
+            for j in range(2):
+                Producto.objects.create(
+                    nombre=f'Producto {i}-{j}', precio='10.00', descripcion='desc',
+                    marca=marca, proveedor=proveedor, categoria=categoria
+                )
+    
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response
+    
+    def limpiar_catalogo(self):
+        Producto.objects.all().delete()
+        Marca.objects.all().delete()
+        Proveedor.objects.all().delete()
+        Categoria.objects.all().delete()
+    
+    def test_listados_consultas_constantes(self):
+        """El listado de marcas, proveedores y categorías no hace N+1"""
+        for nombre in ['marcas', 'proveedores', 'categorias']:
+            with self.subTest(endpoint=nombre):
+                url = reverse(f'api:{nombre}-list')
+                
+                self.limpiar_catalogo()
+                self.crear_catalogo(2)
+                pocas, _ = self.contar_consultas(url)
+                
+                self.limpiar_catalogo()
+                self.crear_catalogo(15)
+                muchas, response = self.contar_consultas(url)
+                
+                self.assertEqual(pocas, muchas)
+                self.assertEqual(response.data['count'], 15)
+                for item in response.data['results']:
+                    self.assertEqual(item['productos_count'], 2)
+    
+    def test_detalle_usa_conteo_anotado(self):
+        """El detalle obtiene el conteo en la misma consulta del objeto"""
+        self.crear_catalogo(1)
+        marca = Marca.objects.get()
+        proveedor = Proveedor.objects.get()
+        categoria = Categoria.objects.get()
+        for nombre, obj in [('marcas', marca), ('proveedores', proveedor), ('categorias', categoria)]:
+            with self.subTest(endpoint=nombre):
+                url = reverse(f'api:{nombre}-detail', args=[obj.id])
+                consultas, response = self.contar_consultas(url)
+                self.assertEqual(response.data['productos_count'], 2)
+                # Versiones (ETag) + objeto anotado; el usuario sale del caché
+                self.assertEqual(consultas, 2)
+
+class ProductoEstadisticasTestCase(APITestCase):
+    """Estadísticas de productos: una agregación y caché invalidado por cambios"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.marca = Marca.objects.create(nombre='Test Marca')
+        for precio in [10, 20, 30, 40, 50, 60, 70, 80, 90, 100]:
+            Producto.objects.create(nombre=f'P{precio}', precio=precio, descripcion='', marca=self.marca)
+        self.url = reverse('api:productos-estadisticas')
+        self.client.get(reverse('api:usuarios-detail', args=[self.user.id]))
+    
+    def test_valores(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_productos'], 10)
+        self.assertEqual(response.data['precio_promedio'], 55)
+        self.assertEqual(response.data['precio_minimo'], 10)
+        self.assertEqual(response.data['precio_maximo'], 100)
+        self.assertEqual(response.data['percentiles_precio'], {'p25': 30, 'p50': 50, 'p75': 80, 'p90': 90})
+        self.assertEqual(response.data['total_marcas'], 1)
+        
+        response = self.client.get(self.url, {'precio_min': 95})
+        self.assertEqual(response.data['total_productos'], 1)
+        self.assertEqual(response.data['percentiles_precio']['p50'], 100)
+    
+    def test_cache_e_invalidacion(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url, {'marca': self.marca.id, 'precio_max': ''})
+        # Versiones + agregación + percentiles + 3 conteos del catálogo
+        self.assertEqual(len(ctx.captured_queries), 6)
+        
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'page': 2, 'marca': self.marca.id})
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(response.data['total_productos'], 10)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.create(nombre='Nuevo', precio=5, descripcion='', marca=self.marca)
+        response = self.client.get(self.url, {'marca': self.marca.id})
+        self.assertEqual(response.data['total_productos'], 11)
+        self.assertEqual(response.data['precio_minimo'], 5)
+    
+    def test_busqueda_con_mas_resultados_que_los_ordenados(self):
+        total = busqueda.MAX_ORDENADOS + 200
+        Producto.objects.bulk_create(
+            Producto(nombre=f'Monitor {i}', precio=100 + i % 37, descripcion='') for i in range(total)
+        )
+        busqueda.indice.invalidar()
+        response = self.client.get(self.url, {'search': 'monitor'})
+        monitores = Producto.objects.filter(nombre__startswith='Monitor')
+        esperado = monitores.aggregate(
+            total=Count('id'), promedio=Avg('precio'), minimo=Min('precio'), maximo=Max('precio')
+        )
+        self.assertEqual(response.data['total_productos'], total)
+        self.assertEqual(esperado['total'], total)
+        self.assertAlmostEqual(float(response.data['precio_promedio']), float(esperado['promedio']), places=2)
+        self.assertEqual(response.data['precio_minimo'], esperado['minimo'])
+        self.assertEqual(response.data['precio_maximo'], esperado['maximo'])
+        precios = sorted(monitores.values_list('precio', flat=True))
+        self.assertEqual(response.data['percentiles_precio']['p50'], precios[total // 2 - 1])
+
+class ProductoStockTestCase(APITestCase):
+    """Stock de un producto: consulta y ajuste por inventario físico"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.producto = Producto.objects.create(nombre='Mouse', precio=100, descripcion='desc')
+        self.url = reverse('api:productos-stock', args=[self.producto.pk])
+    
+    def test_sin_control_de_stock(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['cantidad'])
+        self.assertEqual(response.data['movimientos'], [])
+    
+    def test_solo_el_personal_ajusta(self):
+        response = self.client.post(self.url, {'cantidad': 5})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(StockProducto.objects.exists())
+    
+    def test_ajuste_y_movimientos(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.post(self.url, {'cantidad': -1}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {'cantidad': 12})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cliente = Cliente.objects.create(rut='11111111-1', nombre='Ana', apellido='Pérez')
+        venta = Venta.objects.create(vendedor=self.user, cliente=cliente, producto=self.producto, cantidad=5)
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['cantidad'], 7)
+        self.assertEqual(
+            [(m['motivo'], m['cantidad'], m['venta_id']) for m in response.data['movimientos']],
+            [('venta', -5, venta.pk), ('ajuste', 12, None)]
+        )
+
+class CatalogoETagTestCase(APITestCase):
+    """GET condicional: 304 sin consultar el catálogo mientras no haya cambios"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.marca = Marca.objects.create(nombre='Logitech')
+        self.proveedor = Proveedor.objects.create(nombre='PC Factory')
+        self.categoria = Categoria.objects.create(nombre='Periféricos')
+        self.producto = Producto.objects.create(
+            nombre='Mouse', precio=100, descripcion='', marca=self.marca,
+            proveedor=self.proveedor, categoria=self.categoria
+        )
+    
+    def urls(self):
+        yield reverse('api:productos-list')
+        yield reverse('api:productos-detail', args=[self.producto.id])
+        for nombre, obj in [('marcas', self.marca), ('proveedores', self.proveedor), ('categorias', self.categoria)]:
+            yield reverse(f'api:{nombre}-list')
+            yield reverse(f'api:{nombre}-detail', args=[obj.id])
+            yield reverse(f'api:{nombre}-productos', args=[obj.id])
+    
+    def test_304_sin_consultar_tablas(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                etag = response['ETag']
+                
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(response['ETag'], etag)
+                self.assertFalse(response.content)
+                sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+                self.assertNotIn('app_shop_', sql)
+    
+    def test_cambio_en_cualquier_tabla_invalida(self):
+        url = reverse('api:marcas-list')
+        etag = self.client.get(url)['ETag']
+        
+        # Cambia el nombre de la categoría: el listado de productos embebe el nombre
+        self.categoria.nombre = 'Accesorios'
+        self.categoria.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        
+        etag = response['ETag']
+        self.producto.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"otro", W/{etag}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['productos_count'], 0)
+    
+    def test_etag_depende_de_la_url(self):
+        url = reverse('api:productos-list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, {'marca': self.marca.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, {'marca': self.marca.id}, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_sin_autenticacion_no_revela_etag(self):
+        url = reverse('api:productos-list')
+        etag = self.client.get(url)['ETag']
+        self.client.credentials()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('ETag', response)
+
+class JWTCacheUsuariosTestCase(APITestCase):
+    """Autenticación JWT con el usuario en caché e invalidación al editarlo"""
+    
+    def setUp(self):
+        cache.clear()
+        usuarios.limpiar()
+        self.user = User.objects.create_user(username='vendedor', password='testpass123')
+        self.admin = User.objects.create_user(username='admin', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('api:usuarios-detail', args=[self.user.id])
+        self.sesion_admin = Client()
+        self.sesion_admin.force_login(self.admin)
+    
+    def consultas_auth(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        return response, [q for q in ctx.captured_queries if 'auth_user' in q['sql']]
+    
+    def test_sin_consultas_de_autenticacion_en_caliente(self):
+        self.client.get(self.url)
+        response, consultas = self.consultas_auth()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Solo queda la consulta del propio detalle de usuario
+        self.assertEqual(len(consultas), 1)
+    
+    def test_editar_usuario_invalida(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sesion_admin.post(reverse('editar_usuario', args=[self.user.id]), {
+                'username': 'vendedor', 'first_name': 'Ana', 'last_name': '', 'email': '',
+                'is_active': 'on',
+            })
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['first_name'], 'Ana')
+        
+        # Desactivar (checkbox sin marcar) corta el acceso con el mismo token
+        self.sesion_admin.post(reverse('editar_usuario', args=[self.user.id]), {
+            'username': 'vendedor', 'first_name': 'Ana', 'last_name': '', 'email': '',
+        })
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_eliminar_usuario_invalida(self):
+        self.client.get(self.url)
+        self.sesion_admin.post(reverse('eliminar_usuario', args=[self.user.id]))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_login_por_sesion_no_invalida(self):
+        self.client.get(self.url)
+        Client().login(username='vendedor', password='testpass123')
+        _, consultas = self.consultas_auth()
+        self.assertEqual(len(consultas), 1)
+    
+    @override_settings(JWT_CACHE_USUARIOS={'MAXIMO': 1})
+    def test_lru_acotado(self):
+        otro = APIClient()
+        otro.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.admin).access_token}')
+        self.client.get(self.url)
+        otro.get(self.url)
+        # El usuario fue desplazado por el segundo
+        _, consultas = self.consultas_auth()
+        self.assertEqual(len(consultas), 2)
+    
+    @override_settings(JWT_CACHE_USUARIOS={'MAXIMO': 2})
+    def test_versiones_acotadas(self):
+        cache_usuarios = CacheUsuarios()
+        cargas = []
+        
+        def cargar():
+            cargas.append(1)
+            return User.objects.get(pk=self.user.id)
+        
+        # Una carga que termina después de invalidar queda bajo la versión anterior
+        version = cache_usuarios.version(self.user.id)
+        cache_usuarios.invalidar(self.user.id)
+        cache_usuarios._entradas[(self.user.id, version)] = (User(username='anterior'), time.monotonic() + 60)
+        # Otros usuarios invalidados desplazan su versión
+        for user_id in range(1000, 1003):
+            cache_usuarios.invalidar(user_id)
+        self.assertEqual(len(cache_usuarios._versiones), 2)
+        self.assertEqual(cache_usuarios.obtener(self.user.id, cargar).username, 'vendedor')
+        self.assertEqual(len(cargas), 1)
+    
+    @override_settings(JWT_CACHE_USUARIOS={'CACHE': 'default'})
+    def test_cache_compartido_entre_procesos(self):
+        otro_proceso = CacheUsuarios()
+        cargas = []
+        
+        def cargar():
+            cargas.append(1)
+            return User.objects.get(pk=self.user.id)
+        
+        self.assertEqual(usuarios.obtener(self.user.id, cargar).username, 'vendedor')
+        self.assertEqual(otro_proceso.obtener(self.user.id, cargar).username, 'vendedor')
+        self.assertEqual(len(cargas), 1)
+        
+        # La invalidación en un proceso se ve en el otro
+        User.objects.filter(pk=self.user.id).update(username='vendedora')
+        usuarios.invalidar(self.user.id)
+        self.assertEqual(otro_proceso.obtener(self.user.id, cargar).username, 'vendedora')
+        self.assertEqual(len(cargas), 2)
+
 class VentasAPITestCase(APITestCase):
     """Tests para endpoints de ventas"""
     
@@ -110,6 +474,815 @@ class VentasAPITestCase(APITestCase):
         }
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+    
+    def test_list_clientes_lee_resumen(self):
+        """Los totales del cliente salen del resumen, sin consultas por fila"""
+        producto = Producto.objects.create(nombre='Teclado', precio=2500, descripcion='desc')
+        for i in range(10):
+            cliente = Cliente.objects.create(rut=f'1000000{i}-K', nombre='C', apellido=str(i))
+            Venta.objects.create(vendedor=self.user, cliente=cliente, producto=producto, cantidad=2)
+        
+        url = reverse('api:clientes-list')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Autenticación + COUNT de paginación + página con el resumen unido
+        self.assertEqual(len(ctx.captured_queries), 3)
+        
+        por_rut = {c['rut']: c for c in response.data['results']}
+        self.assertEqual(por_rut['10000000-K']['compras_count'], 1)
+        self.assertEqual(por_rut['10000000-K']['total_comprado'], 5000)
+        self.assertEqual(por_rut['12345678-9']['compras_count'], 0)
+        self.assertIsNone(por_rut['12345678-9']['ultima_compra'])
+
+    def test_crear_venta_sin_stock(self):
+        """Una venta que deja el stock negativo se rechaza sin guardarse"""
+        producto = Producto.objects.create(nombre='Teclado', precio=2500, descripcion='desc')
+        stock.ajustar(producto.pk, 3)
+        url = reverse('api:ventas-list')
+        datos = {'vendedor': self.user.pk, 'cliente': self.cliente.pk, 'producto': producto.pk, 'cantidad': 4}
+        response = self.client.post(url, datos)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cantidad', response.data)
+        self.assertFalse(Venta.objects.exists())
+        
+        response = self.client.post(url, {**datos, 'cantidad': 3})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        venta = Venta.objects.get()
+        response = self.client.patch(reverse('api:ventas-detail', args=[venta.pk]), {'cantidad': 5})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(StockProducto.objects.get(producto=producto).cantidad, 0)
+
+class VentaCursorPaginationTestCase(APITestCase):
+    """Tests para la paginación por cursor del libro de ventas"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        
+        self.cliente = Cliente.objects.create(rut='12345678-9', nombre='Test', apellido='Cliente')
+        producto = Producto.objects.create(nombre='Monitor', precio=100, descripcion='desc')
+        self.ventas = [
+            Venta.objects.create(vendedor=self.user, cliente=self.cliente, producto=producto)
+            for _ in range(7)
+        ]
+        # Dos ventas con la misma fecha: el desempate es por id
+        Venta.objects.filter(pk=self.ventas[3].pk).update(fecha=self.ventas[4].fecha)
+    
+    def recorrer(self, url):
+        ids = []
+        paginas = 0
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+            self.assertNotIn('COUNT(', sql.upper())
+            self.assertNotIn('OFFSET', sql.upper())
+            ids += [v['id'] for v in response.data['results']]
+            url = response.data['next']
+            paginas += 1
+        return ids, paginas
+    
+    def test_recorre_todas_las_ventas_sin_count(self):
+        url = reverse('api:ventas-list') + '?paginacion=cursor&page_size=3'
+        ids, paginas = self.recorrer(url)
+        esperados = list(
+            Venta.objects.order_by('-fecha', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, esperados)
+        self.assertEqual(paginas, 3)
+    
+    def test_total_solo_si_se_pide(self):
+        url = reverse('api:ventas-list') + '?paginacion=cursor&incluir_total=1'
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 7)
+        self.assertIsNone(response.data['next'])
+    
+    def test_compras_de_cliente_con_cursor(self):
+        url = reverse('api:clientes-compras', args=[self.cliente.id]) + '?paginacion=cursor&page_size=5'
+        ids, paginas = self.recorrer(url)
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(paginas, 2)
+    
+    def test_cursor_invalido(self):
+        url = reverse('api:ventas-list') + '?cursor=no-es-un-cursor'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class VentaEstadisticasTestCase(APITestCase):
+    """Las estadísticas de ventas salen de los acumulados y cuadran con el libro"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.otro = User.objects.create_user(username='otro', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        cache.clear()
+        
+        self.cliente = Cliente.objects.create(rut='12345678-9', nombre='Test', apellido='Cliente')
+        otro_cliente = Cliente.objects.create(rut='98765432-1', nombre='Otro', apellido='Cliente')
+        self.mouse = Producto.objects.create(nombre='Mouse', precio=100, descripcion='desc')
+        teclado = Producto.objects.create(nombre='Teclado', precio=300, descripcion='desc')
+        for vendedor, cliente, producto, cantidad in [
+            (self.user, self.cliente, self.mouse, 1),
+            (self.user, otro_cliente, teclado, 2),
+            (self.otro, self.cliente, teclado, 1),
+            (self.otro, otro_cliente, self.mouse, 4),
+        ]:
+            Venta.objects.create(vendedor=vendedor, cliente=cliente, producto=producto, cantidad=cantidad)
+    
+    def test_estadisticas_con_filtros(self):
+        url = reverse('api:ventas-estadisticas')
+        hoy = timezone.localdate(Venta.objects.first().fecha).isoformat()
+        casos = [
+            ({}, 4, 1400, 8),
+            ({'vendedor': self.otro.id}, 2, 700, 5),
+            ({'producto': self.mouse.id}, 2, 500, 5),
+            ({'cliente': self.cliente.id}, 2, 400, 2),
+            ({'fecha_desde': hoy, 'fecha_hasta': hoy}, 4, 1400, 8),
+            ({'fecha_desde': '2000-01-01', 'fecha_hasta': '2000-01-31'}, 0, 0, 0),
+        ]
+        for filtros, ventas, ingresos, unidades in casos:
+            with self.subTest(filtros=filtros):
+                response = self.client.get(url, filtros)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data['total_ventas'], ventas)
+                self.assertEqual(response.data['total_ingresos'], ingresos)
+                self.assertEqual(response.data['total_unidades'], unidades)
+                self.assertEqual(response.data['total_clientes'], 2)
+    
+    def test_total_clientes_desde_el_cache(self):
+        url = reverse('api:ventas-estadisticas')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.data['total_clientes'], 2)
+        self.assertEqual([q['sql'] for q in ctx.captured_queries if 'app_shop_cliente' in q['sql']], [])
+        
+        # Altas y bajas lo invalidan al confirmarse; editar un cliente no
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = Cliente.objects.create(rut='11111111-1', nombre='Nuevo', apellido='Cliente')
+        self.assertEqual(self.client.get(url).data['total_clientes'], 3)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            nuevo.save()
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.delete()
+        self.assertEqual(self.client.get(url).data['total_clientes'], 2)
+    
+    def test_fecha_invalida(self):
+        for accion in ('ventas-list', 'ventas-estadisticas', 'ventas-exportar'):
+            with self.subTest(accion=accion):
+                response = self.client.get(reverse(f'api:{accion}'), {'fecha_hasta': '2024-02-30'})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('fecha_hasta', response.data)
+
+class VentaSerieTestCase(APITestCase):
+    """Serie de tiempo de ventas agrupada en la BD, en hora de Santiago y sin huecos"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.otro = User.objects.create_user(username='otro', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        
+        self.cliente = Cliente.objects.create(rut='12345678-9', nombre='Test', apellido='Cliente')
+        mouse = Producto.objects.create(nombre='Mouse', precio=100, descripcion='desc')
+        # 01:00 UTC del 2 de enero todavía es 1 de enero en Santiago (UTC-3)
+        for vendedor, cantidad, fecha in [
+            (self.user, 1, datetime(2024, 1, 1, 15, 0, tzinfo=dt_timezone.utc)),
+            (self.otro, 2, datetime(2024, 1, 2, 1, 0, tzinfo=dt_timezone.utc)),
+            (self.user, 3, datetime(2024, 1, 4, 12, 0, tzinfo=dt_timezone.utc)),
+            (self.user, 1, datetime(2024, 2, 10, 12, 0, tzinfo=dt_timezone.utc)),
+        ]:
+            venta = Venta.objects.create(vendedor=vendedor, cliente=self.cliente, producto=mouse, cantidad=cantidad)
+            Venta.objects.filter(pk=venta.pk).update(fecha=fecha)
+        call_command('reconstruir_rollups_ventas', stdout=StringIO())
+    
+    def serie(self, **parametros):
+        response = self.client.get(reverse('api:ventas-serie'), parametros)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            (p['periodo'], p['ventas_count'], p['ingresos'], p['unidades']) for p in response.data['puntos']
+        ]
+    
+    def test_por_dia_sin_huecos(self):
+        puntos = self.serie(fecha_desde='2023-12-31', fecha_hasta='2024-01-05')
+        self.assertEqual(puntos, [
+            (date(2023, 12, 31), 0, 0, 0),
+            (date(2024, 1, 1), 2, 300, 3),
+            (date(2024, 1, 2), 0, 0, 0),
+            (date(2024, 1, 3), 0, 0, 0),
+            (date(2024, 1, 4), 1, 300, 3),
+            (date(2024, 1, 5), 0, 0, 0),
+        ])
+    
+    def test_libro_y_acumulados_dan_la_misma_serie(self):
+        # Con ?cliente= la serie sale del libro; sin él, de los acumulados
+        for intervalo in ('dia', 'semana', 'mes'):
+            with self.subTest(intervalo=intervalo):
+                self.assertEqual(
+                    self.serie(intervalo=intervalo, cliente=self.cliente.pk),
+                    self.serie(intervalo=intervalo),
+                )
+        self.assertEqual(self.serie(intervalo='mes'), [
+            (date(2024, 1, 1), 3, 600, 6),
+            (date(2024, 2, 1), 1, 100, 1),
+        ])
+        self.assertEqual(self.serie(intervalo='semana', vendedor=self.user.pk, fecha_hasta='2024-01-14'), [
+            (date(2024, 1, 1), 2, 400, 4),
+            (date(2024, 1, 8), 0, 0, 0),
+        ])
+    
+    def test_por_hora_con_cambio_de_horario(self):
+        Venta.objects.filter(fecha__month=2).update(fecha=datetime(2024, 9, 8, 4, 30, tzinfo=dt_timezone.utc))
+        puntos = self.serie(intervalo='hora', fecha_desde='2024-09-07', fecha_hasta='2024-09-08')
+        # El 8 de septiembre no tiene hora 00:00: 24 + 23 horas
+        self.assertEqual(len(puntos), 47)
+        self.assertEqual(puntos[24][0].isoformat(), '2024-09-08T01:00:00-03:00')
+        self.assertEqual(puntos[24][1:], (1, 100, 1))
+        self.assertEqual(sum(p[1] for p in puntos), 1)
+    
+    def test_parametros_invalidos(self):
+        url = reverse('api:ventas-serie')
+        for parametros in (
+            {'intervalo': 'minuto'},
+            {'fecha_desde': '2024-13-01'},
+            {'intervalo': 'hora', 'fecha_desde': '2020-01-01', 'fecha_hasta': '2024-01-01'},
+        ):
+            with self.subTest(parametros=parametros):
+                response = self.client.get(url, parametros)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_una_consulta(self):
+        for parametros in ({'fecha_desde': '2024-01-01', 'fecha_hasta': '2024-12-31'}, {'cliente': self.cliente.pk}):
+            with self.subTest(parametros=parametros):
+                # Autenticación por JWT (desde el caché de usuarios) más la serie
+                self.serie(**parametros)
+                with CaptureQueriesContext(connection) as consultas:
+                    self.serie(**parametros)
+                self.assertEqual(len(consultas), 1)
+
+
+class VentaRankingTestCase(APITestCase):
+    """Top N de la API: ventanas desde los totales en memoria, caché invalidado por ventas nuevas"""
+    
+    def setUp(self):
+        ranking.invalidar()
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.otro = User.objects.create_user(username='otro', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        
+        self.cliente = Cliente.objects.create(rut='12345678-9', nombre='Test', apellido='Cliente')
+        self.mouse = Producto.objects.create(nombre='Mouse', precio=100, descripcion='desc')
+        self.teclado = Producto.objects.create(nombre='Teclado', precio=300, descripcion='desc')
+        for vendedor, producto, cantidad in [
+            (self.user, self.mouse, 5), (self.otro, self.teclado, 1), (self.otro, self.teclado, 1),
+        ]:
+            Venta.objects.create(vendedor=vendedor, cliente=self.cliente, producto=producto, cantidad=cantidad)
+    
+    def ranking(self, **parametros):
+        response = self.client.get(reverse('api:ventas-ranking'), parametros)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+    
+    def test_por_ingresos_y_unidades(self):
+        data = self.ranking(por='productos')
+        self.assertEqual(data['ventana'], '30d')
+        self.assertEqual(
+            [(r['posicion'], r['nombre'], r['ingresos'], r['unidades']) for r in data['resultados']],
+            [(1, 'Teclado', 600, 2), (2, 'Mouse', 500, 5)],
+        )
+        data = self.ranking(por='vendedores', criterio='unidades', ventana='hoy', n=1)
+        self.assertEqual([r['nombre'] for r in data['resultados']], ['testuser'])
+        data = self.ranking(por='clientes', fecha_desde=timezone.localdate().isoformat())
+        self.assertIsNone(data['ventana'])
+        self.assertEqual([(r['nombre'], r['unidades']) for r in data['resultados']], [('Test Cliente', 7)])
+    
+    def test_venta_nueva_invalida_el_cache(self):
+        self.ranking(por='productos', ventana='7d')
+        with CaptureQueriesContext(connection) as consultas:
+            self.ranking(por='productos', ventana='7d')
+        # Versión y ventas nuevas; la respuesta sale del caché
+        self.assertEqual(len(consultas), 2)
+        
+        Venta.objects.create(vendedor=self.user, cliente=self.cliente, producto=self.mouse, cantidad=2)
+        resultados = self.ranking(por='productos', ventana='7d')['resultados']
+        self.assertEqual([(r['nombre'], r['ingresos']) for r in resultados], [('Mouse', 700), ('Teclado', 600)])
+    
+    def test_parametros_invalidos(self):
+        url = reverse('api:ventas-ranking')
+        for parametros in (
+            {'por': 'marcas'}, {'criterio': 'margen'}, {'ventana': '90d'}, {'n': 0}, {'n': 'diez'},
+            {'ventana': '7d', 'vendedor': self.user.pk},
+        ):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(url, parametros).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class VentaBulkTestCase(APITestCase):
+    """Carga masiva de ventas"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.clientes = [
+            Cliente.objects.create(rut=f'1111111{i}-1', nombre='C', apellido=str(i)) for i in range(2)
+        ]
+        self.producto = Producto.objects.create(nombre='Mouse', precio=100, descripcion='desc')
+        self.url = reverse('api:ventas-bulk')
+    
+    def filas(self, n):
+        return [
+            {'cliente': self.clientes[i % 2].id, 'producto': self.producto.id, 'cantidad': 2}
+            for i in range(n)
+        ]
+    
+    def test_consultas_no_crecen_con_el_lote(self):
+        # La primera carga crea las filas de resumen; las siguientes solo las actualizan
+        self.client.post(self.url, self.filas(2), format='json')
+        consultas = []
+        for n in (10, 200):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(self.url, self.filas(n), format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['creadas'], n)
+            # Los INSERT van por lotes (su número depende del backend); el resto es fijo
+            consultas.append(len([
+                q for q in ctx.captured_queries
+                if not (q['sql'].startswith('INSERT INTO') and 'app_shop_venta' in q['sql'][:30])
+            ]))
+        self.assertEqual(consultas[0], consultas[1])
+        
+        self.assertEqual(Venta.objects.count(), 212)
+        self.assertEqual(self.clientes[0].resumen.compras_count, 106)
+        self.assertEqual(self.clientes[0].resumen.total_comprado, 106 * 200)
+        call_command('verificar_rollups_ventas', stdout=StringIO())
+    
+    def test_resultado_por_fila(self):
+        filas = self.filas(3) + [
+            {'cliente': 999, 'producto': self.producto.id},
+            {'cliente': self.clientes[0].id, 'producto': self.producto.id, 'cantidad': 0},
+        ]
+        response = self.client.post(self.url, filas, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['creadas'], 3)
+        self.assertEqual(response.data['errores'], 2)
+        estados = [r['estado'] for r in response.data['resultados']]
+        self.assertEqual(estados, ['creada'] * 3 + ['error'] * 2)
+        self.assertEqual(response.data['resultados'][0]['total_venta'], 200)
+        self.assertIn('cliente', response.data['resultados'][3]['errores'])
+        self.assertIn('cantidad', response.data['resultados'][4]['errores'])
+        self.assertEqual(Venta.objects.filter(vendedor=self.user).count(), 3)
+
+    def test_ids_sin_retorno_de_bulk_create(self):
+        # Como en MySQL: bulk_create no completa los pk
+        Venta.objects.create(
+            vendedor=User.objects.create_user(username='otro'), cliente=self.clientes[0], producto=self.producto
+        )
+        filas = self.filas(3)
+        filas[1]['cantidad'] = 5
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.client.post(self.url, filas, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for fila, resultado in zip(filas, response.data['resultados']):
+            venta = Venta.objects.get(pk=resultado['id'])
+            self.assertEqual(venta.vendedor, self.user)
+            self.assertEqual((venta.cliente_id, venta.cantidad), (fila['cliente'], fila['cantidad']))
+        self.assertEqual(len({r['id'] for r in response.data['resultados']}), 3)
+
+    def test_ids_sin_retorno_de_bulk_create_con_ventas_iguales_en_paralelo(self):
+        # Otra request del mismo vendedor inserta una venta igual a las del lote justo antes del INSERT
+        bulk_create = Venta.objects.bulk_create
+        paralelas = []
+
+        def en_paralelo(ventas, **kwargs):
+            paralelas.append(Venta.objects.create(
+                vendedor=self.user, cliente=self.clientes[0], producto=self.producto, cantidad=2
+            ))
+            return bulk_create(ventas, **kwargs)
+
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                mock.patch.object(Venta.objects, 'bulk_create', en_paralelo):
+            response = self.client.post(self.url, self.filas(2), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        ids = [r['id'] for r in response.data['resultados']]
+        self.assertNotIn(paralelas[0].pk, ids)
+        self.assertEqual(
+            list(Venta.objects.filter(pk__in=ids).order_by('id').values_list('cliente_id', flat=True)),
+            [self.clientes[0].id, self.clientes[1].id],
+        )
+        self.assertIsNone(Venta.objects.get(pk=paralelas[0].pk).lote)
+
+    def test_movimientos_enlazan_su_venta_sin_retorno_de_bulk_create(self):
+        stock.ajustar(self.producto.pk, 10)
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.client.post(self.url, self.filas(3), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(MovimientoStock.objects.filter(motivo='venta').values_list('venta_id', flat=True)),
+            sorted(r['id'] for r in response.data['resultados']),
+        )
+
+    def test_todo_o_nada(self):
+        filas = self.filas(3) + [{'cliente': 999, 'producto': self.producto.id}]
+        response = self.client.post(self.url + '?todo_o_nada=1', filas, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['creadas'], 0)
+        self.assertEqual(response.data['resultados'][0]['estado'], 'omitida')
+        self.assertFalse(Venta.objects.exists())
+    
+    def test_stock_insuficiente_rechaza_las_filas_del_producto(self):
+        otro = Producto.objects.create(nombre='Teclado', precio=300, descripcion='desc')
+        stock.ajustar(self.producto.pk, 5)
+        stock.ajustar(otro.pk, 10)
+        filas = self.filas(3) + [{'cliente': self.clientes[0].id, 'producto': otro.id, 'cantidad': 4}]
+        response = self.client.post(self.url, filas, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # El lote pide 6 unidades del Mouse y hay 5
+        self.assertEqual([r['estado'] for r in response.data['resultados']], ['error'] * 3 + ['creada'])
+        self.assertIn('cantidad', response.data['resultados'][0]['errores'])
+        self.assertEqual(StockProducto.objects.get(producto=self.producto).cantidad, 5)
+        self.assertEqual(StockProducto.objects.get(producto=otro).cantidad, 6)
+        self.assertEqual(otro.movimientos_stock.get(motivo='venta').venta_id, response.data['resultados'][3]['id'])
+        
+        response = self.client.post(self.url + '?todo_o_nada=1', filas, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([r['estado'] for r in response.data['resultados']], ['error'] * 3 + ['omitida'])
+        self.assertEqual(StockProducto.objects.get(producto=otro).cantidad, 6)
+        self.assertEqual(Venta.objects.count(), 1)
+
+class VentaExportacionTestCase(APITestCase):
+    """Exportación en streaming del libro de ventas"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.cliente = Cliente.objects.create(rut='12345678-9', nombre='Ana', apellido='Pérez')
+        otro = Cliente.objects.create(rut='98765432-1', nombre='Luis', apellido='Soto')
+        producto = Producto.objects.create(nombre='Mouse, inalámbrico', precio=100, descripcion='desc')
+        for i in range(7):
+            Venta.objects.create(
+                vendedor=self.user, cliente=self.cliente if i % 2 else otro, producto=producto, cantidad=i + 1
+            )
+        self.url = reverse('api:ventas-exportar')
+    
+    def contenido(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content)
+    
+    def test_csv_por_bloques(self):
+        with mock.patch('apirest.exportacion.CHUNK_SIZE', 3):
+            with CaptureQueriesContext(connection) as ctx:
+                datos = self.contenido(self.client.get(self.url)).decode()
+        filas = list(csv.reader(io.StringIO(datos)))
+        self.assertEqual(filas[0][:3], ['id', 'fecha', 'vendedor'])
+        self.assertEqual(
+            [int(f[0]) for f in filas[1:]],
+            list(Venta.objects.order_by('-fecha', '-id').values_list('id', flat=True))
+        )
+        self.assertEqual(filas[1][8], 'Mouse, inalámbrico')
+        # Autenticación + 3 bloques completos de a lo más 3 filas
+        self.assertEqual(len(ctx.captured_queries), 4)
+    
+    def test_ndjson_gzip_con_filtros(self):
+        response = self.client.get(self.url, {'formato': 'ndjson', 'gzip': '1', 'cliente': self.cliente.id})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lineas = gzip.decompress(self.contenido(response)).decode().splitlines()
+        filas = [json.loads(linea) for linea in lineas]
+        self.assertEqual(len(filas), 3)
+        self.assertTrue(all(f['cliente_rut'] == '12345678-9' for f in filas))
+        self.assertEqual(sum(f['cantidad'] for f in filas), 2 + 4 + 6)
+    
+    def test_formato_invalido(self):
+        response = self.client.get(self.url, {'formato': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class LecturasAsyncTestCase(APITestCase):
+    """Las rutas async responden lo mismo que las sync"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        
+        marca = Marca.objects.create(nombre='Logi')
+        self.producto = Producto.objects.create(nombre='Mouse', precio=1500, descripcion='desc', marca=marca)
+        Producto.objects.create(nombre='Teclado', precio=2500, descripcion='desc')
+        self.cliente = Cliente.objects.create(rut='12345678-9', nombre='Test', apellido='Cliente')
+        self.ventas = [
+            Venta.objects.create(vendedor=self.user, cliente=self.cliente, producto=self.producto, cantidad=i + 1)
+            for i in range(4)
+        ]
+    
+    def comparar(self, nombre, args=None, params=''):
+        sync = self.client.get(reverse(f'api:{nombre}', args=args) + params)
+        asincrona = self.client.get(reverse(f'api:async-{nombre}', args=args) + params)
+        self.assertEqual(asincrona.status_code, sync.status_code, nombre)
+        self.assertEqual(asincrona['Content-Type'], 'application/json')
+        # Los enlaces de paginación apuntan a la ruta pedida
+        cuerpo = asincrona.content.decode().replace('/apirest/async/', '/apirest/')
+        self.assertEqual(json.loads(cuerpo), json.loads(sync.content), nombre)
+        return asincrona
+    
+    def test_misma_respuesta_que_sync(self):
+        self.comparar('productos-list')
+        self.comparar('productos-list', params='?search=mou&marca=%d' % self.producto.marca_id)
+        self.comparar('productos-detail', args=[self.producto.id])
+        self.comparar('productos-estadisticas')
+        self.comparar('ventas-list', params='?page_size=2&page=2')
+        self.comparar('ventas-list', params='?cliente=%d' % self.cliente.id)
+        self.comparar('ventas-detail', args=[self.ventas[0].id])
+        self.comparar('ventas-estadisticas')
+        self.comparar('clientes-list')
+        self.comparar('clientes-detail', args=[self.cliente.id])
+        self.comparar('clientes-compras', args=[self.cliente.id])
+    
+    def test_paginacion_por_cursor(self):
+        respuesta = self.comparar('ventas-list', params='?paginacion=cursor&page_size=3')
+        self.assertIn('/apirest/async/ventas/', respuesta.json()['next'])
+        self.comparar('clientes-compras', args=[self.cliente.id], params='?paginacion=cursor&page_size=3')
+    
+    def test_errores(self):
+        self.comparar('productos-detail', args=[999])
+        self.comparar('clientes-compras', args=[999])
+        self.comparar('ventas-list', params='?page=9')
+        self.comparar('ventas-list', params='?cursor=no-es-un-cursor')
+        
+        self.client.credentials()
+        respuesta = self.comparar('productos-list')
+        self.assertEqual(respuesta.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', respuesta)
+    
+    def test_etag(self):
+        url = reverse('api:async-productos-list')
+        respuesta = self.client.get(url)
+        self.assertIn('ETag', respuesta)
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(respuesta.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_solo_lectura(self):
+        respuesta = self.client.post(reverse('api:async-productos-list'), {})
+        self.assertEqual(respuesta.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+    
+    async def test_cliente_async(self):
+        respuesta = await AsyncClient().get(
+            reverse('api:async-ventas-detail', args=[self.ventas[1].id]),
+            headers={'Authorization': f'Bearer {self.token}'},
+        )
+        self.assertEqual(respuesta.status_code, status.HTTP_200_OK)
+        self.assertEqual(respuesta.json()['id'], self.ventas[1].id)
+
+class BenchmarkEndpointsTestCase(TestCase):
+    """Tests del comando benchmark_endpoints"""
+
+    def setUp(self):
+        carpeta = tempfile.mkdtemp()
+        self.salida = os.path.join(carpeta, 'benchmark.json')
+        self.base = os.path.join(carpeta, 'base.json')
+
+    def ejecutar(self, **opciones):
+        call_command(
+            'benchmark_endpoints', escala='chica', iteraciones=1, calentamiento=0,
+            salida=self.salida, stdout=StringIO(), stderr=StringIO(), **opciones
+        )
+        with open(self.salida, encoding='utf-8') as archivo:
+            return json.load(archivo)
+
+    def test_reporte_cubre_api_y_listados(self):
+        reporte = self.ejecutar()
+        resultados = reporte['resultados']
+        for clave in (
+            'GET api:productos-list', 'GET api:ventas-list?paginacion=cursor', 'GET api:async-ventas-list',
+            'GET api:clientes-compras', 'POST api:token_obtain_pair', 'POST api:ventas-bulk',
+            'GET inventario:lista_productos', 'GET ventas:lista_ventas', 'GET ventas:detalle_cliente',
+        ):
+            self.assertIn(clave, resultados)
+        self.assertEqual(resultados['GET api:productos-list']['estado'], 200)
+        self.assertEqual(resultados['GET ventas:lista_ventas']['estado'], 200)
+        self.assertEqual(resultados['POST api:ventas-bulk']['estado'], 201)
+        for resultado in resultados.values():
+            self.assertGreaterEqual(resultado['p99_ms'], resultado['p50_ms'])
+            self.assertGreater(resultado['bytes'], 0)
+        self.assertGreaterEqual(reporte['datos']['ventas'], 5000)
+
+    def test_compara_con_linea_base(self):
+        self.ejecutar(filtro='api:productos-list')
+        # Línea base con una consulta menos: el reporte nuevo es una regresión
+        with open(self.salida, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        for resultado in base['resultados'].values():
+            resultado['consultas'] -= 1
+        with open(self.base, 'w', encoding='utf-8') as archivo:
+            json.dump(base, archivo)
+
+        with self.assertRaises(CommandError):
+            self.ejecutar(sin_generar=True, filtro='api:productos-list', base=self.base, estricto=True)
+
+    def test_comparar(self):
+        base = {
+            'a': {'p95_ms': 10.0, 'consultas': 3, 'bytes': 100},
+            'b': {'p95_ms': 10.0, 'consultas': 3, 'bytes': 100},
+            'c': {'p95_ms': 0.5, 'consultas': 3, 'bytes': 100},
+            'd': {'p95_ms': 10.0, 'consultas': 3, 'bytes': 100},
+        }
+        actual = {
+            'a': {'p95_ms': 11.0, 'consultas': 3, 'bytes': 120},   # dentro del umbral
+            'b': {'p95_ms': 15.0, 'consultas': 3, 'bytes': 100},   # 50% más lento
+            'c': {'p95_ms': 0.9, 'consultas': 3, 'bytes': 100},    # +80%, pero menos de 1 ms
+            'd': {'p95_ms': 9.0, 'consultas': 4, 'bytes': 100},    # una consulta más
+            'e': {'p95_ms': 1.0, 'consultas': 1, 'bytes': 10},     # sin base
+        }
+        filas = {clave: regresion for clave, _, regresion in comparar(actual, base, umbral=0.2, minimo_ms=1.0)}
+        self.assertEqual(filas, {'a': False, 'b': True, 'c': False, 'd': True})
+
+
+class PresupuestoConsultasAPITestCase(PresupuestoConsultasMixin, APITestCase):
+    """Cada ruta de la API declara su presupuesto de consultas y lo respeta"""
+
+    espacio = 'api'
+    # DetalleVentaSerializer no expone `venta`: el alta de detalles por la API no puede responder 201
+    escrituras_sin_medir = (('detalle-ventas-list', 'POST'),)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='presupuesto', password='clave.segura.123', is_staff=True)
+        self.refresh = RefreshToken.for_user(self.user)
+        # Sesión y no JWT: cuesta una consulta más por request (sesión y usuario), el peor caso
+        self.client.force_login(self.user)
+
+        marcas = [Marca.objects.create(nombre=f'Marca {i}') for i in range(3)]
+        proveedor = Proveedor.objects.create(nombre='Proveedor')
+        categoria = Categoria.objects.create(nombre='Categoría')
+        self.productos = [
+            Producto.objects.create(
+                nombre=f'Producto {i}', precio=1000 * (i + 1),
+                marca=marcas[i % 3], proveedor=proveedor, categoria=categoria
+            )
+            for i in range(6)
+        ]
+        self.clientes = [
+            Cliente.objects.create(rut=f'1000000{i}-{i}', nombre=f'Cliente {i}', apellido='Prueba')
+            for i in range(3)
+        ]
+        # Varias filas por listado: un N+1 se nota como consultas de más
+        self.ventas = [
+            Venta.objects.create(
+                vendedor=self.user, cliente=self.clientes[i % 3], producto=self.productos[i % 6], cantidad=1
+            )
+            for i in range(8)
+        ]
+        for venta in self.ventas[:2]:
+            for producto in self.productos[:3]:
+                DetalleVenta.objects.create(venta=venta, producto=producto, cantidad=2, precio_unitario=producto.precio)
+        self.pks = {
+            'usuarios': self.user.pk, 'marcas': marcas[0].pk, 'proveedores': proveedor.pk,
+            'categorias': categoria.pk, 'productos': self.productos[0].pk, 'clientes': self.clientes[0].pk,
+            'ventas': self.ventas[0].pk, 'detalle-ventas': DetalleVenta.objects.first().pk,
+        }
+
+    def limpiar_caches(self):
+        super().limpiar_caches()
+        usuarios.limpiar()
+        ranking.invalidar()
+
+    def test_todas_las_rutas_declaran_presupuesto(self):
+        self.assertRutasConPresupuesto()
+
+    def test_lecturas(self):
+        for nombre, (vista, usa_pk) in self.rutas().items():
+            if 'GET' not in metodos(vista):
+                continue
+            base = nombre.removeprefix('async-').rsplit('-', 1)[0]
+            self.medir('GET', nombre, self.pks[base] if usa_pk else None)
+
+    def test_lecturas_con_filtros(self):
+        producto = self.productos[0]
+        for nombre, parametros in (
+            ('productos-list', {'search': 'producto', 'marca': producto.marca_id, 'precio_min': 1}),
+            ('productos-list', {'search': 'producto'}),
+            ('async-productos-list', {'search': 'producto'}),
+            ('productos-estadisticas', {'marca': producto.marca_id}),
+            ('productos-estadisticas', {'search': 'producto', 'precio_max': 4000}),
+            ('ventas-list', {'cliente': self.clientes[0].pk, 'fecha_desde': '2000-01-01'}),
+            ('ventas-list', {'paginacion': 'cursor'}),
+            ('ventas-estadisticas', {'cliente': self.clientes[0].pk}),
+            ('ventas-serie', {'intervalo': 'hora', 'cliente': self.clientes[0].pk}),
+            ('ventas-ranking', {'por': 'clientes', 'fecha_desde': '2000-01-01'}),
+            ('ventas-exportar', {'formato': 'ndjson'}),
+            ('clientes-list', {'search': 'cliente'}),
+            ('detalle-ventas-list', {'venta': self.ventas[0].pk}),
+        ):
+            self.medir('GET', nombre, data=parametros)
+        self.medir('GET', 'clientes-compras', self.clientes[0].pk, data={'paginacion': 'cursor'})
+
+    def test_escrituras(self):
+        # Ventas primero: eliminar la categoría elimina en cascada todos los productos
+        self.escrituras_ventas()
+        self.escrituras_autenticacion()
+        self.escrituras_catalogo()
+        self.assertEscriturasMedidas()
+
+    def test_ventas_con_stock(self):
+        # Productos con stock y clientes sin resumen ni acumulados: el peor caso de cada alta
+        productos = [Producto.objects.create(nombre=f'Con stock {i}', precio=500, descripcion='desc') for i in range(3)]
+        for producto in productos:
+            stock.ajustar(producto.pk, 10)
+        clientes = [
+            Cliente.objects.create(rut=f'3000000{i}-{i}', nombre=f'Nuevo {i}', apellido='Prueba') for i in range(4)
+        ]
+        self.medir('POST', 'ventas-list', data={
+            'vendedor': self.user.pk, 'cliente': clientes[0].pk, 'producto': productos[0].pk, 'cantidad': 2,
+        })
+        self.limpiar_caches()
+        response = self.client.post(reverse('api:ventas-list'), {
+            'vendedor': self.user.pk, 'cliente': clientes[0].pk, 'producto': productos[0].pk, 'cantidad': 50,
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertLessEqual(response.consultas_sql, response.presupuesto_consultas)
+
+        # El presupuesto de la carga masiva crece con los clientes y productos del lote
+        uno = self.medir('POST', 'ventas-bulk', format='json', data=[
+            {'cliente': clientes[1].pk, 'producto': productos[1].pk, 'cantidad': 1},
+        ])
+        filas = [
+            {'cliente': clientes[1 + i % 3].pk, 'producto': productos[i % 3].pk, 'cantidad': 1} for i in range(9)
+        ]
+        # Sin stock para todo: sus filas se rechazan después de leer el disponible
+        filas.append({'cliente': clientes[1].pk, 'producto': productos[2].pk, 'cantidad': 20})
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            varios = self.medir('POST', 'ventas-bulk', format='json', data=filas)
+        self.assertEqual(varios.data['errores'], 4)
+        self.assertGreater(varios.presupuesto_consultas, uno.presupuesto_consultas)
+
+    def escrituras_autenticacion(self):
+        cliente = APIClient()
+        self.medir('POST', 'token_obtain_pair', cliente=cliente,
+                   data={'username': 'presupuesto', 'password': 'clave.segura.123'})
+        self.medir('POST', 'token_refresh', cliente=cliente, data={'refresh': str(self.refresh)})
+        self.medir('POST', 'register', cliente=cliente, data={
+            'username': 'nuevo', 'password': 'clave.segura.123', 'password_confirm': 'clave.segura.123',
+        })
+
+    def escrituras_catalogo(self):
+        marca = self.pks['marcas']
+        self.medir('POST', 'marcas-list', data={'nombre': 'Nueva'})
+        self.medir('PUT', 'marcas-detail', marca, data={'nombre': 'Editada'})
+        self.medir('PATCH', 'marcas-detail', marca, data={'nombre': 'Editada otra vez'})
+        self.medir('PATCH', 'proveedores-detail', self.pks['proveedores'], data={'telefono': '123'})
+        self.medir('PUT', 'proveedores-detail', self.pks['proveedores'], data={'nombre': 'Editado'})
+        self.medir('PATCH', 'categorias-detail', self.pks['categorias'], data={'descripcion': 'Editada'})
+        self.medir('PUT', 'categorias-detail', self.pks['categorias'], data={'nombre': 'Editada'})
+        self.medir('POST', 'proveedores-list', data={'nombre': 'Nuevo'})
+        self.medir('POST', 'categorias-list', data={'nombre': 'Nueva'})
+        self.medir('POST', 'productos-list', data={
+            'nombre': 'Nuevo', 'precio': 5000, 'marca': marca, 'proveedor': self.pks['proveedores'],
+            'categoria': self.pks['categorias'], 'descripcion': 'Nuevo producto',
+        })
+        self.medir('PATCH', 'productos-detail', self.pks['productos'], data={'precio': 1500})
+        self.medir('PUT', 'productos-detail', self.pks['productos'], data={
+            'nombre': 'Editado', 'precio': 1600, 'marca': marca, 'proveedor': self.pks['proveedores'],
+            'categoria': self.pks['categorias'], 'descripcion': 'Editado',
+        })
+        # El primer ajuste crea la fila de stock; el segundo la actualiza
+        self.medir('POST', 'productos-stock', self.pks['productos'], data={'cantidad': 10})
+        self.medir('POST', 'productos-stock', self.pks['productos'], data={'cantidad': 8})
+        self.medir('DELETE', 'productos-detail', self.productos[-1].pk)
+        # En cascada: productos de la marca, sus ventas y detalles
+        self.medir('DELETE', 'marcas-detail', self.productos[-2].marca_id)
+        self.medir('DELETE', 'proveedores-detail', Proveedor.objects.create(nombre='Sin productos').pk)
+        self.medir('DELETE', 'categorias-detail', self.pks['categorias'])
+
+    def escrituras_ventas(self):
+        cliente, producto = self.pks['clientes'], self.pks['productos']
+        self.medir('POST', 'clientes-list', data={'rut': '2000000-2', 'nombre': 'Nuevo', 'apellido': 'Cliente'})
+        self.medir('PATCH', 'clientes-detail', cliente, data={'telefono': '123'})
+        self.medir('PUT', 'clientes-detail', cliente, data={'rut': '1000000-0', 'nombre': 'Otro', 'apellido': 'Cliente'})
+        self.medir('POST', 'ventas-list', data={
+            'vendedor': self.user.pk, 'cliente': cliente, 'producto': producto, 'cantidad': 2,
+        })
+        self.medir('PATCH', 'ventas-detail', self.pks['ventas'], data={'cantidad': 3})
+        self.medir('PUT', 'ventas-detail', self.pks['ventas'], data={
+            'vendedor': self.user.pk, 'cliente': cliente, 'producto': producto, 'cantidad': 4,
+        })
+        self.medir('DELETE', 'ventas-detail', self.ventas[-1].pk)
+        self.medir('POST', 'ventas-bulk', format='json', data=[
+            {'cliente': self.clientes[i % 3].pk, 'producto': self.productos[i % 6].pk, 'cantidad': 1}
+            for i in range(10)
+        ])
+        self.medir('PATCH', 'detalle-ventas-detail', self.pks['detalle-ventas'], data={'cantidad': 3})
+        self.medir('PUT', 'detalle-ventas-detail', self.pks['detalle-ventas'], data={
+            'venta': self.pks['ventas'], 'producto': producto, 'cantidad': 2, 'precio_unitario': 1000,
+        })
+        self.medir('DELETE', 'detalle-ventas-detail', self.pks['detalle-ventas'])
+        self.medir('DELETE', 'clientes-detail', self.clientes[-1].pk)
+
 
 class APIPermissionsTestCase(APITestCase):
     """Tests para permisos de la API"""
@@ -126,3 +1299,15 @@ class APIPermissionsTestCase(APITestCase):
         for endpoint in endpoints:
             response = self.client.get(endpoint)
             self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_estado_pool_solo_staff(self):
+        url = reverse('api:estado_pool')
+        user = User.objects.create_user(username='comun', password='x')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        
+        user.is_staff = True
+        self.client.force_authenticate(user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('pools', response.data)
@@ -1,14 +1,17 @@
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
+from rest_framework.routers import APIRootView, DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from pc_shop.instrumentacion import presupuesto_consultas
+from .asincrono import RUTAS as RUTAS_ASYNC, vista_async
 from .views import (
-    RegisterView, UserViewSet,
+    RegisterView, UserViewSet, EstadoPoolView,
     MarcaViewSet, ProveedorViewSet, CategoriaViewSet, ProductoViewSet,
     ClienteViewSet, VentaViewSet, DetalleVentaViewSet
 )
 
+@presupuesto_consultas(2)
 @api_view(['GET'])
 def api_home(request):
     """Vista principal de la API"""
@@ -36,8 +39,13 @@ def api_home(request):
         }
     })
 
+class RaizAPIView(APIRootView):
+    """Raíz navegable del router, con su presupuesto de consultas"""
+    presupuesto_consultas = 2
+
 # Configuración del router para las API ViewSets
 router = DefaultRouter()
+router.APIRootView = RaizAPIView
 router.register(r'usuarios', UserViewSet, basename='usuarios')
 router.register(r'marcas', MarcaViewSet, basename='marcas')
 router.register(r'proveedores', ProveedorViewSet, basename='proveedores')
@@ -54,10 +62,19 @@ urlpatterns = [
     path('', api_home, name='api_home'),
     
     # Autenticación
-    path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/login/', presupuesto_consultas(1)(TokenObtainPairView.as_view()), name='token_obtain_pair'),
+    path('auth/refresh/', presupuesto_consultas(0)(TokenRefreshView.as_view()), name='token_refresh'),
     path('auth/register/', RegisterView.as_view(), name='register'),
     
+    # Monitoreo
+    path('estado/pool/', EstadoPoolView.as_view(), name='estado_pool'),
+    
+    # Lecturas async para ASGI (mismas respuestas; ver asincrono.py)
+    *[
+        path(f'async/{ruta}', vista_async(viewset, accion), name=f'async-{nombre}')
+        for ruta, viewset, accion, nombre in RUTAS_ASYNC
+    ],
+    
     # API endpoints
     path('', include(router.urls)),
 ]
@@ -99,10 +116,20 @@ VENTAS:
 - GET|POST /api/ventas/ - Listar/crear ventas
 - GET|PUT|DELETE /api/ventas/{id}/ - Detalle/editar/eliminar venta  
 - GET /api/ventas/estadisticas/ - Estadísticas de ventas
+- GET /api/ventas/serie/ - Serie de tiempo de ventas (?intervalo=hora|dia|semana|mes)
+- GET /api/ventas/ranking/ - Top N de productos, clientes o vendedores
 
 - GET|POST /api/detalle-ventas/ - Listar/crear detalles de venta
 - GET|PUT|DELETE /api/detalle-ventas/{id}/ - Detalle/editar/eliminar detalle
 
+LECTURAS ASYNC (ASGI), mismas respuestas y parámetros que las rutas sync:
+- GET /api/async/productos/, /api/async/productos/{id}/, /api/async/productos/estadisticas/
+- GET /api/async/ventas/, /api/async/ventas/{id}/, /api/async/ventas/estadisticas/
+- GET /api/async/clientes/, /api/async/clientes/{id}/, /api/async/clientes/{id}/compras/
+
+MONITOREO (solo staff):
+- GET /api/estado/pool/ - Estadísticas del pool de conexiones del proceso
+
 PARÁMETROS DE CONSULTA DISPONIBLES:
 
 Productos:
@@ -1,19 +1,41 @@
+import os
+from datetime import date
 from rest_framework import generics, viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth.models import User
-from django.db.models import Q, Sum
-from inventario.models import Marca, Proveedor, Categoria, Producto
+from django.db.models import Count, Q, Sum
+from inventario.models import Marca, Proveedor, Categoria, Producto, MovimientoStock, StockProducto
+from inventario.stock import StockInsuficiente, ajustar
+from inventario.busqueda import filtrar_por_busqueda
+from inventario.estadisticas import estadisticas_productos, normalizar_filtros
 from ventas.models import Cliente, Venta, DetalleVenta
+from ventas import ranking, resumenes, rollups
+from ventas.filtros import filtrar_ventas
+from ventas.ingesta import consultas_maximas, registrar_lote
+from ventas.series import INTERVALOS as INTERVALOS_SERIE, SerieDemasiadoLarga, serie_ventas
+from pc_shop.backends import pool
+from pc_shop.instrumentacion import ampliar_presupuesto
 from .serializers import (
     UserSerializer, RegisterSerializer,
     MarcaSerializer, ProveedorSerializer, CategoriaSerializer,
     ProductoSerializer, ProductoListSerializer,
     ClienteSerializer, VentaSerializer, VentaListSerializer, VentaCreateSerializer,
-    DetalleVentaSerializer
+    DetalleVentaSerializer, VentaBulkItemSerializer
 )
+from .pagination import VentaPagination
+from .condicional import ETagMixin
+from .exportacion import FORMATOS as FORMATOS_EXPORTACION, respuesta_exportacion
+
+# Límite de filas por request en /ventas/bulk/
+MAX_VENTAS_BULK = 5000
+
+# Movimientos recientes que muestra /productos/<pk>/stock/
+MAX_MOVIMIENTOS_STOCK = 50
 
 # ==================== AUTENTICACIÓN ====================
 
@@ -21,6 +43,7 @@ class RegisterView(generics.CreateAPIView):
     """Vista para registrar nuevos usuarios"""
     serializer_class = RegisterSerializer
     permission_classes = [AllowAny]
+    presupuesto_consultas = 2
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -38,31 +61,44 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.filter(is_active=True)
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    presupuesto_consultas = {'list': 4, 'retrieve': 3}
 
 # ==================== INVENTARIO ====================
 
-class MarcaViewSet(viewsets.ModelViewSet):
+class MarcaViewSet(ETagMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar marcas"""
     queryset = Marca.objects.all()
     serializer_class = MarcaSerializer
     permission_classes = [IsAuthenticated]
+    presupuesto_consultas = {
+        'list': 5, 'retrieve': 4, 'productos': 5, 'create': 6, 'update': 6, 'partial_update': 6,
+        'destroy': 42,
+    }
+    
+    def get_queryset(self):
+        # El conteo de productos se calcula en una sola consulta agrupada
+        return Marca.objects.annotate(productos_count=Count('productos')).order_by('id')
     
     @action(detail=True, methods=['get'])
     def productos(self, request, pk=None):
         """Obtener todos los productos de una marca"""
         marca = self.get_object()
-        productos = marca.productos.all()
+        productos = marca.productos.select_related('marca', 'proveedor', 'categoria')
         serializer = ProductoListSerializer(productos, many=True)
         return Response(serializer.data)
 
-class ProveedorViewSet(viewsets.ModelViewSet):
+class ProveedorViewSet(ETagMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar proveedores"""
     queryset = Proveedor.objects.all()
     serializer_class = ProveedorSerializer
     permission_classes = [IsAuthenticated]
+    presupuesto_consultas = {
+        'list': 5, 'retrieve': 4, 'productos': 5, 'create': 6, 'update': 6, 'partial_update': 6,
+        'destroy': 28,
+    }
     
     def get_queryset(self):
-        queryset = Proveedor.objects.all()
+        queryset = Proveedor.objects.annotate(productos_count=Count('productos')).order_by('id')
         search = self.request.query_params.get('search', None)
         if search:
             queryset = queryset.filter(
@@ -75,28 +111,39 @@ class ProveedorViewSet(viewsets.ModelViewSet):
     def productos(self, request, pk=None):
         """Obtener todos los productos de un proveedor"""
         proveedor = self.get_object()
-        productos = proveedor.productos.all()
+        productos = proveedor.productos.select_related('marca', 'proveedor', 'categoria')
         serializer = ProductoListSerializer(productos, many=True)
         return Response(serializer.data)
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(ETagMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar categorías"""
     queryset = Categoria.objects.all()
     serializer_class = CategoriaSerializer
     permission_classes = [IsAuthenticated]
+    presupuesto_consultas = {
+        'list': 5, 'retrieve': 4, 'productos': 5, 'create': 6, 'update': 6, 'partial_update': 6,
+        'destroy': 6,
+    }
+    
+    def get_queryset(self):
+        return Categoria.objects.annotate(productos_count=Count('productos')).order_by('id')
     
     @action(detail=True, methods=['get'])
     def productos(self, request, pk=None):
         """Obtener todos los productos de una categoría"""
         categoria = self.get_object()
-        productos = categoria.productos.all()
+        productos = categoria.productos.select_related('marca', 'proveedor', 'categoria')
         serializer = ProductoListSerializer(productos, many=True)
         return Response(serializer.data)
 
-class ProductoViewSet(viewsets.ModelViewSet):
+class ProductoViewSet(ETagMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar productos"""
     queryset = Producto.objects.select_related('marca', 'proveedor', 'categoria').all()
     permission_classes = [IsAuthenticated]
+    presupuesto_consultas = {
+        'list': 7, 'retrieve': 4, 'estadisticas': 10, 'create': 8, 'update': 10, 'partial_update': 7,
+        'destroy': 20, 'stock': 12,
+    }
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -109,10 +156,8 @@ class ProductoViewSet(viewsets.ModelViewSet):
         # Filtros de búsqueda
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(nombre__icontains=search) | 
-                Q(descripcion__icontains=search)
-            )
+            # Resuelve los ids en el índice en memoria, ordenados por relevancia
+            queryset = filtrar_por_busqueda(queryset, search)
         
         # Filtros por relaciones
         marca = self.request.query_params.get('marca', None)
@@ -140,21 +185,35 @@ class ProductoViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def estadisticas(self, request):
-        """Estadísticas generales de productos"""
-        total_productos = self.get_queryset().count()
-        precio_promedio = self.get_queryset().aggregate(
-            promedio=Sum('precio')
-        )['promedio'] or 0
-        
-        if total_productos > 0:
-            precio_promedio = precio_promedio / total_productos
+        """Estadísticas generales de productos (en caché por conjunto de filtros)"""
+        filtros = normalizar_filtros(request.query_params)
+        return Response(estadisticas_productos(self.get_queryset(), filtros))
+    
+    @action(detail=True, methods=['get', 'post'])
+    def stock(self, request, pk=None):
+        """Stock del producto y sus últimos movimientos; POST {cantidad} (staff) lo fija tras un inventario"""
+        producto = self.get_object()
+        if request.method == 'POST':
+            if not request.user.is_staff:
+                raise PermissionDenied('Solo el personal puede ajustar el stock.')
+            try:
+                cantidad = int(request.data.get('cantidad'))
+            except (TypeError, ValueError):
+                cantidad = -1
+            if cantidad < 0:
+                raise ValidationError({'cantidad': 'Se espera un entero no negativo.'})
+            ajustar(producto.pk, cantidad, request.user.pk)
         
+        movimientos = (
+            MovimientoStock.objects.filter(producto=producto)
+            .order_by('-fecha', '-id')
+            .values('id', 'cantidad', 'motivo', 'venta_id', 'usuario_id', 'fecha')[:MAX_MOVIMIENTOS_STOCK]
+        )
         return Response({
-            'total_productos': total_productos,
-            'precio_promedio': round(precio_promedio, 2),
-            'total_marcas': Marca.objects.count(),
-            'total_proveedores': Proveedor.objects.count(),
-            'total_categorias': Categoria.objects.count(),
+            'producto': producto.pk,
+            # None: el producto no controla stock
+            'cantidad': StockProducto.objects.filter(producto=producto).values_list('cantidad', flat=True).first(),
+            'movimientos': list(movimientos),
         })
 
 # ==================== VENTAS ====================
@@ -164,9 +223,13 @@ class ClienteViewSet(viewsets.ModelViewSet):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
     permission_classes = [IsAuthenticated]
+    presupuesto_consultas = {
+        'list': 4, 'retrieve': 3, 'compras': 4, 'create': 5, 'update': 5, 'partial_update': 4,
+        'destroy': 33,
+    }
     
     def get_queryset(self):
-        queryset = Cliente.objects.all()
+        queryset = Cliente.objects.select_related('resumen')
         search = self.request.query_params.get('search', None)
         if search:
             queryset = queryset.filter(
@@ -177,11 +240,24 @@ class ClienteViewSet(viewsets.ModelViewSet):
             )
         return queryset
     
+    def get_compras(self, cliente_id):
+        return Venta.objects.filter(cliente_id=cliente_id).select_related(
+            'vendedor', 'cliente', 'producto'
+        ).order_by('-fecha', '-id')
+    
     @action(detail=True, methods=['get'])
     def compras(self, request, pk=None):
         """Obtener todas las compras de un cliente"""
         cliente = self.get_object()
-        ventas = cliente.compras.all().order_by('-fecha')
+        ventas = self.get_compras(cliente.pk)
+        
+        # Modo cursor opcional; sin él se mantiene la lista completa
+        paginator = VentaPagination()
+        if paginator.usa_cursor(request):
+            page = paginator.paginate_queryset(ventas, request, view=self)
+            serializer = VentaListSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+        
         serializer = VentaListSerializer(ventas, many=True)
         return Response(serializer.data)
 
@@ -189,6 +265,12 @@ class VentaViewSet(viewsets.ModelViewSet):
     """ViewSet para gestionar ventas"""
     queryset = Venta.objects.select_related('vendedor', 'cliente', 'producto').all()
     permission_classes = [IsAuthenticated]
+    pagination_class = VentaPagination
+    # bulk: la autenticación; `bulk` suma lo que crece con el lote (ver `consultas_maximas`)
+    presupuesto_consultas = {
+        'list': 4, 'retrieve': 5, 'estadisticas': 4, 'serie': 3, 'ranking': 6, 'exportar': 2, 'bulk': 2,
+        'create': 18, 'update': 25, 'partial_update': 22, 'destroy': 14,
+    }
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -198,48 +280,201 @@ class VentaViewSet(viewsets.ModelViewSet):
         return VentaSerializer
     
     def get_queryset(self):
-        queryset = self.queryset.order_by('-fecha')
+        queryset = self.queryset.order_by('-fecha', '-id')
+        if self.action == 'retrieve':
+            # VentaSerializer incluye los detalles con el nombre de su producto
+            queryset = queryset.prefetch_related('detalles__producto')
         
-        # Filtro por vendedor
-        vendedor = self.request.query_params.get('vendedor', None)
-        if vendedor:
-            queryset = queryset.filter(vendedor_id=vendedor)
+        params = self.request.query_params
+        fecha_desde, fecha_hasta = self.rango_fechas()
+        return filtrar_ventas(
+            queryset,
+            vendedor=params.get('vendedor'),
+            cliente=params.get('cliente'),
+            producto=params.get('producto'),
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+        )
+    
+    def rango_fechas(self):
+        """?fecha_desde / ?fecha_hasta (YYYY-MM-DD, inclusivas) como `date`; 400 si no son fechas"""
+        fechas = []
+        for nombre in ('fecha_desde', 'fecha_hasta'):
+            valor = self.request.query_params.get(nombre)
+            try:
+                fechas.append(date.fromisoformat(valor) if valor else None)
+            except ValueError:
+                raise ValidationError({nombre: 'Fecha inválida, se espera YYYY-MM-DD.'})
+        return fechas
+    
+    def perform_create(self, serializer):
+        # Asignar el vendedor actual
+        try:
+            serializer.save(vendedor=self.request.user)
+        except StockInsuficiente as error:
+            raise ValidationError({'cantidad': [str(error)]})
+    
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except StockInsuficiente as error:
+            raise ValidationError({'cantidad': [str(error)]})
+    
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Exporta las ventas filtradas en streaming (?formato=csv|ndjson, ?gzip=1)"""
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS_EXPORTACION:
+            return Response(
+                {'detail': f'Formato no soportado. Opciones: {", ".join(FORMATOS_EXPORTACION)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        comprimir = request.query_params.get('gzip') in ('1', 'true')
+        return respuesta_exportacion(self.get_queryset(), formato, comprimir)
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Carga masiva de ventas: lista de filas {cliente, producto, cantidad}"""
+        filas = request.data
+        if not isinstance(filas, list):
+            return Response({'detail': 'Se esperaba una lista de ventas.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(filas) > MAX_VENTAS_BULK:
+            return Response(
+                {'detail': f'Máximo {MAX_VENTAS_BULK} ventas por carga.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Filtro por cliente
-        cliente = self.request.query_params.get('cliente', None)
-        if cliente:
-            queryset = queryset.filter(cliente_id=cliente)
+        # Primero la forma de cada fila; luego el lote completo contra la BD
+        validas = []
+        resultados = [None] * len(filas)
+        for i, fila in enumerate(filas):
+            serializer = VentaBulkItemSerializer(data=fila)
+            if serializer.is_valid():
+                validas.append((i, serializer.validated_data))
+            else:
+                resultados[i] = {'estado': 'error', 'errores': serializer.errors}
         
-        # Filtro por producto
-        producto = self.request.query_params.get('producto', None)
-        if producto:
-            queryset = queryset.filter(producto_id=producto)
+        todo_o_nada = request.query_params.get('todo_o_nada') in ('1', 'true')
+        creadas = []
+        if todo_o_nada and len(validas) < len(filas):
+            resultados_lote = [{'estado': 'omitida'} for _ in validas]
+        else:
+            lote = [datos for _, datos in validas]
+            ampliar_presupuesto(request, consultas_maximas(lote))
+            resultados_lote, creadas = registrar_lote(request.user, lote, todo_o_nada=todo_o_nada)
         
-        # Filtro por fecha
-        fecha_desde = self.request.query_params.get('fecha_desde', None)
-        if fecha_desde:
-            queryset = queryset.filter(fecha__date__gte=fecha_desde)
-            
-        fecha_hasta = self.request.query_params.get('fecha_hasta', None)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha__date__lte=fecha_hasta)
+        for (i, _), resultado in zip(validas, resultados_lote):
+            venta = resultado.pop('venta', None)
+            if venta is not None:
+                resultado.update({'id': venta.pk, 'total_venta': venta.total_venta, 'fecha': venta.fecha})
+            resultados[i] = resultado
+        for i, resultado in enumerate(resultados):
+            resultado['fila'] = i
         
-        return queryset
+        return Response({
+            'creadas': len(creadas),
+            'errores': sum(1 for r in resultados if r['estado'] == 'error'),
+            'resultados': resultados,
+        }, status=status.HTTP_201_CREATED if creadas else status.HTTP_400_BAD_REQUEST)
     
-    def perform_create(self, serializer):
-        # Asignar el vendedor actual
-        serializer.save(vendedor=self.request.user)
+    @action(detail=False, methods=['get'])
+    def serie(self, request):
+        """Serie de tiempo por período (?intervalo=hora|dia|semana|mes) con los filtros del listado"""
+        params = request.query_params
+        intervalo = params.get('intervalo', 'dia')
+        if intervalo not in INTERVALOS_SERIE:
+            return Response(
+                {'detail': f'Intervalo no soportado. Opciones: {", ".join(INTERVALOS_SERIE)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        fecha_desde, fecha_hasta = self.rango_fechas()
+        try:
+            puntos = serie_ventas(
+                intervalo,
+                vendedor=params.get('vendedor'),
+                cliente=params.get('cliente'),
+                producto=params.get('producto'),
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+            )
+        except SerieDemasiadoLarga as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'intervalo': intervalo,
+            'zona_horaria': str(rollups.zona_horaria()),
+            'puntos': puntos,
+        })
     
     @action(detail=False, methods=['get'])
-    def estadisticas(self, request):
-        """Estadísticas de ventas"""
-        queryset = self.get_queryset()
+    def ranking(self, request):
+        """Top N de productos, clientes o vendedores (?por=, ?criterio=ingresos|unidades, ?n=, ?ventana=)"""
+        params = request.query_params
+        por = params.get('por', 'productos')
+        criterio = params.get('criterio', 'ingresos')
+        ventana = params.get('ventana')
+        for nombre, valor, opciones in (
+            ('por', por, ranking.DIMENSIONES),
+            ('criterio', criterio, ranking.CRITERIOS),
+            ('ventana', ventana or ranking.VENTANAS[0], ranking.VENTANAS),
+        ):
+            if valor not in opciones:
+                return Response(
+                    {'detail': f'{nombre} no soportado. Opciones: {", ".join(opciones)}.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        try:
+            n = int(params.get('n', 10))
+        except ValueError:
+            n = 0
+        if not 1 <= n <= ranking.MAX_N:
+            return Response(
+                {'detail': f'n debe ser un entero entre 1 y {ranking.MAX_N}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        total_ventas = queryset.count()
-        total_ingresos = queryset.aggregate(
-            total=Sum('total_venta')
-        )['total'] or 0
+        fecha_desde, fecha_hasta = self.rango_fechas()
+        filtros = {
+            'vendedor': params.get('vendedor'),
+            'cliente': params.get('cliente'),
+            'producto': params.get('producto'),
+            'fecha_desde': fecha_desde,
+            'fecha_hasta': fecha_hasta,
+        }
+        hay_filtros = any(filtros.values())
+        if ventana and hay_filtros:
+            return Response(
+                {'detail': 'ventana no se combina con filtros; usar fecha_desde y fecha_hasta.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not hay_filtros:
+            ventana = ventana or '30d'
         
+        resultado = ranking.ranking(por, criterio, n, ventana=ventana, **filtros)
+        return Response({'por': por, 'criterio': criterio, 'ventana': ventana, **resultado})
+    
+    @action(detail=False, methods=['get'])
+    def estadisticas(self, request):
+        """Estadísticas de ventas (desde los acumulados diarios)"""
+        params = request.query_params
+        if params.get('cliente'):
+            # Los acumulados no se separan por cliente; el libro de un cliente es acotado
+            totales = self.get_queryset().order_by().aggregate(
+                total_ventas=Count('id'),
+                total_ingresos=Sum('total_venta'),
+                total_unidades=Sum('cantidad'),
+            )
+            totales = {clave: valor or 0 for clave, valor in totales.items()}
+        else:
+            fecha_desde, fecha_hasta = self.rango_fechas()
+            totales = rollups.estadisticas(
+                vendedor=params.get('vendedor'),
+                producto=params.get('producto'),
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+            )
+        
+        total_ventas = totales['total_ventas']
+        total_ingresos = totales['total_ingresos']
         promedio_venta = 0
         if total_ventas > 0:
             promedio_venta = total_ingresos / total_ventas
@@ -247,8 +482,9 @@ class VentaViewSet(viewsets.ModelViewSet):
         return Response({
             'total_ventas': total_ventas,
             'total_ingresos': total_ingresos,
+            'total_unidades': totales['total_unidades'],
             'promedio_venta': round(promedio_venta, 2),
-            'total_clientes': Cliente.objects.count(),
+            'total_clientes': resumenes.total_clientes(),
         })
 
 class DetalleVentaViewSet(viewsets.ModelViewSet):
@@ -256,6 +492,9 @@ class DetalleVentaViewSet(viewsets.ModelViewSet):
     queryset = DetalleVenta.objects.select_related('venta', 'producto').all()
     serializer_class = DetalleVentaSerializer
     permission_classes = [IsAuthenticated]
+    presupuesto_consultas = {
+        'list': 4, 'retrieve': 3, 'create': 3, 'update': 5, 'partial_update': 4, 'destroy': 4,
+    }
     
     def get_queryset(self):
         queryset = self.queryset
@@ -263,3 +502,13 @@ class DetalleVentaViewSet(viewsets.ModelViewSet):
         if venta:
             queryset = queryset.filter(venta_id=venta)
         return queryset
+
+# ==================== MONITOREO ====================
+
+class EstadoPoolView(APIView):
+    """Estado del pool de conexiones de este proceso (solo staff)"""
+    permission_classes = [IsAdminUser]
+    presupuesto_consultas = 2
+    
+    def get(self, request):
+        return Response({'pid': os.getpid(), 'pools': pool.estadisticas()})
@@ -1,3 +1,89 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from app_shop import views as shop_views
+from inventario import views as inventario_views
+from inventario.models import Categoria, Marca, Producto, Proveedor
+from ventas import views as ventas_views
+from ventas.models import Cliente, DetalleVenta, Venta
+
+# Las vistas paginan de a 5 filas
+TAMANO_PAGINA = 5
+
+VISTAS_LISTA = [
+    (modulo, nombre)
+    for modulo in (inventario_views, shop_views)
+    for nombre in ('lista_productos', 'lista_marcas', 'lista_proveedores', 'lista_categorias')
+] + [
+    (modulo, nombre)
+    for modulo in (ventas_views, shop_views)
+    for nombre in ('lista_ventas', 'lista_clientes')
+]
+
+
+class ConsultasVistasHTMLTestCase(TestCase):
+    """Las vistas HTML cargan las relaciones en la misma consulta (sin N+1)"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.sembrados = 0
+
+    def sembrar(self, n):
+        for _ in range(n):
+            i = self.sembrados
+            self.sembrados += 1
+            marca = Marca.objects.create(nombre=f'Marca {i}')
+            proveedor = Proveedor.objects.create(nombre=f'Proveedor {i}')
+            categoria = Categoria.objects.create(nombre=f'Categoria {i}')
+            producto = Producto.objects.create(
+                nombre=f'Producto {i}', precio=100 + i, descripcion='',
+                marca=marca, proveedor=proveedor, categoria=categoria,
+            )
+            cliente = Cliente.objects.create(rut=f'{i}-K', nombre=f'Cliente {i}', apellido='Test')
+            vendedor = User.objects.create_user(username=f'vendedor{i}')
+            Venta.objects.create(vendedor=vendedor, cliente=cliente, producto=producto, cantidad=1)
+
+    def consultas(self, vista, *args):
+        request = self.factory.get('/')
+        request.user = self.user
+        with CaptureQueriesContext(connection) as ctx:
+            response = vista(request, *args)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_listas_no_crecen_con_la_pagina(self):
+        self.sembrar(1)
+        con_una = {(m.__name__, n): self.consultas(getattr(m, n)) for m, n in VISTAS_LISTA}
+        self.sembrar(TAMANO_PAGINA)
+        for modulo, nombre in VISTAS_LISTA:
+            with self.subTest(vista=f'{modulo.__name__}.{nombre}'):
+                self.assertEqual(self.consultas(getattr(modulo, nombre)), con_una[(modulo.__name__, nombre)])
+
+    def test_detalles_en_una_consulta(self):
+        self.sembrar(1)
+        producto = Producto.objects.get()
+        venta = Venta.objects.get()
+        for vista, pk in [
+            (inventario_views.detalle_producto, producto.pk),
+            (shop_views.detalle_producto, producto.pk),
+            (ventas_views.detalle_producto, producto.pk),
+            (ventas_views.detalle_cliente, venta.cliente_id),
+            (ventas_views.eliminar_venta, venta.pk),
+            (shop_views.eliminar_venta, venta.pk),
+        ]:
+            with self.subTest(vista=f'{vista.__module__}.{vista.__name__}'):
+                self.assertEqual(self.consultas(vista, pk), 1)
+
+    def test_detalle_venta_no_crece_con_los_items(self):
+        self.sembrar(TAMANO_PAGINA)
+        venta = Venta.objects.first()
+        DetalleVenta.objects.create(venta=venta, producto=venta.producto, cantidad=1, precio_unitario=1)
+        con_uno = self.consultas(ventas_views.detalle_venta, venta.pk)
+        for producto in Producto.objects.all():
+            DetalleVenta.objects.create(venta=venta, producto=producto, cantidad=2, precio_unitario=1)
+        self.assertEqual(self.consultas(ventas_views.detalle_venta, venta.pk), con_uno)
+        # Venta con cliente y vendedor + detalles + productos de los detalles
+        self.assertEqual(con_uno, 3)
@@ -3,12 +3,14 @@ from django.shortcuts import render, redirect, get_object_or_404
 from inventario.models import Producto, Marca, Proveedor, Categoria
 from ventas.models import Cliente, Venta
 from inventario.forms import ProductoForm, MarcaForm, ProveedorForm, CategoriaForm
+from inventario.busqueda import filtrar_por_busqueda
 from app_shop.forms import CustomUserCreationForm, UserEditForm
 from ventas.forms import ClienteForm, VentaForm
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db.models import Q
+from pc_shop.instrumentacion import presupuesto_consultas
 
 
 def registro(request):
@@ -39,16 +41,12 @@ def lista_productos(request):
 
     # --- 2. LÓGICA DE LISTAR Y BUSCAR (GET) ---
     # Obtenemos TODOS los productos, los más nuevos primero
-    productos_list = Producto.objects.all().order_by('-id')
+    productos_list = Producto.objects.select_related('marca', 'proveedor', 'categoria').order_by('-id')
 
-    # Filtramos si hay búsqueda
+    # Filtramos si hay búsqueda (índice en memoria, ver inventario/busqueda.py)
     busqueda = request.GET.get("buscar")
     if busqueda:
-        productos_list = productos_list.filter(
-            Q(nombre__icontains=busqueda) |
-            Q(marca__nombre__icontains=busqueda) |
-            Q(categoria__nombre__icontains=busqueda)
-        ).distinct()
+        productos_list = filtrar_por_busqueda(productos_list, busqueda)
 
     # --- 3. LÓGICA DE PAGINACIÓN ---
     # Aquí defines cuántos productos por página quieres. Probemos con 5 para empezar.
@@ -321,9 +319,12 @@ def eliminar_usuario(request, pk):
         return redirect('lista_usuarios')
     return render(request, 'usuarios/eliminar_usuario.html', {'usuario': usuario})
 
+# Estas vistas atienden /ventas/, /ventas/crear/, ... antes que las de la app ventas
+# (ver pc_shop/urls.py): llevan el mismo presupuesto que ellas
+@presupuesto_consultas(4)
 @login_required
 def lista_ventas(request):
-    ventas_list = Venta.objects.all().order_by('-fecha')
+    ventas_list = Venta.objects.select_related('cliente', 'producto', 'vendedor').order_by('-fecha', '-id')
     busqueda = request.GET.get('buscar')
     if busqueda:
         ventas_list = ventas_list.filter(
@@ -335,34 +336,35 @@ def lista_ventas(request):
     page_obj = paginator.get_page(page_number)
     return render(request, 'ventas/lista_ventas.html', {'ventas': page_obj})
 
+@presupuesto_consultas({'get': 2, 'post': 19})
 @login_required
 def crear_venta(request):
     if request.method == 'POST':
         form = VentaForm(request.POST)
-        if form.is_valid():
-            venta = form.save(commit=False) # Pausamos el guardado un momento
-            venta.vendedor = request.user   # Asignamos el usuario logueado como vendedor
-            venta.save()                    # Ahora sí guardamos definitivamente (se calcula el total solo)
+        # El vendedor es el usuario logueado; el total lo calcula el modelo
+        if form.is_valid() and form.guardar(vendedor=request.user):
             return redirect('ventas:lista_ventas')
     else:
         form = VentaForm()
     return render(request, 'ventas/crear_venta.html', {'form': form})
 
+@presupuesto_consultas({'get': 5, 'post': 36})
 @login_required
 def editar_venta(request, pk):
     venta = get_object_or_404(Venta, pk=pk)
     if request.method == 'POST':
         form = VentaForm(request.POST, instance=venta)
-        if form.is_valid():
-            form.save() # El método save() del modelo recalculará el total automáticamente
+        # El método save() del modelo recalculará el total automáticamente
+        if form.is_valid() and form.guardar():
             return redirect('ventas:lista_ventas')
     else:
         form = VentaForm(instance=venta)
     return render(request, 'ventas/editar_venta.html', {'form': form, 'venta': venta})
 
+@presupuesto_consultas({'get': 3, 'post': 15})
 @login_required
 def eliminar_venta(request, pk):
-    venta = get_object_or_404(Venta, pk=pk)
+    venta = get_object_or_404(Venta.objects.select_related('cliente'), pk=pk)
     if request.method == 'POST':
         venta.delete()
         return redirect('ventas:lista_ventas')
@@ -370,5 +372,5 @@ def eliminar_venta(request, pk):
 
 @login_required
 def detalle_producto(request, pk):
-    producto = get_object_or_404(Producto, pk=pk)
+    producto = get_object_or_404(Producto.objects.select_related('marca', 'proveedor', 'categoria'), pk=pk)
     return render(request, 'productos/detalle_producto.html', {'producto': producto})
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+Autocompletado para claves foráneas de formularios con tablas grandes.
+
+`AutocompletarSelect` reemplaza a `forms.Select`: en el HTML solo se incluye
+la opción seleccionada (una consulta por clave primaria) y el resto se pide a
+un endpoint JSON mientras se escribe. La validación sigue en el servidor: el
+`ModelChoiceField` comprueba que el id enviado exista en su queryset.
+
+Los endpoints buscan por prefijo (`istartswith`, que usa el índice B-tree de
+la columna) o, para productos, en el índice invertido de `busqueda.py`.
+"""
+from django import forms
+from django.db.models import Q
+from django.http import JsonResponse
+from django.urls import reverse
+
+LIMITE = 20
+LIMITE_MAXIMO = 50
+
+
+class AutocompletarSelect(forms.Select):
+    """Select que solo renderiza la opción elegida y carga el resto vía `url`."""
+
+    class Media:
+        js = ('inventario/js/autocompletar.js',)
+
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocompletar'] = reverse(self.url)
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        campo = self.choices.field
+        seleccionados = {str(v) for v in value if v not in campo.empty_values}
+        opciones = [self.create_option(name, '', campo.empty_label or '', not seleccionados, 0)]
+        if seleccionados:
+            for obj in campo.queryset.filter(pk__in=seleccionados):
+                opciones.append(self.create_option(
+                    name, obj.pk, campo.label_from_instance(obj), True, len(opciones)
+                ))
+        return [(None, opciones, 0)]
+
+
+def filtro_prefijo(texto, campos):
+    """Q que exige que cada término sea prefijo de alguno de `campos`."""
+    filtro = Q()
+    for termino in texto.split():
+        filtro &= Q(*[Q(**{f'{campo}__istartswith': termino}) for campo in campos], _connector=Q.OR)
+    return filtro
+
+
+def limite(request):
+    try:
+        valor = int(request.GET.get('limite', LIMITE))
+    except ValueError:
+        valor = LIMITE
+    return max(1, min(valor, LIMITE_MAXIMO))
+
+
+def respuesta(objetos, limite):
+    """JSON con hasta `limite` objetos de `objetos` (que trae uno de más para `hay_mas`)."""
+    objetos = list(objetos)
+    return JsonResponse({
+        'resultados': [{'id': obj.pk, 'texto': str(obj)} for obj in objetos[:limite]],
+        'hay_mas': len(objetos) > limite,
+    })
@@ -0,0 +1,236 @@
+"""
+Índice invertido en memoria para la búsqueda de productos.
+
+Cada proceso mantiene su propio índice: token normalizado (minúsculas, sin
+tildes) -> {producto_id: peso}. Las búsquedas resuelven una lista de ids
+ordenada por relevancia sin tocar la base de datos; la consulta SQL posterior
+solo filtra por `id IN (...)` con todos ellos y ordena por relevancia los
+`MAX_ORDENADOS` primeros.
+
+El índice se construye la primera vez que se usa y se actualiza con las
+señales de `Producto`, `Marca` y `Categoria` (ver `inventario/signals.py`).
+Para detectar los cambios de otros procesos usa los contadores de
+`inventario.versiones` de esas tablas, que viven en la base de datos: un
+proceso cuya versión local no coincide reconstruye su índice en la siguiente
+búsqueda.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.db.models import Case, IntegerField, When
+
+from inventario.models import Producto
+from inventario.versiones import incrementar, versiones
+
+# Tablas cuyos cambios alteran el índice
+TABLAS_INDICE = ('producto', 'marca', 'categoria')
+
+# Una búsqueda filtra por todos sus resultados, pero ordena por relevancia solo
+# los más relevantes: el CASE del orden va en cada consulta paginada, y un
+# prefijo corto en un catálogo grande coincide con casi todo. Los demás siguen
+# del más nuevo al más antiguo
+MAX_ORDENADOS = 1000
+
+# Peso de cada campo en el ranking
+PESOS = {
+    'nombre': 4,
+    'marca': 3,
+    'categoria': 2,
+    'descripcion': 1,
+}
+
+_SEPARADOR = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Cámara Ñandú' -> 'camara nandu'."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return texto.lower()
+
+
+def tokenizar(texto):
+    return [t for t in _SEPARADOR.split(normalizar(texto)) if t]
+
+
+def _pesos_documento(nombre, descripcion, marca, categoria):
+    pesos = defaultdict(int)
+    for campo, texto in (
+        ('nombre', nombre),
+        ('marca', marca),
+        ('categoria', categoria),
+        ('descripcion', descripcion),
+    ):
+        for token in set(tokenizar(texto)):
+            pesos[token] += PESOS[campo]
+    return dict(pesos)
+
+
+def _filas_productos(queryset):
+    return queryset.values_list(
+        'id', 'nombre', 'descripcion', 'marca__nombre', 'categoria__nombre'
+    ).iterator(chunk_size=2000)
+
+
+def _version_compartida():
+    actuales = versiones(TABLAS_INDICE)
+    return tuple(actuales[tabla] for tabla in TABLAS_INDICE)
+
+
+class IndiceProductos:
+    """Índice invertido de productos. Usar la instancia `indice` del módulo."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}   # token -> {producto_id: peso}
+        self._documentos = {}  # producto_id -> {token: peso}
+        self._tokens = []     # tokens ordenados, para búsqueda por prefijo
+        self._version = None
+        self.construido = False
+
+    def __len__(self):
+        return len(self._documentos)
+
+    # ----- construcción -----
+
+    def reconstruir(self, version=None):
+        """Construye el índice completo desde la BD y lo reemplaza de una vez."""
+        if version is None:
+            version = _version_compartida()
+        postings = defaultdict(dict)
+        documentos = {}
+        for pk, nombre, descripcion, marca, categoria in _filas_productos(Producto.objects.all()):
+            pesos = _pesos_documento(nombre, descripcion, marca, categoria)
+            documentos[pk] = pesos
+            for token, peso in pesos.items():
+                postings[token][pk] = peso
+        with self._lock:
+            self._postings = dict(postings)
+            self._documentos = documentos
+            self._tokens = sorted(self._postings)
+            self._version = version
+            self.construido = True
+
+    def _asegurar_vigente(self):
+        version = _version_compartida()
+        if not self.construido or version != self._version:
+            self.reconstruir(version)
+
+    # ----- actualización incremental -----
+
+    def _quitar(self, pk):
+        for token in self._documentos.pop(pk, {}):
+            ids = self._postings.get(token)
+            if ids is None:
+                continue
+            ids.pop(pk, None)
+            if not ids:
+                del self._postings[token]
+                i = bisect.bisect_left(self._tokens, token)
+                if i < len(self._tokens) and self._tokens[i] == token:
+                    del self._tokens[i]
+
+    def _agregar(self, pk, pesos):
+        self._documentos[pk] = pesos
+        for token, peso in pesos.items():
+            if token not in self._postings:
+                self._postings[token] = {}
+                bisect.insort(self._tokens, token)
+            self._postings[token][pk] = peso
+
+    def _registrar_cambio(self, aplicar):
+        """Aplica un cambio local ya confirmado, que incrementó una versión (ver `incrementar_version`)."""
+        with self._lock:
+            if self.construido:
+                aplicar()
+            nueva = _version_compartida()
+            # Si cambió algo más que este cambio (otro proceso, o varios cambios
+            # en una transacción), la próxima búsqueda reconstruye
+            if (self._version is not None
+                    and all(n >= v for n, v in zip(nueva, self._version))
+                    and sum(nueva) == sum(self._version) + 1):
+                self._version = nueva
+
+    def actualizar_productos(self, queryset):
+        """Reindexa los productos del queryset (p. ej. tras renombrar una marca)."""
+        filas = list(_filas_productos(queryset)) if self.construido else []
+
+        def aplicar():
+            for pk, nombre, descripcion, marca, categoria in filas:
+                self._quitar(pk)
+                self._agregar(pk, _pesos_documento(nombre, descripcion, marca, categoria))
+
+        self._registrar_cambio(aplicar)
+
+    def eliminar_producto(self, pk):
+        self._registrar_cambio(lambda: self._quitar(pk))
+
+    def registrar_sin_cambios(self):
+        """Una marca o categoría nueva incrementa su versión pero no cambia el índice."""
+        self._registrar_cambio(lambda: None)
+
+    def invalidar(self):
+        """Fuerza la reconstrucción en todos los procesos."""
+        with self._lock:
+            incrementar('producto')
+            self.construido = False
+
+    # ----- consulta -----
+
+    def _coincidencias(self, prefijo):
+        i = bisect.bisect_left(self._tokens, prefijo)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefijo):
+            yield self._tokens[i]
+            i += 1
+
+    def buscar(self, texto):
+        """Ids de productos que contienen todos los términos, del más al menos relevante.
+
+        Cada término se compara como prefijo de las palabras indexadas, así
+        que 'mon' encuentra 'Monitor'. Devuelve `None` si el texto no tiene
+        términos buscables.
+        """
+        terminos = tokenizar(texto)
+        if not terminos:
+            return None
+        self._asegurar_vigente()
+        with self._lock:
+            puntajes = None
+            for termino in dict.fromkeys(terminos):
+                actuales = defaultdict(int)
+                for token in self._coincidencias(termino):
+                    bonus = 2 if token == termino else 1
+                    for pk, peso in self._postings[token].items():
+                        actuales[pk] += peso * bonus
+                if puntajes is None:
+                    puntajes = actuales
+                else:
+                    puntajes = {
+                        pk: puntaje + actuales[pk]
+                        for pk, puntaje in puntajes.items() if pk in actuales
+                    }
+                if not puntajes:
+                    return []
+        return sorted(puntajes, key=lambda pk: (-puntajes[pk], -pk))
+
+
+indice = IndiceProductos()
+
+
+def filtrar_por_busqueda(queryset, texto):
+    """Restringe `queryset` a los productos que coinciden con `texto`, los `MAX_ORDENADOS` más relevantes primero."""
+    ids = indice.buscar(texto)
+    if ids is None:
+        return queryset
+    if not ids:
+        return queryset.none()
+    ordenados = ids[:MAX_ORDENADOS]
+    orden = Case(
+        *[When(id=pk, then=posicion) for posicion, pk in enumerate(ordenados)],
+        default=len(ordenados),
+        output_field=IntegerField(),
+    )
+    return queryset.filter(id__in=ids).order_by(orden, '-id')
@@ -0,0 +1,97 @@
+"""
+Estadísticas de productos con caché por conjunto de filtros.
+
+El resultado de cada combinación de filtros se guarda en el caché de Django
+bajo una clave que incluye las versiones de las tablas del catálogo (ver
+`inventario/versiones.py`). Cualquier cambio en `Producto`, `Marca`,
+`Proveedor` o `Categoria` incrementa su versión, con lo que las entradas
+anteriores dejan de usarse y expiran solas.
+"""
+import hashlib
+import json
+import math
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Max, Min, Window
+from django.db.models.functions import RowNumber
+
+from inventario.busqueda import tokenizar
+from inventario.models import Categoria, Marca, Producto, Proveedor
+from inventario.versiones import firma
+
+TIMEOUT = 300
+
+# Filtros de ProductoViewSet que afectan el resultado
+FILTROS = ('search', 'marca', 'proveedor', 'categoria', 'precio_min', 'precio_max')
+PERCENTILES = (25, 50, 75, 90)
+
+
+def normalizar_filtros(params):
+    """Filtros presentes en `params`, sin vacíos y con la búsqueda tokenizada."""
+    filtros = {}
+    for nombre in FILTROS:
+        valor = (params.get(nombre) or '').strip()
+        if nombre == 'search':
+            valor = ' '.join(tokenizar(valor))
+        if valor:
+            filtros[nombre] = valor
+    return filtros
+
+
+def _clave(version, filtros):
+    resumen = hashlib.sha1(json.dumps(filtros, sort_keys=True).encode()).hexdigest()
+    return f'inventario:estadisticas:{version}:{resumen}'
+
+
+def _percentiles(queryset, total):
+    """Percentiles de precio por rango más cercano, en una sola consulta con ROW_NUMBER()."""
+    if not total:
+        return {f'p{p}': None for p in PERCENTILES}
+    rangos = {p: max(1, math.ceil(total * p / 100)) for p in PERCENTILES}
+    filas = dict(
+        queryset.order_by()
+        .annotate(rn=Window(RowNumber(), order_by=[F('precio').asc(), F('id').asc()]))
+        .filter(rn__in=set(rangos.values()))
+        .values_list('rn', 'precio')
+    )
+    return {f'p{p}': filas.get(rango) for p, rango in rangos.items()}
+
+
+def _totales_catalogo(version):
+    clave = f'inventario:estadisticas:{version}:catalogo'
+    totales = cache.get(clave)
+    if totales is None:
+        totales = {
+            'total_marcas': Marca.objects.count(),
+            'total_proveedores': Proveedor.objects.count(),
+            'total_categorias': Categoria.objects.count(),
+        }
+        cache.set(clave, totales, TIMEOUT)
+    return totales
+
+
+def estadisticas_productos(queryset, filtros):
+    """Estadísticas del `queryset` ya filtrado; `filtros` identifica la entrada de caché."""
+    version = firma()
+    clave = _clave(version, filtros)
+    resultado = cache.get(clave)
+    if resultado is not None:
+        return resultado
+
+    agregados = queryset.order_by().aggregate(
+        total=Count('id'),
+        promedio=Avg('precio'),
+        minimo=Min('precio'),
+        maximo=Max('precio'),
+    )
+    promedio = agregados['promedio'] or 0
+    resultado = {
+        'total_productos': agregados['total'],
+        'precio_promedio': round(promedio, 2),
+        'precio_minimo': agregados['minimo'],
+        'precio_maximo': agregados['maximo'],
+        'percentiles_precio': _percentiles(queryset, agregados['total']),
+        **_totales_catalogo(version),
+    }
+    cache.set(clave, resultado, TIMEOUT)
+    return resultado
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Producto, Marca, Proveedor, Categoria
+from .autocompletar import AutocompletarSelect
 
 class ProductoForm(forms.ModelForm):
     class Meta:
@@ -7,9 +8,9 @@ class ProductoForm(forms.ModelForm):
         fields = ['nombre', 'marca', 'proveedor', 'categoria', 'precio', 'descripcion']
         widgets = {
             'nombre': forms.TextInput(attrs={'class': 'form-control'}),
-            'marca': forms.Select(attrs={'class': 'form-select'}),
-            'proveedor': forms.Select(attrs={'class': 'form-select'}),
-            'categoria': forms.Select(attrs={'class': 'form-select'}),
+            'marca': AutocompletarSelect('inventario:autocompletar_marcas', attrs={'class': 'form-select'}),
+            'proveedor': AutocompletarSelect('inventario:autocompletar_proveedores', attrs={'class': 'form-select'}),
+            'categoria': AutocompletarSelect('inventario:autocompletar_categorias', attrs={'class': 'form-select'}),
             'precio': forms.NumberInput(attrs={'class': 'form-control'}),
             'descripcion': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
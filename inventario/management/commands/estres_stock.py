@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+
+from inventario import stock
+from inventario.models import MovimientoStock, Producto, StockProducto
+
+# Reintentos de una venta que choca con otra transacción (deadlock de MySQL,
+# "database is locked" de SQLite); la venta se repite completa
+REINTENTOS = 100
+
+
+def descontar_condicional(producto_id, cantidad):
+    """La salida de stock de las ventas (`inventario.stock`): UPDATE condicional."""
+    stock.mover(producto_id, -cantidad, 'venta')
+
+
+def descontar_con_bloqueo(producto_id, cantidad):
+    """Línea base: lee la fila con `select_for_update()` y escribe el nuevo valor."""
+    fila = StockProducto.objects.select_for_update().get(producto_id=producto_id)
+    if fila.cantidad < cantidad:
+        raise stock.StockInsuficiente(producto_id, cantidad, fila.cantidad)
+    fila.cantidad -= cantidad
+    fila.save(update_fields=['cantidad'])
+    MovimientoStock.objects.create(producto_id=producto_id, cantidad=-cantidad, motivo='venta')
+
+
+ESTRATEGIAS = {'condicional': descontar_condicional, 'bloqueo': descontar_con_bloqueo}
+
+
+class Command(BaseCommand):
+    help = (
+        'Vende en paralelo, desde varios hilos, un producto temporal con stock limitado y verifica '
+        'que no se pierdan descuentos ni se venda de más. Compara el UPDATE condicional de las ventas '
+        'con select_for_update(). En SQLite la base serializa las escrituras; medir en MySQL. '
+        'Ej: estres_stock --hilos 16 --intentos 500 --stock 5000'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos vendiendo a la vez (default: 8)')
+        parser.add_argument('--intentos', type=int, default=200, help='Ventas que intenta cada hilo (default: 200)')
+        parser.add_argument('--stock', type=int, default=1000, help='Stock inicial del producto (default: 1000)')
+        parser.add_argument('--cantidad', type=int, default=1, help='Unidades por venta (default: 1)')
+        parser.add_argument('--estrategia', choices=(*ESTRATEGIAS, 'ambas'), default='ambas',
+                            help='Cómo se descuenta el stock (default: ambas)')
+        parser.add_argument('--prefijo', default='ZZ_STOCK_', help='Prefijo del producto temporal (default: ZZ_STOCK_)')
+
+    def handle(self, *args, **options):
+        if min(options['hilos'], options['intentos'], options['cantidad']) < 1 or options['stock'] < 0:
+            raise CommandError('--hilos, --intentos y --cantidad deben ser positivos y --stock no negativo')
+        estrategias = list(ESTRATEGIAS) if options['estrategia'] == 'ambas' else [options['estrategia']]
+        producto = Producto.objects.create(nombre=f'{options["prefijo"]}producto', precio=1)
+        try:
+            velocidades = {}
+            for estrategia in estrategias:
+                velocidades[estrategia] = self.ejecutar(estrategia, producto.pk, options)
+        finally:
+            # Borra también su stock y sus movimientos
+            producto.delete()
+        if len(velocidades) == 2:
+            self.stdout.write(
+                f'condicional / bloqueo: {velocidades["condicional"] / velocidades["bloqueo"]:.2f}x'
+            )
+
+    def ejecutar(self, estrategia, producto_id, options):
+        """Una corrida con stock inicial `--stock`; devuelve los intentos por segundo."""
+        stock.ajustar(producto_id, options['stock'])
+        hilos, intentos, cantidad = options['hilos'], options['intentos'], options['cantidad']
+        barrera = threading.Barrier(hilos + 1)
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            futuros = [
+                executor.submit(self.vender, ESTRATEGIAS[estrategia], producto_id, intentos, cantidad, barrera)
+                for _ in range(hilos)
+            ]
+            barrera.wait()
+            inicio = time.perf_counter()
+            conteos = [futuro.result() for futuro in futuros]
+        segundos = time.perf_counter() - inicio
+
+        vendidas, rechazadas, reintentos = (sum(columna) for columna in zip(*conteos))
+        final = StockProducto.objects.get(producto_id=producto_id).cantidad
+        libro = MovimientoStock.objects.filter(producto_id=producto_id).aggregate(total=Sum('cantidad'))['total']
+        esperadas = min(hilos * intentos, options['stock'] // cantidad)
+        errores = []
+        if vendidas != esperadas:
+            errores.append(f'se vendieron {vendidas} veces, se esperaban {esperadas}')
+        if final != options['stock'] - vendidas * cantidad:
+            errores.append(f'stock final {final}, se esperaba {options["stock"] - vendidas * cantidad}')
+        if libro != final:
+            errores.append(f'el libro de movimientos suma {libro} y el stock es {final}')
+
+        velocidad = hilos * intentos / segundos
+        self.stdout.write(
+            f'{estrategia}: {vendidas} vendidas, {rechazadas} rechazadas, {reintentos} reintentos, '
+            f'stock final {final}, {segundos:.2f}s ({velocidad:.0f} ventas/s)'
+        )
+        if errores:
+            raise CommandError(f'{estrategia}: {"; ".join(errores)}')
+        return velocidad
+
+    def vender(self, descontar, producto_id, intentos, cantidad, barrera):
+        """Hilo: `intentos` ventas de `cantidad`, cada una en su transacción; (vendidas, rechazadas, reintentos)."""
+        vendidas = rechazadas = reintentos = 0
+        try:
+            barrera.wait()
+            for _ in range(intentos):
+                for intento in range(REINTENTOS):
+                    try:
+                        with transaction.atomic():
+                            descontar(producto_id, cantidad)
+                        vendidas += 1
+                    except stock.StockInsuficiente:
+                        rechazadas += 1
+                    except OperationalError:
+                        reintentos += 1
+                        time.sleep(random.uniform(0, 0.001 * (intento + 1)))
+                        continue
+                    break
+                else:
+                    raise CommandError(f'Una venta chocó {REINTENTOS} veces seguidas con otras')
+            return vendidas, rechazadas, reintentos
+        finally:
+            connection.close()
@@ -0,0 +1,203 @@
+import csv
+import io
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventario import precios
+from inventario.busqueda import indice
+from inventario.models import Categoria, Marca, Producto, Proveedor
+from inventario.versiones import TABLAS_CATALOGO, incrementar
+
+CAMPOS = ('nombre', 'precio', 'descripcion', 'marca', 'proveedor', 'categoria')
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa una lista de precios de productos desde CSV o NDJSON sin cargar el archivo en memoria. '
+        'Columnas: nombre, precio, descripcion, marca, proveedor, categoria (por nombre). '
+        'Un producto existente se reconoce por (nombre, marca) y se actualiza.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo, o '-' para leer de stdin")
+        parser.add_argument('--formato', choices=['csv', 'ndjson'], help='Por defecto según la extensión')
+        parser.add_argument('--delimitador', default=',', help='Separador de columnas CSV (default: ,)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Filas por bloque (default: 1000)')
+        parser.add_argument('--dry-run', action='store_true', help='Valida y cuenta sin escribir en la BD')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or ('ndjson' if options['archivo'].endswith(('.ndjson', '.jsonl')) else 'csv')
+        self.dry_run = options['dry_run']
+        self.errores = 0
+        self.creados = 0
+        self.actualizados = 0
+        self.sin_cambios = 0
+        self.relaciones = {
+            'marca': (Marca, dict(Marca.objects.values_list('nombre', 'id'))),
+            'proveedor': (Proveedor, dict(Proveedor.objects.values_list('nombre', 'id'))),
+            'categoria': (Categoria, dict(Categoria.objects.values_list('nombre', 'id'))),
+        }
+        self.nuevos_relacionados = 0
+
+        if options['archivo'] == '-':
+            archivo = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig')
+        else:
+            try:
+                archivo = open(options['archivo'], encoding='utf-8-sig', newline='')
+            except OSError as exc:
+                raise CommandError(f'No se pudo abrir {options["archivo"]}: {exc}')
+
+        inicio = time.perf_counter()
+        procesadas = 0
+        with archivo:
+            filas = self.leer(archivo, formato, options['delimitador'])
+            while True:
+                bloque = list(islice(filas, options['chunk_size']))
+                if not bloque:
+                    break
+                self.procesar_bloque(bloque)
+                procesadas += len(bloque)
+                segundos = time.perf_counter() - inicio
+                self.stdout.write(f'{procesadas} filas ({procesadas / segundos:.0f} filas/s)')
+
+        if not self.dry_run and (self.creados or self.actualizados):
+            # bulk_create/bulk_update no disparan señales
+            indice.invalidar()
+            incrementar(*TABLAS_CATALOGO)
+
+        segundos = time.perf_counter() - inicio
+        prefijo = '[dry-run] ' if self.dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefijo}{procesadas} filas en {segundos:.1f}s: {self.creados} creados, '
+            f'{self.actualizados} actualizados, {self.sin_cambios} sin cambios, {self.errores} con errores, '
+            f'{self.nuevos_relacionados} marcas/proveedores/categorías nuevas'
+        ))
+
+    # ----- lectura -----
+
+    def leer(self, archivo, formato, delimitador):
+        """Genera una fila (dict) a la vez, sin cargar el archivo completo."""
+        if formato == 'csv':
+            for fila in csv.DictReader(archivo, delimiter=delimitador):
+                yield fila
+            return
+        for numero, linea in enumerate(archivo, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                yield json.loads(linea)
+            except ValueError:
+                self.error(f'línea {numero}: JSON inválido')
+
+    def error(self, mensaje):
+        self.errores += 1
+        if self.errores <= 20:
+            self.stderr.write(mensaje)
+
+    def limpiar(self, fila):
+        datos = {campo: str(fila.get(campo) or '').strip() for campo in CAMPOS}
+        if not datos['nombre']:
+            self.error(f'{fila}: falta nombre')
+            return None
+        # Los validadores del modelo (largo del nombre, dígitos del precio, NaN e
+        # Infinity): una fila que la base rechace abortaría el bulk_create del bloque
+        producto = Producto(nombre=datos['nombre'], precio=datos['precio'])
+        try:
+            producto.clean_fields(exclude=['descripcion', 'marca', 'proveedor', 'categoria'])
+            for campo, (modelo, _) in self.relaciones.items():
+                if datos[campo]:
+                    try:
+                        modelo._meta.get_field('nombre').run_validators(datos[campo])
+                    except ValidationError as exc:
+                        raise ValidationError({campo: exc.messages})
+        except ValidationError as exc:
+            errores = '; '.join(f'{campo}: {" ".join(mensajes)}' for campo, mensajes in exc.message_dict.items())
+            self.error(f'{datos["nombre"][:100]}: {errores}')
+            return None
+        if producto.precio < 0:
+            self.error(f'{datos["nombre"]}: precio negativo {datos["precio"]!r}')
+            return None
+        datos['precio'] = producto.precio
+        return datos
+
+    # ----- escritura -----
+
+    def resolver_relaciones(self, filas):
+        """Crea en lote las marcas/proveedores/categorías que aún no existen."""
+        for campo, (modelo, ids) in self.relaciones.items():
+            faltantes = {f[campo] for f in filas if f[campo] and f[campo] not in ids}
+            if not faltantes:
+                continue
+            self.nuevos_relacionados += len(faltantes)
+            if self.dry_run:
+                ids.update({nombre: None for nombre in faltantes})
+                continue
+            modelo.objects.bulk_create([modelo(nombre=n) for n in faltantes], ignore_conflicts=True)
+            ids.update(modelo.objects.filter(nombre__in=faltantes).values_list('nombre', 'id'))
+
+    def procesar_bloque(self, bloque):
+        filas = [datos for datos in map(self.limpiar, bloque) if datos]
+        self.resolver_relaciones(filas)
+
+        # Última aparición de cada (nombre, marca) dentro del bloque
+        por_clave = {}
+        for f in filas:
+            valores = {
+                'nombre': f['nombre'],
+                'precio': f['precio'],
+                'descripcion': f['descripcion'],
+                **{f'{campo}_id': self.relaciones[campo][1].get(f[campo]) for campo in self.relaciones},
+            }
+            por_clave[(valores['nombre'], valores['marca_id'])] = valores
+
+        existentes = {}
+        for producto in Producto.objects.filter(
+            nombre__in={nombre for nombre, _ in por_clave}
+        ).order_by('-id').only('id', 'nombre', 'precio', 'descripcion', 'marca_id', 'proveedor_id', 'categoria_id'):
+            existentes[(producto.nombre, producto.marca_id)] = producto
+
+        nuevos = []
+        modificados = []
+        cambios_precio = []
+        for clave, valores in por_clave.items():
+            producto = existentes.get(clave)
+            if producto is None:
+                nuevos.append(Producto(**valores))
+                continue
+            cambios = {k: v for k, v in valores.items() if getattr(producto, k) != v}
+            if not cambios:
+                self.sin_cambios += 1
+                continue
+            for campo, valor in cambios.items():
+                setattr(producto, campo, valor)
+            modificados.append(producto)
+            if 'precio' in cambios:
+                cambios_precio.append(producto)
+
+        self.creados += len(nuevos)
+        self.actualizados += len(modificados)
+        if self.dry_run:
+            return
+        with transaction.atomic():
+            Producto.objects.bulk_create(nuevos)
+            Producto.objects.bulk_update(
+                modificados, ['precio', 'descripcion', 'proveedor', 'categoria'], batch_size=500
+            )
+            # bulk_create/bulk_update no pasan por la señal del historial de precios
+            if any(producto.pk is None for producto in nuevos):
+                # MySQL no devuelve los ids de bulk_create
+                ids = {
+                    (nombre, marca_id): pk for pk, nombre, marca_id in Producto.objects.filter(
+                        nombre__in={producto.nombre for producto in nuevos}
+                    ).order_by('id').values_list('id', 'nombre', 'marca_id')
+                }
+                for producto in nuevos:
+                    producto.pk = ids[(producto.nombre, producto.marca_id)]
+            precios.registrar_lote({producto.pk: producto.precio for producto in nuevos + cambios_precio})
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventario.busqueda import indice
+
+
+class Command(BaseCommand):
+    help = ('Reconstruye el índice de búsqueda de productos y publica una versión nueva '
+            'para que los procesos web reconstruyan el suyo.')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        indice.invalidar()
+        indice.reconstruir()
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice reconstruido: {len(indice)} productos en {segundos:.2f}s'
+        ))
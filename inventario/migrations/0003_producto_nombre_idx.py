@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+# app_shop_producto no es administrada por Django: AddIndex no la tocaría,
+# así que el índice se crea con el schema editor directamente.
+INDICE = models.Index(fields=['nombre'], name='producto_nombre_idx')
+
+
+def crear_indice(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('inventario', 'Producto'), INDICE)
+
+
+def eliminar_indice(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('inventario', 'Producto'), INDICE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0002_versiontabla'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
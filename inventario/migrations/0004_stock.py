@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0003_producto_nombre_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockProducto',
+            fields=[
+                ('producto', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock', serialize=False, to='inventario.producto')),
+                ('cantidad', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'inventario_stockproducto',
+                'constraints': [models.CheckConstraint(condition=models.Q(('cantidad__gte', 0)), name='stock_producto_no_negativo')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField()),
+                ('motivo', models.CharField(choices=[('venta', 'Venta'), ('edicion', 'Edición de venta'), ('anulacion', 'Venta eliminada'), ('ajuste', 'Ajuste de inventario')], max_length=20)),
+                ('venta_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('producto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_stock', to='inventario.producto')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'inventario_movimientostock',
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='movimiento_stock_prod_fecha')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# El historial empieza con el precio actual de cada producto. Las fechas
+# anteriores usan ese primer precio (ver inventario/precios.py) y las ventas ya
+# registradas toman su precio con `manage.py reconstruir_precios_ventas`.
+BATCH_SIZE = 1000
+
+
+def registrar_precios_actuales(apps, schema_editor):
+    Producto = apps.get_model('inventario', 'Producto')
+    PrecioProducto = apps.get_model('inventario', 'PrecioProducto')
+    ahora = timezone.now()
+    precios = (
+        PrecioProducto(producto_id=pk, precio=precio, desde=ahora)
+        for pk, precio in Producto.objects.order_by('pk').values_list('pk', 'precio').iterator(BATCH_SIZE)
+    )
+    PrecioProducto.objects.bulk_create(precios, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0004_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecioProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('desde', models.DateTimeField()),
+                ('producto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='precios', to='inventario.producto')),
+            ],
+            options={
+                'db_table': 'inventario_precioproducto',
+                'indexes': [models.Index(fields=['producto', 'desde'], name='precio_producto_desde')],
+            },
+        ),
+        migrations.RunPython(registrar_precios_actuales, migrations.RunPython.noop),
+    ]
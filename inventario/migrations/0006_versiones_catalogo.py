@@ -0,0 +1,24 @@
+from django.db import migrations
+
+# Contadores de versión del catálogo (ver inventario/versiones.py). Se crean
+# aquí para que el primer cambio de cada tabla sea un UPDATE como los demás, y
+# no un UPDATE más SAVEPOINT, INSERT y RELEASE dentro de la request.
+TABLAS = ('producto', 'marca', 'proveedor', 'categoria')
+
+
+def crear_versiones(apps, schema_editor):
+    VersionTabla = apps.get_model('inventario', 'VersionTabla')
+    for tabla in TABLAS:
+        VersionTabla.objects.get_or_create(tabla=tabla)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_precioproducto'),
+    ]
+
+    operations = [
+        # Al revertir, las filas quedan: `versiones()` las trata igual que a las que faltan
+        migrations.RunPython(crear_versiones, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.auth.models import User
 
 # Clon seguro de modelos que existen en `app_shop`.
 # Estos modelos usan `db_table` apuntando a las tablas actuales y `managed = False`
@@ -53,9 +54,102 @@ class Producto(models.Model):
     class Meta:
         db_table = 'app_shop_producto'
         managed = False
+        # Tabla no administrada: el índice se crea en la migración 0003
+        indexes = [models.Index(fields=['nombre'], name='producto_nombre_idx')]
 
     def __str__(self):
         return self.nombre
 from django.db import models
 
 # Create your models here.
+
+
+class VersionTabla(models.Model):
+    """Contador de cambios por tabla del catálogo.
+
+    Las señales de `inventario/signals.py` lo incrementan dentro de la misma
+    transacción que el cambio, así que todos los procesos ven la misma versión.
+    Se usa para ETags y para las claves de caché de estadísticas.
+    """
+    tabla = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'inventario_versiontabla'
+
+    def __str__(self):
+        return f"{self.tabla} v{self.version}"
+
+
+class StockProducto(models.Model):
+    """Unidades disponibles de un producto.
+
+    Se modifica solo con UPDATE condicionales (ver `inventario/stock.py`), nunca
+    leyendo y escribiendo el valor. Los productos sin fila no controlan stock.
+    """
+    # Sin restricción en BD: app_shop_producto no es administrada por Django
+    producto = models.OneToOneField(
+        'inventario.Producto',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stock',
+        db_constraint=False,
+    )
+    cantidad = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'inventario_stockproducto'
+        constraints = [
+            models.CheckConstraint(condition=models.Q(cantidad__gte=0), name='stock_producto_no_negativo'),
+        ]
+
+    def __str__(self):
+        return f"Stock {self.producto_id}: {self.cantidad}"
+
+
+class MovimientoStock(models.Model):
+    """Libro de movimientos de stock: la suma por producto es su stock actual."""
+    MOTIVOS = [
+        ('venta', 'Venta'),
+        ('edicion', 'Edición de venta'),
+        ('anulacion', 'Venta eliminada'),
+        ('ajuste', 'Ajuste de inventario'),
+    ]
+
+    producto = models.ForeignKey(
+        'inventario.Producto', on_delete=models.CASCADE, related_name='movimientos_stock', db_constraint=False
+    )
+    cantidad = models.IntegerField()  # positiva si entra, negativa si sale
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+    # Sin FK: el movimiento se conserva aunque la venta se elimine
+    venta_id = models.PositiveIntegerField(blank=True, null=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'inventario_movimientostock'
+        indexes = [models.Index(fields=['producto', 'fecha'], name='movimiento_stock_prod_fecha')]
+
+    def __str__(self):
+        return f"{self.motivo} {self.cantidad:+d} producto={self.producto_id}"
+
+
+class PrecioProducto(models.Model):
+    """Historial de precios: cada fila es el precio de un producto desde `desde`.
+
+    La registran las señales de `Producto` al crearlo o cambiar su precio; las
+    consultas "precio vigente en tal fecha" están en `inventario/precios.py`.
+    """
+    producto = models.ForeignKey(
+        'inventario.Producto', on_delete=models.CASCADE, related_name='precios', db_constraint=False
+    )
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    desde = models.DateTimeField()
+
+    class Meta:
+        db_table = 'inventario_precioproducto'
+        # El precio vigente es la última fila con desde <= fecha: una búsqueda en este índice
+        indexes = [models.Index(fields=['producto', 'desde'], name='precio_producto_desde')]
+
+    def __str__(self):
+        return f"Producto {self.producto_id}: {self.precio} desde {self.desde}"
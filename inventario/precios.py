@@ -0,0 +1,78 @@
+"""
+Historial de precios de los productos (`PrecioProducto`).
+
+Cada cambio de `Producto.precio` agrega una fila `(producto, precio, desde)`
+(ver `inventario/signals.py`). El precio vigente en una fecha es el de la
+última fila con `desde <= fecha`, una búsqueda en el índice
+`(producto, desde)` que lee una sola fila. Antes de la primera fila del
+producto vale esa primera fila: el historial empieza con los precios que había
+al crearlo (migración inventario 0005) y no se sabe qué hubo antes.
+
+Para muchas fechas a la vez (reconstrucciones) `historial` lee los precios de
+varios productos de una vez y `precio_en` busca con `bisect` en memoria.
+"""
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.utils import timezone
+
+from inventario.models import PrecioProducto
+
+BATCH_SIZE = 1000
+
+
+def precio_vigente(producto_id, fecha=None):
+    """Precio de `producto_id` en `fecha` (por defecto, ahora); None si no tiene historial."""
+    precios = PrecioProducto.objects.filter(producto_id=producto_id)
+    if fecha is not None:
+        precio = (
+            precios.filter(desde__lte=fecha).order_by('-desde', '-id').values_list('precio', flat=True).first()
+        )
+        if precio is not None:
+            return precio
+        return precios.order_by('desde', 'id').values_list('precio', flat=True).first()
+    return precios.order_by('-desde', '-id').values_list('precio', flat=True).first()
+
+
+def registrar(producto, creado=False):
+    """Agrega el precio actual de `producto` al historial si cambió."""
+    if not creado and precio_vigente(producto.pk) == producto.precio:
+        return
+    PrecioProducto.objects.create(producto_id=producto.pk, precio=producto.precio, desde=timezone.now())
+
+
+def registrar_lote(precios):
+    """Agrega `{producto_id: precio}` al historial; para altas y cambios con bulk_create/bulk_update, sin señales."""
+    desde = timezone.now()
+    PrecioProducto.objects.bulk_create(
+        [PrecioProducto(producto_id=pk, precio=precio, desde=desde) for pk, precio in precios.items()],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def historial(producto_ids):
+    """`{producto_id: ([desde, ...], [precio, ...])}` en orden de `desde`, para `precio_en`."""
+    resultado = {}
+    filas = (
+        PrecioProducto.objects.filter(producto_id__in=producto_ids)
+        .order_by('producto_id', 'desde', 'id')
+        .values_list('producto_id', 'desde', 'precio')
+    )
+    for producto_id, desde, precio in filas:
+        fechas, precios = resultado.setdefault(producto_id, ([], []))
+        fechas.append(desde)
+        precios.append(precio)
+    return resultado
+
+
+def precio_en(historial_precios, producto_id, fecha):
+    """Como `precio_vigente`, sobre un `historial` ya leído."""
+    if producto_id not in historial_precios:
+        return None
+    fechas, precios = historial_precios[producto_id]
+    return precios[max(bisect_right(fechas, fecha) - 1, 0)]
+
+
+def precio_de_total(total, cantidad):
+    """Precio unitario que explica un total ya guardado (al centavo)."""
+    return (Decimal(total) / cantidad).quantize(Decimal('0.01'))
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from inventario import precios
+from inventario.busqueda import indice
+from inventario.models import Categoria, Marca, Producto, Proveedor
+from inventario.versiones import incrementar
+
+
+# Los cambios se aplican al índice solo si la transacción se confirma
+
+
+@receiver(post_save, sender=Producto)
+def indexar_producto(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: indice.actualizar_productos(Producto.objects.filter(pk=pk)))
+
+
+@receiver(post_save, sender=Producto)
+def registrar_precio(sender, instance, created, **kwargs):
+    # En la misma transacción que el cambio de precio
+    precios.registrar(instance, created)
+
+
+@receiver(post_delete, sender=Producto)
+def desindexar_producto(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: indice.eliminar_producto(pk))
+
+
+@receiver(post_save, sender=Marca)
+def reindexar_marca(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(indice.registrar_sin_cambios)
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: indice.actualizar_productos(Producto.objects.filter(marca_id=pk)))
+
+
+@receiver(post_save, sender=Categoria)
+def reindexar_categoria(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(indice.registrar_sin_cambios)
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: indice.actualizar_productos(Producto.objects.filter(categoria_id=pk)))
+
+
+@receiver(post_delete, sender=Categoria)
+def invalidar_por_categoria(sender, instance, **kwargs):
+    # SET_NULL sobre productos se hace con un UPDATE masivo sin señales
+    transaction.on_commit(indice.invalidar)
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Marca)
+@receiver(post_delete, sender=Marca)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_delete, sender=Proveedor)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def incrementar_version(sender, **kwargs):
+    # Dentro de la transacción: la nueva versión es visible junto con el cambio
+    incrementar(sender._meta.model_name)
@@ -0,0 +1,70 @@
+// Autocompletado para los <select data-autocompletar="url"> (ver inventario/autocompletar.py).
+// El select llega con solo la opción elegida; al escribir se piden las coincidencias al servidor.
+(function () {
+    'use strict';
+
+    var ESPERA_MS = 250;
+
+    function iniciar(select) {
+        if (select.dataset.autocompletarListo) {
+            return;
+        }
+        select.dataset.autocompletarListo = '1';
+
+        var buscador = document.createElement('input');
+        buscador.type = 'search';
+        buscador.className = 'form-control form-control-sm mb-1';
+        buscador.placeholder = 'Escribe para buscar…';
+        buscador.autocomplete = 'off';
+        select.parentNode.insertBefore(buscador, select);
+
+        var temporizador = null;
+        var pedido = 0;
+
+        function mostrar(datos) {
+            var elegido = select.options[select.selectedIndex];
+            select.innerHTML = '';
+            select.appendChild(new Option('---------', ''));
+            if (elegido && elegido.value) {
+                select.appendChild(new Option(elegido.text, elegido.value, true, true));
+            }
+            datos.resultados.forEach(function (item) {
+                if (!elegido || String(item.id) !== elegido.value) {
+                    select.appendChild(new Option(item.texto, item.id));
+                }
+            });
+            if (datos.hay_mas) {
+                var mas = new Option('… sigue escribiendo para acotar', '');
+                mas.disabled = true;
+                select.appendChild(mas);
+            }
+        }
+
+        function buscar() {
+            var numero = ++pedido;
+            var url = select.dataset.autocompletar + '?q=' + encodeURIComponent(buscador.value.trim());
+            fetch(url, {credentials: 'same-origin', headers: {'Accept': 'application/json'}})
+                .then(function (respuesta) { return respuesta.json(); })
+                .then(function (datos) {
+                    // Se descartan respuestas que llegan después de una más nueva
+                    if (numero === pedido) {
+                        mostrar(datos);
+                    }
+                });
+        }
+
+        buscador.addEventListener('input', function () {
+            clearTimeout(temporizador);
+            temporizador = setTimeout(buscar, ESPERA_MS);
+        });
+        buscador.addEventListener('focus', function () {
+            if (select.options.length <= 2) {
+                buscar();
+            }
+        }, {once: true});
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-autocompletar]').forEach(iniciar);
+    });
+})();
@@ -0,0 +1,140 @@
+"""
+Stock por producto y libro de movimientos.
+
+Las salidas son un UPDATE condicional:
+
+    UPDATE inventario_stockproducto SET cantidad = cantidad - n
+    WHERE producto_id = p AND cantidad >= n
+
+Si no actualiza ninguna fila, no había stock suficiente (o el producto no
+controla stock). No se lee el valor para después escribirlo, así que dos
+vendedores del mismo producto no pueden pisarse: la base de datos aplica los
+UPDATE de a uno sobre la fila y cada uno vuelve a evaluar la condición. Tampoco
+hace falta `select_for_update()`, que agrega una ida y vuelta con la fila
+bloqueada (ver `manage.py estres_stock`).
+
+El bloqueo de la fila dura hasta el final de la transacción: por eso las señales
+de `Venta` descuentan el stock al final, después de guardar la venta y sus
+acumulados. Cada cambio agrega un `MovimientoStock`; la suma de los movimientos
+de un producto es su stock.
+
+Los productos sin `StockProducto` no controlan stock (las ventas pasan y no
+generan movimientos) hasta su primer `ajustar`.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from inventario.models import MovimientoStock, StockProducto
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, producto_id, solicitado, disponible):
+        self.producto_id = producto_id
+        self.solicitado = solicitado
+        self.disponible = disponible
+        super().__init__(
+            f'Stock insuficiente del producto {producto_id}: se pidieron {solicitado}, hay {disponible}.'
+        )
+
+
+def descontar(producto_id, cantidad):
+    """Descuenta `cantidad` del stock; False si el producto no controla stock.
+
+    Lanza `StockInsuficiente` si no alcanza (sin descontar nada).
+    """
+    if StockProducto.objects.filter(producto_id=producto_id, cantidad__gte=cantidad).update(
+        cantidad=F('cantidad') - cantidad
+    ):
+        return True
+    disponible = StockProducto.objects.filter(producto_id=producto_id).values_list('cantidad', flat=True).first()
+    if disponible is None:
+        return False
+    raise StockInsuficiente(producto_id, cantidad, disponible)
+
+
+def reponer(producto_id, cantidad):
+    """Devuelve `cantidad` al stock; False si el producto no controla stock."""
+    return bool(
+        StockProducto.objects.filter(producto_id=producto_id).update(cantidad=F('cantidad') + cantidad)
+    )
+
+
+def _movimiento(producto_id, cantidad, motivo, venta_id=None, usuario_id=None):
+    return MovimientoStock(
+        producto_id=producto_id, cantidad=cantidad, motivo=motivo, venta_id=venta_id, usuario_id=usuario_id,
+    )
+
+
+def mover(producto_id, cantidad, motivo, venta_id=None, usuario_id=None):
+    """Aplica `cantidad` (negativa si sale) y la registra en el libro.
+
+    Usar dentro de la transacción del cambio que la origina. Lanza
+    `StockInsuficiente` si es una salida que no alcanza.
+    """
+    if not cantidad:
+        return
+    controlado = descontar(producto_id, -cantidad) if cantidad < 0 else reponer(producto_id, cantidad)
+    if controlado:
+        _movimiento(producto_id, cantidad, motivo, venta_id, usuario_id).save()
+
+
+def vender_lote(cantidades):
+    """Descuenta `{producto_id: cantidad}` de una vez (carga masiva de ventas).
+
+    Una lectura separa los productos que controlan stock y cada uno de ellos
+    es un UPDATE condicional, en orden de id para que dos lotes concurrentes
+    bloqueen las filas en el mismo orden. Devuelve `(controlados, sin_stock)`:
+    los ids que descontaron stock y `{producto_id: StockInsuficiente}` de los
+    que no alcanzaron (esos no se descuentan).
+    """
+    controlados = set(
+        StockProducto.objects.filter(producto_id__in=cantidades).values_list('producto_id', flat=True)
+    )
+    sin_stock = {}
+    for producto_id in sorted(controlados):
+        try:
+            if not descontar(producto_id, cantidades[producto_id]):
+                # Dejó de controlar stock después de la lectura
+                controlados.discard(producto_id)
+        except StockInsuficiente as error:
+            controlados.discard(producto_id)
+            sin_stock[producto_id] = error
+    return controlados, sin_stock
+
+
+def registrar_ventas(ventas, controlados, batch_size=None):
+    """Movimientos de las ventas de un lote cuyo producto descontó stock en `vender_lote`.
+
+    Las ventas ya deben tener id (en MySQL, `bulk_create` no lo devuelve; ver
+    `ventas.ingesta`): el movimiento lo guarda para enlazarse con su venta.
+    """
+    if any(venta.pk is None for venta in ventas):
+        raise ValueError('Las ventas del lote no tienen id')
+    MovimientoStock.objects.bulk_create([
+        _movimiento(venta.producto_id, -venta.cantidad, 'venta', venta.pk, venta.vendedor_id)
+        for venta in ventas if venta.producto_id in controlados
+    ], batch_size=batch_size)
+
+
+def ajustar(producto_id, cantidad, usuario_id=None):
+    """Fija el stock de un producto en `cantidad` (inventario físico); empieza a controlarlo si no lo hacía.
+
+    Devuelve la diferencia registrada en el libro. Los ajustes son poco
+    frecuentes: leen la fila con `select_for_update()` para calcularla.
+    """
+    with transaction.atomic():
+        fila = StockProducto.objects.select_for_update().filter(producto_id=producto_id).first()
+        if fila is None:
+            try:
+                with transaction.atomic():
+                    StockProducto.objects.create(producto_id=producto_id, cantidad=cantidad)
+            except IntegrityError:
+                # Otro proceso creó la fila entre la lectura y el INSERT
+                return ajustar(producto_id, cantidad, usuario_id)
+            diferencia = cantidad
+        else:
+            diferencia = cantidad - fila.cantidad
+            StockProducto.objects.filter(producto_id=producto_id).update(cantidad=cantidad)
+        if diferencia:
+            _movimiento(producto_id, diferencia, 'ajuste', usuario_id=usuario_id).save()
+    return diferencia
@@ -1,3 +1,485 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from inventario.busqueda import IndiceProductos, indice, tokenizar
+from inventario.forms import ProductoForm
+from inventario import precios, stock
+from inventario.models import (
+    Categoria, Marca, MovimientoStock, PrecioProducto, Producto, Proveedor, StockProducto,
+)
+from inventario.versiones import incrementar
+from pc_shop.pruebas import PresupuestoConsultasMixin
+from ventas.models import Cliente, ClienteResumen, Venta
+
+
+class IndiceProductosTestCase(TestCase):
+    """Tests del índice invertido de búsqueda de productos"""
+
+    def setUp(self):
+        indice.invalidar()
+        self.marca = Marca.objects.create(nombre='Logitech')
+        self.categoria = Categoria.objects.create(nombre='Periféricos')
+        self.mouse = Producto.objects.create(
+            nombre='Mouse Inalámbrico', precio=100, descripcion='Sensor óptico',
+            marca=self.marca, categoria=self.categoria,
+        )
+        self.monitor = Producto.objects.create(
+            nombre='Monitor 27', precio=300, descripcion='Panel IPS, ideal con mouse',
+        )
+
+    def test_tokenizar_quita_tildes(self):
+        self.assertEqual(tokenizar('Cámara Ñandú, 4K!'), ['camara', 'nandu', '4k'])
+
+    def test_busqueda_por_prefijo_y_sin_tildes(self):
+        self.assertEqual(indice.buscar('inalam'), [self.mouse.id])
+        self.assertEqual(indice.buscar('PERIFERICOS'), [self.mouse.id])
+        self.assertEqual(indice.buscar('optico logi'), [self.mouse.id])
+        self.assertEqual(indice.buscar('teclado'), [])
+        self.assertIsNone(indice.buscar('  ,, '))
+
+    def test_ranking_prioriza_nombre(self):
+        # 'mouse' está en el nombre de uno y en la descripción del otro
+        self.assertEqual(indice.buscar('mouse'), [self.mouse.id, self.monitor.id])
+
+    def test_senales_actualizan_el_indice(self):
+        indice.buscar('mouse')  # construye el índice
+        with self.captureOnCommitCallbacks(execute=True):
+            self.marca.nombre = 'Razer'
+            self.marca.save()
+            teclado = Producto.objects.create(nombre='Teclado', precio=50, descripcion='Mecánico')
+            self.monitor.delete()
+        self.assertEqual(indice.buscar('razer'), [self.mouse.id])
+        self.assertEqual(indice.buscar('logitech'), [])
+        self.assertEqual(indice.buscar('mecanico'), [teclado.id])
+        self.assertEqual(indice.buscar('monitor'), [])
+
+    def test_otro_proceso_reconstruye_al_cambiar_version(self):
+        otro = IndiceProductos()
+        self.assertEqual(otro.buscar('monitor'), [self.monitor.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.create(nombre='Monitor 32', precio=400, descripcion='')
+        self.assertEqual(len(otro.buscar('monitor')), 2)
+
+    def test_version_compartida_en_la_base(self):
+        # Un cambio confirmado por otro proceso: sin señales ni caché en común
+        self.assertEqual(indice.buscar('razer'), [])
+        Marca.objects.filter(pk=self.marca.pk).update(nombre='Razer')
+        incrementar('marca')
+        self.assertEqual(indice.buscar('razer'), [self.mouse.id])
+
+    def test_marca_nueva_no_reconstruye(self):
+        indice.buscar('mouse')
+        with mock.patch.object(indice, 'reconstruir') as reconstruir:
+            with self.captureOnCommitCallbacks(execute=True):
+                Marca.objects.create(nombre='Razer')
+            indice.buscar('mouse')
+        reconstruir.assert_not_called()
+
+
+class BusquedaProductosVistasTestCase(TestCase):
+    """La búsqueda de las vistas usa el índice"""
+
+    def setUp(self):
+        indice.invalidar()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
+        for i in range(3):
+            Producto.objects.create(nombre=f'Notebook {i}', precio=1000, descripcion='')
+        Producto.objects.create(nombre='Cargador', precio=10, descripcion='Para notebook')
+
+    def test_lista_productos_html(self):
+        response = self.client.get(reverse('inventario:lista_productos'), {'buscar': 'note'})
+        self.assertEqual(response.status_code, 200)
+        nombres = [p.nombre for p in response.context['productos']]
+        self.assertEqual(len(nombres), 4)
+        self.assertEqual(nombres[-1], 'Cargador')
+
+    def test_api_search_no_escanea_tabla(self):
+        url = reverse('api:productos-list')
+        self.client.get(url, {'search': 'note'})  # construye el índice
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'search': 'notebook'})
+        self.assertEqual(response.data['count'], 4)
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries).upper()
+        self.assertNotIn('LIKE', sql)
+
+    def test_orden_acotado_a_los_mas_relevantes(self):
+        url = reverse('api:productos-list')
+        with mock.patch('inventario.busqueda.MAX_ORDENADOS', 2):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, {'search': 'note'})
+        # Todos los resultados: los 2 más relevantes y luego el resto, del más nuevo al más antiguo
+        self.assertEqual(
+            [p['nombre'] for p in response.data['results']], ['Notebook 2', 'Notebook 1', 'Cargador', 'Notebook 0']
+        )
+        # El CASE del orden lleva 2 ramas
+        self.assertLessEqual(max(q['sql'].count('WHEN') for q in ctx.captured_queries), 2)
+
+    def test_busqueda_con_mas_resultados_que_los_ordenados(self):
+        Producto.objects.bulk_create(
+            Producto(nombre=f'Monitor {i}', precio=100 + i, descripcion='') for i in range(1200)
+        )
+        indice.invalidar()
+        url = reverse('api:productos-list')
+        response = self.client.get(url, {'search': 'monitor'})
+        self.assertEqual(response.data['count'], 1200)
+        ultima = self.client.get(url, {'search': 'monitor', 'page': 60})
+        self.assertEqual(len(ultima.data['results']), 20)
+        self.assertEqual(ultima.data['results'][-1]['nombre'], 'Monitor 0')
+
+
+class ImportCatalogoTestCase(TestCase):
+    """Tests del comando import_catalogo"""
+
+    def escribir(self, contenido, sufijo):
+        archivo = tempfile.NamedTemporaryFile('w', suffix=sufijo, delete=False, encoding='utf-8')
+        archivo.write(contenido)
+        archivo.close()
+        self.addCleanup(os.unlink, archivo.name)
+        return archivo.name
+
+    def importar(self, ruta, **opciones):
+        salida = StringIO()
+        call_command('import_catalogo', ruta, stdout=salida, stderr=StringIO(), **opciones)
+        return salida.getvalue()
+
+    def test_csv_crea_y_actualiza(self):
+        Marca.objects.create(nombre='Logitech')
+        existente = Producto.objects.create(
+            nombre='Mouse', precio=100, descripcion='viejo', marca=Marca.objects.get()
+        )
+        ruta = self.escribir(
+            'nombre,precio,descripcion,marca,proveedor,categoria\n'
+            'Mouse,120,nuevo,Logitech,PC Factory,Periféricos\n'
+            'Teclado,50,,Logitech,PC Factory,Periféricos\n'
+            'Monitor,300,,Samsung,,Monitores\n'
+            ',10,sin nombre,,,\n'
+            'Cable,gratis,,,,\n',
+            '.csv',
+        )
+        salida = self.importar(ruta, chunk_size=2)
+
+        self.assertIn('2 creados, 1 actualizados', salida)
+        self.assertIn('2 con errores', salida)
+        existente.refresh_from_db()
+        self.assertEqual(existente.precio, 120)
+        self.assertEqual(existente.descripcion, 'nuevo')
+        self.assertEqual(existente.categoria.nombre, 'Periféricos')
+        self.assertEqual(Producto.objects.get(nombre='Monitor').marca.nombre, 'Samsung')
+        self.assertEqual(Marca.objects.count(), 2)
+        self.assertEqual(Proveedor.objects.count(), 1)
+        # bulk_create/bulk_update también registran el historial de precios
+        self.assertEqual(list(existente.precios.order_by('id').values_list('precio', flat=True)), [100, 120])
+        self.assertEqual(precios.precio_vigente(Producto.objects.get(nombre='Teclado').pk), 50)
+
+        # Reimportar el mismo archivo no cambia nada
+        self.assertIn('0 creados, 0 actualizados, 3 sin cambios', self.importar(ruta))
+        self.assertEqual(PrecioProducto.objects.count(), 4)
+
+    def test_ndjson_dry_run_no_escribe(self):
+        ruta = self.escribir(
+            '{"nombre": "SSD 1TB", "precio": 89.9, "marca": "Kingston"}\n'
+            '\n'
+            '{"nombre": "RAM 16GB", "precio": "45", "marca": "Kingston"}\n',
+            '.ndjson',
+        )
+        salida = self.importar(ruta, dry_run=True)
+        self.assertIn('[dry-run] 2 filas', salida)
+        self.assertIn('2 creados', salida)
+        self.assertFalse(Producto.objects.exists())
+        self.assertFalse(Marca.objects.exists())
+
+        self.importar(ruta)
+        self.assertEqual(Producto.objects.filter(marca__nombre='Kingston').count(), 2)
+
+    def test_rechaza_filas_que_la_base_no_acepta(self):
+        ruta = self.escribir(
+            'nombre,precio,descripcion,marca,proveedor,categoria\n'
+            f'{"X" * 101},10,,,,\n'
+            'Servidor,123456789.00,,,,\n'
+            'Cable,NaN,,,,\n'
+            'Adaptador,Infinity,,,,\n'
+            'Regalo,-1,,,,\n'
+            'Mouse,10.123,,,,\n'
+            f'Teclado,20,,{"M" * 101},,\n'
+            'Monitor,99999999.99,,,,\n',
+            '.csv',
+        )
+        salida = self.importar(ruta, chunk_size=3)
+        self.assertIn('1 creados', salida)
+        self.assertIn('7 con errores', salida)
+        self.assertEqual(list(Producto.objects.values_list('nombre', flat=True)), ['Monitor'])
+        self.assertFalse(Marca.objects.exists())
+
+
+class AutocompletarCatalogoTestCase(TestCase):
+    """ProductoForm carga marca/proveedor/categoría por autocompletado"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
+        for i in range(25):
+            Marca.objects.create(nombre=f'Marca {i:02d}')
+        self.logitech = Marca.objects.create(nombre='Logitech')
+
+    def test_formulario_no_lista_todas_las_marcas(self):
+        producto = Producto.objects.create(nombre='Mouse', precio=10, descripcion='', marca=self.logitech)
+        html = str(ProductoForm(instance=producto)['marca'])
+        self.assertEqual(html.count('<option'), 2)
+        self.assertIn('Logitech', html)
+        self.assertIn('inventario/js/autocompletar.js', str(ProductoForm().media))
+
+    def test_autocompletar_marcas(self):
+        url = reverse('inventario:autocompletar_marcas')
+        datos = self.client.get(url, {'q': 'logi'}).json()
+        self.assertEqual(datos['resultados'], [{'id': self.logitech.id, 'texto': 'Logitech'}])
+
+        datos = self.client.get(url, {'q': 'marca 1'}).json()
+        self.assertEqual(len(datos['resultados']), 10)
+        self.assertFalse(datos['hay_mas'])
+
+        datos = self.client.get(url).json()
+        self.assertEqual(len(datos['resultados']), 20)
+        self.assertTrue(datos['hay_mas'])
+
+    def test_lista_productos_renderiza_formulario(self):
+        response = self.client.get(reverse('inventario:lista_productos'))
+        self.assertContains(response, 'data-autocompletar=')
+        self.assertContains(response, 'inventario/js/autocompletar.js', count=1)
+
+
+class PrecioProductoTestCase(TestCase):
+    """Historial de precios y precio vigente a una fecha"""
+
+    def setUp(self):
+        self.mouse = Producto.objects.create(nombre='Mouse', precio=1000, descripcion='')
+
+    def cambiar_precio(self, precio, desde):
+        self.mouse.precio = precio
+        with mock.patch('django.utils.timezone.now', return_value=desde):
+            self.mouse.save()
+
+    def test_registra_solo_los_cambios_de_precio(self):
+        self.mouse.descripcion = 'Inalámbrico'
+        self.mouse.save()
+        self.mouse.precio = 1200
+        self.mouse.save()
+        self.assertEqual(list(self.mouse.precios.order_by('id').values_list('precio', flat=True)), [1000, 1200])
+        self.assertEqual(precios.precio_vigente(self.mouse.pk), 1200)
+
+    def test_precio_a_una_fecha(self):
+        creado = self.mouse.precios.get().desde
+        enero = creado + timedelta(days=1)
+        marzo = creado + timedelta(days=60)
+        self.cambiar_precio(1500, enero)
+        self.cambiar_precio(900, marzo)
+
+        historial = precios.historial([self.mouse.pk])
+        for fecha, esperado in (
+            (creado - timedelta(days=1), 1000),  # antes del historial: el primer precio
+            (creado, 1000),
+            (enero - timedelta(seconds=1), 1000),
+            (enero, 1500),
+            (marzo - timedelta(seconds=1), 1500),
+            (marzo + timedelta(days=1), 900),
+        ):
+            self.assertEqual(precios.precio_vigente(self.mouse.pk, fecha), esperado)
+            self.assertEqual(precios.precio_en(historial, self.mouse.pk, fecha), esperado)
+        self.assertIsNone(precios.precio_en(historial, self.mouse.pk + 1, marzo))
+
+    def test_precio_vigente_es_una_consulta(self):
+        with self.assertNumQueries(1):
+            precios.precio_vigente(self.mouse.pk, timezone.now())
+
+
+class PresupuestoConsultasInventarioTestCase(PresupuestoConsultasMixin, TestCase):
+    """Cada vista de inventario declara su presupuesto de consultas y lo respeta"""
+
+    espacio = 'inventario'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_login(self.user)
+        self.marcas = [Marca.objects.create(nombre=f'Marca {i}') for i in range(8)]
+        self.proveedores = [Proveedor.objects.create(nombre=f'Proveedor {i}') for i in range(8)]
+        self.categorias = [Categoria.objects.create(nombre=f'Categoría {i}') for i in range(8)]
+        # Más de una página de cada listado: un N+1 se nota como consultas de más
+        self.productos = [
+            Producto.objects.create(
+                nombre=f'Producto {i}', precio=1000 + i, descripcion='',
+                marca=self.marcas[i % 8], proveedor=self.proveedores[i % 8], categoria=self.categorias[i % 8]
+            )
+            for i in range(12)
+        ]
+
+    def pk(self, nombre):
+        for modelo, objetos in (('producto', self.productos), ('marca', self.marcas),
+                                ('proveedor', self.proveedores), ('categoria', self.categorias)):
+            if nombre.endswith(modelo):
+                return objetos[0].pk
+
+    def test_todas_las_rutas_declaran_presupuesto(self):
+        self.assertRutasConPresupuesto()
+
+    def test_lecturas(self):
+        for nombre, (_, usa_pk) in self.rutas().items():
+            self.medir('GET', nombre, self.pk(nombre) if usa_pk else None)
+            if nombre.startswith(('lista_', 'autocompletar_')):
+                # Búsquedas con resultados: el índice se reconstruye y se cuenta y pagina
+                self.medir('GET', nombre, data={'buscar': 'producto', 'q': 'producto', 'page': 2})
+
+    def test_escrituras(self):
+        producto = {
+            'nombre': 'Nuevo', 'precio': 5000, 'descripcion': 'Nuevo producto', 'marca': self.marcas[0].pk,
+            'proveedor': self.proveedores[0].pk, 'categoria': self.categorias[0].pk,
+        }
+        self.medir('POST', 'lista_productos', data=producto)
+        self.medir('POST', 'crear_producto', data=producto)
+        self.medir('POST', 'editar_producto', self.productos[0].pk, data={**producto, 'precio': 6000})
+        self.medir('POST', 'eliminar_producto', self.productos[1].pk)
+        for modelo, objetos, datos in (
+            ('marca', self.marcas, {'nombre': 'Nueva'}),
+            ('proveedor', self.proveedores, {'nombre': 'Nuevo', 'telefono': '123', 'email': 'a@b.cl'}),
+            ('categoria', self.categorias, {'nombre': 'Nueva', 'descripcion': 'Nueva'}),
+        ):
+            self.medir('POST', f'crear_{modelo}', data=datos)
+            self.medir('POST', f'editar_{modelo}', objetos[0].pk, data={**datos, 'nombre': 'Editado'})
+            # En cascada: sus productos
+            self.medir('POST', f'eliminar_{modelo}', objetos[2].pk)
+        self.assertEscriturasMedidas()
+
+
+class StockProductoTestCase(TestCase):
+    """Stock por producto: las ventas lo descuentan y no pueden dejarlo negativo"""
+
+    def setUp(self):
+        self.vendedor = User.objects.create_user(username='vendedor', password='testpass123')
+        self.cliente = Cliente.objects.create(rut='11111111-1', nombre='Ana', apellido='Pérez')
+        self.mouse = Producto.objects.create(nombre='Mouse', precio=1000, descripcion='')
+        self.teclado = Producto.objects.create(nombre='Teclado', precio=2000, descripcion='')
+        stock.ajustar(self.mouse.pk, 10)
+        stock.ajustar(self.teclado.pk, 5)
+
+    def vender(self, producto, cantidad):
+        return Venta.objects.create(vendedor=self.vendedor, cliente=self.cliente, producto=producto, cantidad=cantidad)
+
+    def stock(self, producto):
+        return StockProducto.objects.get(producto=producto).cantidad
+
+    def libro(self, producto):
+        return list(MovimientoStock.objects.filter(producto=producto).order_by('id').values_list('motivo', 'cantidad'))
+
+    def test_venta_descuenta_y_registra_movimiento(self):
+        venta = self.vender(self.mouse, 3)
+        self.assertEqual(self.stock(self.mouse), 7)
+        movimiento = MovimientoStock.objects.filter(motivo='venta').get()
+        self.assertEqual((movimiento.producto_id, movimiento.cantidad), (self.mouse.pk, -3))
+        self.assertEqual((movimiento.venta_id, movimiento.usuario_id), (venta.pk, self.vendedor.pk))
+
+    def test_venta_sin_stock_no_se_guarda(self):
+        self.vender(self.mouse, 8)
+        with self.assertRaises(stock.StockInsuficiente) as contexto:
+            self.vender(self.mouse, 3)
+        self.assertEqual(contexto.exception.disponible, 2)
+        self.assertEqual(self.stock(self.mouse), 2)
+        self.assertEqual(Venta.objects.count(), 1)
+        # Ni la venta ni sus resúmenes
+        self.assertEqual(ClienteResumen.objects.get(cliente=self.cliente).compras_count, 1)
+        # Lo que queda sí se puede vender
+        self.vender(self.mouse, 2)
+        self.assertEqual(self.stock(self.mouse), 0)
+
+    def test_editar_y_eliminar_ajustan_stock(self):
+        venta = self.vender(self.mouse, 3)
+        venta.cantidad = 5
+        venta.save()
+        self.assertEqual(self.stock(self.mouse), 5)
+        venta.cantidad = 1
+        venta.save()
+        self.assertEqual(self.stock(self.mouse), 9)
+
+        venta.producto = self.teclado
+        venta.cantidad = 2
+        venta.save()
+        self.assertEqual((self.stock(self.mouse), self.stock(self.teclado)), (10, 3))
+
+        venta.cantidad = 6
+        with self.assertRaises(stock.StockInsuficiente):
+            venta.save()
+        self.assertEqual(Venta.objects.get(pk=venta.pk).cantidad, 2)
+
+        Venta.objects.get(pk=venta.pk).delete()
+        self.assertEqual(self.stock(self.teclado), 5)
+        self.assertEqual(self.libro(self.teclado), [('ajuste', 5), ('edicion', -2), ('anulacion', 2)])
+        self.assertEqual(
+            MovimientoStock.objects.filter(producto=self.mouse).aggregate(total=Sum('cantidad'))['total'], 10
+        )
+
+    def test_eliminar_cliente_no_devuelve_stock(self):
+        # Sus compras se borran en cascada, pero la mercadería ya salió
+        self.vender(self.mouse, 4)
+        self.cliente.delete()
+        self.assertEqual(self.stock(self.mouse), 6)
+
+    def test_producto_sin_stock_no_se_controla(self):
+        monitor = Producto.objects.create(nombre='Monitor', precio=50000, descripcion='')
+        venta = self.vender(monitor, 100)
+        venta.delete()
+        self.assertFalse(StockProducto.objects.filter(producto=monitor).exists())
+        self.assertFalse(MovimientoStock.objects.filter(producto=monitor).exists())
+
+    def test_ajustar_registra_la_diferencia(self):
+        self.vender(self.mouse, 4)
+        self.assertEqual(stock.ajustar(self.mouse.pk, 8, self.vendedor.pk), 2)
+        self.assertEqual(self.stock(self.mouse), 8)
+        self.assertEqual(self.libro(self.mouse), [('ajuste', 10), ('venta', -4), ('ajuste', 2)])
+
+    def test_formulario_informa_stock_insuficiente(self):
+        self.client.force_login(self.vendedor)
+        response = self.client.post(reverse('ventas:crear_venta'), {
+            'cliente': self.cliente.pk, 'producto': self.mouse.pk, 'cantidad': 11,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].errors['cantidad'], ['Stock insuficiente: quedan 10 unidades.'])
+        self.assertFalse(Venta.objects.exists())
+
+
+class EstresStockTestCase(TransactionTestCase):
+    """Ventas concurrentes desde varios hilos: sin descuentos perdidos ni stock negativo"""
+
+    def test_estrategias_respetan_el_stock(self):
+        out = StringIO()
+        call_command('estres_stock', hilos=4, intentos=15, stock=40, cantidad=3, stdout=out)
+        # 60 intentos, 13 ventas caben en 40 unidades (queda 1)
+        for estrategia in ('condicional', 'bloqueo'):
+            self.assertIn(f'{estrategia}: 13 vendidas, 47 rechazadas', out.getvalue())
+        self.assertIn('stock final 1', out.getvalue())
+        self.assertFalse(Producto.objects.filter(nombre__startswith='ZZ_STOCK_').exists())
+        self.assertFalse(MovimientoStock.objects.exists())
+
+    def test_falla_si_se_pierden_descuentos(self):
+        leidas = {}
+
+        def descontar_con_lectura_vieja(producto_id, cantidad):
+            # Escribe a partir de una lectura anterior, como dos ventas que leen a la vez
+            leida = leidas.setdefault(producto_id, StockProducto.objects.get(producto_id=producto_id).cantidad)
+            StockProducto.objects.filter(producto_id=producto_id).update(cantidad=leida - cantidad)
+
+        with mock.patch.dict('inventario.management.commands.estres_stock.ESTRATEGIAS',
+                             {'condicional': descontar_con_lectura_vieja}):
+            with self.assertRaisesMessage(CommandError, 'stock final 99, se esperaba 90'):
+                call_command('estres_stock', hilos=2, intentos=5, stock=100, estrategia='condicional', stdout=StringIO())
+        self.assertFalse(Producto.objects.filter(nombre__startswith='ZZ_STOCK_').exists())
@@ -24,4 +24,9 @@ urlpatterns = [
     path('categorias/crear/', views.crear_categoria, name='crear_categoria'),
     path('categorias/editar/<int:pk>/', views.editar_categoria, name='editar_categoria'),
     path('categorias/eliminar/<int:pk>/', views.eliminar_categoria, name='eliminar_categoria'),
+
+    path('autocompletar/productos/', views.autocompletar_productos, name='autocompletar_productos'),
+    path('autocompletar/marcas/', views.autocompletar_marcas, name='autocompletar_marcas'),
+    path('autocompletar/proveedores/', views.autocompletar_proveedores, name='autocompletar_proveedores'),
+    path('autocompletar/categorias/', views.autocompletar_categorias, name='autocompletar_categorias'),
 ]
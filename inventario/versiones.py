@@ -0,0 +1,41 @@
+"""
+Contadores de versión por tabla del catálogo.
+
+Cada guardado o borrado de `Producto`, `Marca`, `Proveedor` o `Categoria`
+incrementa la versión de su tabla con un UPDATE atómico dentro de la misma
+transacción (ver `inventario/signals.py`). Como el contador vive en la base de
+datos, todos los procesos ven la misma versión apenas se confirma el cambio;
+un caché en memoria por proceso podría servir respuestas obsoletas sin límite
+de tiempo a través de un ETag.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from inventario.models import VersionTabla
+
+TABLAS_CATALOGO = ('producto', 'marca', 'proveedor', 'categoria')
+
+
+def incrementar(*tablas):
+    """Incrementa la versión de cada tabla, creando el contador si no existe."""
+    for tabla in tablas:
+        if VersionTabla.objects.filter(tabla=tabla).update(version=F('version') + 1):
+            continue
+        try:
+            with transaction.atomic():
+                VersionTabla.objects.create(tabla=tabla, version=1)
+        except IntegrityError:
+            # Otro proceso lo creó entre el UPDATE y el INSERT
+            VersionTabla.objects.filter(tabla=tabla).update(version=F('version') + 1)
+
+
+def versiones(tablas=TABLAS_CATALOGO):
+    """Versión actual de cada tabla (0 si nunca cambió), en una sola consulta."""
+    actuales = dict(VersionTabla.objects.filter(tabla__in=tablas).values_list('tabla', 'version'))
+    return {tabla: actuales.get(tabla, 0) for tabla in tablas}
+
+
+def firma(tablas=TABLAS_CATALOGO):
+    """Cadena que cambia cada vez que cambia alguna de `tablas`."""
+    actuales = versiones(tablas)
+    return '.'.join(str(actuales[tabla]) for tabla in tablas)
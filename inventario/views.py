@@ -2,10 +2,14 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from inventario.models import Producto, Marca, Proveedor, Categoria
 from inventario.forms import ProductoForm, MarcaForm, ProveedorForm, CategoriaForm
+from inventario.busqueda import filtrar_por_busqueda, indice
+from inventario import autocompletar
+from pc_shop.instrumentacion import presupuesto_consultas
 from django.core.paginator import Paginator
 from django.db.models import Q
 
 
+@presupuesto_consultas({'get': 6, 'post': 11})
 @login_required
 def lista_productos(request):
     if request.method == 'POST':
@@ -16,14 +20,10 @@ def lista_productos(request):
     else:
         form = ProductoForm()
 
-    productos_list = Producto.objects.all().order_by('-id')
+    productos_list = Producto.objects.select_related('marca', 'proveedor', 'categoria').order_by('-id')
     busqueda = request.GET.get('buscar')
     if busqueda:
-        productos_list = productos_list.filter(
-            Q(nombre__icontains=busqueda) |
-            Q(marca__nombre__icontains=busqueda) |
-            Q(categoria__nombre__icontains=busqueda)
-        ).distinct()
+        productos_list = filtrar_por_busqueda(productos_list, busqueda)
 
     paginator = Paginator(productos_list, 5)
     page_number = request.GET.get('page')
@@ -32,6 +32,7 @@ def lista_productos(request):
     return render(request, 'productos/lista_productos.html', {'productos': page_obj, 'form': form})
 
 
+@presupuesto_consultas({'get': 2, 'post': 11})
 @login_required
 def crear_producto(request):
     if request.method == 'POST':
@@ -44,6 +45,7 @@ def crear_producto(request):
     return render(request, 'productos/crear_producto.html', {'form': form})
 
 
+@presupuesto_consultas({'get': 6, 'post': 13})
 @login_required
 def editar_producto(request, pk):
     producto = get_object_or_404(Producto, pk=pk)
@@ -57,12 +59,14 @@ def editar_producto(request, pk):
     return render(request, 'productos/editar_producto.html', {'form': form})
 
 
+@presupuesto_consultas(3)
 @login_required
 def detalle_producto(request, pk):
-    producto = get_object_or_404(Producto, pk=pk)
+    producto = get_object_or_404(Producto.objects.select_related('marca', 'proveedor', 'categoria'), pk=pk)
     return render(request, 'productos/detalle_producto.html', {'producto': producto})
 
 
+@presupuesto_consultas({'get': 3, 'post': 11})
 @login_required
 def eliminar_producto(request, pk):
     producto = get_object_or_404(Producto, pk=pk)
@@ -72,6 +76,7 @@ def eliminar_producto(request, pk):
     return render(request, 'productos/eliminar_producto.html', {'producto': producto})
 
 
+@presupuesto_consultas(4)
 @login_required
 def lista_marcas(request):
     marcas_list = Marca.objects.all().order_by('-id')
@@ -84,6 +89,7 @@ def lista_marcas(request):
     return render(request, 'marcas/lista_marcas.html', {'marcas': page_obj})
 
 
+@presupuesto_consultas({'get': 2, 'post': 5})
 @login_required
 def crear_marca(request):
     if request.method == 'POST':
@@ -96,6 +102,7 @@ def crear_marca(request):
     return render(request, 'marcas/crear_marca.html', {'form': form})
 
 
+@presupuesto_consultas({'get': 3, 'post': 6})
 @login_required
 def editar_marca(request, pk):
     marca = get_object_or_404(Marca, pk=pk)
@@ -109,6 +116,7 @@ def editar_marca(request, pk):
     return render(request, 'marcas/editar_marca.html', {'form': form})
 
 
+@presupuesto_consultas({'get': 3, 'post': 15})
 @login_required
 def eliminar_marca(request, pk):
     marca = get_object_or_404(Marca, pk=pk)
@@ -118,6 +126,7 @@ def eliminar_marca(request, pk):
     return render(request, 'marcas/eliminar_marca.html', {'marca': marca})
 
 
+@presupuesto_consultas(4)
 @login_required
 def lista_proveedores(request):
     proveedores_list = Proveedor.objects.all().order_by('-id')
@@ -130,6 +139,7 @@ def lista_proveedores(request):
     return render(request, 'proveedores/lista_proveedores.html', {'proveedores': page_obj})
 
 
+@presupuesto_consultas({'get': 2, 'post': 5})
 @login_required
 def crear_proveedor(request):
     if request.method == 'POST':
@@ -142,6 +152,7 @@ def crear_proveedor(request):
     return render(request, 'proveedores/crear_proveedor.html', {'form': form})
 
 
+@presupuesto_consultas({'get': 3, 'post': 6})
 @login_required
 def editar_proveedor(request, pk):
     proveedor = get_object_or_404(Proveedor, pk=pk)
@@ -155,6 +166,7 @@ def editar_proveedor(request, pk):
     return render(request, 'proveedores/editar_proveedor.html', {'form': form})
 
 
+@presupuesto_consultas({'get': 3, 'post': 15})
 @login_required
 def eliminar_proveedor(request, pk):
     proveedor = get_object_or_404(Proveedor, pk=pk)
@@ -164,6 +176,7 @@ def eliminar_proveedor(request, pk):
     return render(request, 'proveedores/eliminar_proveedor.html', {'proveedor': proveedor})
 
 
+@presupuesto_consultas(4)
 @login_required
 def lista_categorias(request):
     categorias_list = Categoria.objects.all().order_by('-id')
@@ -176,6 +189,7 @@ def lista_categorias(request):
     return render(request, 'categorias/lista_categorias.html', {'categorias': page_obj})
 
 
+@presupuesto_consultas({'get': 2, 'post': 5})
 @login_required
 def crear_categoria(request):
     if request.method == 'POST':
@@ -188,6 +202,7 @@ def crear_categoria(request):
     return render(request, 'categorias/crear_categoria.html', {'form': form})
 
 
+@presupuesto_consultas({'get': 3, 'post': 6})
 @login_required
 def editar_categoria(request, pk):
     categoria = get_object_or_404(Categoria, pk=pk)
@@ -201,6 +216,7 @@ def editar_categoria(request, pk):
     return render(request, 'categorias/editar_categoria.html', {'form': form})
 
 
+@presupuesto_consultas({'get': 3, 'post': 6})
 @login_required
 def eliminar_categoria(request, pk):
     categoria = get_object_or_404(Categoria, pk=pk)
@@ -211,3 +227,43 @@ def eliminar_categoria(request, pk):
 from django.shortcuts import render
 
 # Create your views here.
+
+
+def _autocompletar_por_nombre(request, modelo):
+    n = autocompletar.limite(request)
+    queryset = modelo.objects.order_by('nombre')
+    texto = request.GET.get('q', '').strip()
+    if texto:
+        queryset = queryset.filter(nombre__istartswith=texto)
+    return autocompletar.respuesta(queryset[:n + 1], n)
+
+
+@presupuesto_consultas(3)
+@login_required
+def autocompletar_marcas(request):
+    return _autocompletar_por_nombre(request, Marca)
+
+
+@presupuesto_consultas(3)
+@login_required
+def autocompletar_proveedores(request):
+    return _autocompletar_por_nombre(request, Proveedor)
+
+
+@presupuesto_consultas(3)
+@login_required
+def autocompletar_categorias(request):
+    return _autocompletar_por_nombre(request, Categoria)
+
+
+@presupuesto_consultas(5)
+@login_required
+def autocompletar_productos(request):
+    n = autocompletar.limite(request)
+    ids = indice.buscar(request.GET.get('q', ''))
+    if ids is None:
+        return autocompletar.respuesta(Producto.objects.order_by('nombre')[:n + 1], n)
+    # Ids ya ordenados por relevancia en el índice de búsqueda
+    ids = ids[:n + 1]
+    productos = Producto.objects.in_bulk(ids)
+    return autocompletar.respuesta([productos[pk] for pk in ids if pk in productos], n)
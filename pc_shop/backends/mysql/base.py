@@ -0,0 +1,11 @@
+"""Backend MySQL de Django con pool de conexiones (ver `pc_shop/backends/pool.py`)."""
+from django.db.backends.mysql import base
+
+from ..pool import PoolMixin
+
+
+class DatabaseWrapper(PoolMixin, base.DatabaseWrapper):
+
+    def validar_conexion(self, conexion):
+        # COM_PING: sin parsear SQL ni tocar el estado de la sesión
+        conexion.ping()
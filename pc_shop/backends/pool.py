@@ -0,0 +1,276 @@
+"""
+Pool de conexiones por proceso para los backends de base de datos.
+
+Django abre y cierra la conexión en cada request (`CONN_MAX_AGE = 0`), y con
+MySQL el handshake y la autenticación pesan más que muchas de las consultas
+de la request. `PoolMixin` cambia eso: al conectar toma una conexión del pool
+del alias y al cerrar la devuelve, en vez de cerrarla.
+
+El pool es acotado (`MAXIMO`): si no hay conexiones libres la request espera
+hasta `TIMEOUT` segundos y luego falla. Cada conexión se verifica al
+entregarla y se descarta al superar `VIDA_MAXIMA` o al pasar
+`INACTIVIDAD_MAXIMA` segundos sin usarse (antes de que MySQL la corte por
+`wait_timeout`). Se configura en `DATABASES[alias]['POOL']`.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import DatabaseError
+
+CONFIGURACION = {
+    'MAXIMO': 10,
+    'TIMEOUT': 5,
+    'VIDA_MAXIMA': 1800,
+    'INACTIVIDAD_MAXIMA': 300,
+}
+
+
+class PoolAgotado(DatabaseError):
+    """No se liberó ninguna conexión dentro del timeout."""
+
+
+class _Entrada:
+    __slots__ = ('conexion', 'creada', 'devuelta')
+
+    def __init__(self, conexion, ahora):
+        self.conexion = conexion
+        self.creada = ahora
+        self.devuelta = ahora
+
+
+class PoolConexiones:
+    """Pool acotado y thread-safe de conexiones DB-API.
+
+    `crear()` abre una conexión nueva, `validar(conexion)` lanza una excepción
+    si no sirve y `cerrar(conexion)` la cierra; así el pool no depende del
+    driver y se prueba con conexiones falsas.
+    """
+
+    def __init__(self, crear, validar, cerrar, maximo=10, timeout=5,
+                 vida_maxima=1800, inactividad_maxima=300, reloj=time.monotonic):
+        self.crear = crear
+        self.validar = validar
+        self.cerrar = cerrar
+        self.maximo = maximo
+        self.timeout = timeout
+        self.vida_maxima = vida_maxima
+        self.inactividad_maxima = inactividad_maxima
+        self.reloj = reloj
+        self._libres = deque()   # las más recientes a la derecha
+        self._en_uso = {}        # id(conexion) -> _Entrada
+        self._condicion = threading.Condition()
+        self._contadores = dict.fromkeys(
+            ('creadas', 'reutilizadas', 'descartadas', 'fallidas', 'esperas', 'agotado'), 0
+        )
+        self._tiempo_espera = 0.0
+        self._abriendo = 0
+
+    # ----- API -----
+
+    def obtener(self):
+        """Entrega una conexión validada; espera si el pool está lleno."""
+        while True:
+            entrada = self._reservar()
+            if entrada is None:
+                # Hay cupo: se abre fuera del lock para no bloquear al resto
+                return self._abrir()
+            try:
+                self.validar(entrada.conexion)
+            except Exception:
+                self._sacar(entrada, 'fallidas')
+                self._cerrar(entrada.conexion)
+                continue
+            with self._condicion:
+                self._contadores['reutilizadas'] += 1
+            return entrada.conexion
+
+    def devolver(self, conexion, reutilizable=True):
+        with self._condicion:
+            entrada = self._en_uso.get(id(conexion))
+            if entrada is None:
+                return
+            if reutilizable and self.reloj() - entrada.creada < self.vida_maxima:
+                del self._en_uso[id(conexion)]
+                entrada.devuelta = self.reloj()
+                self._libres.append(entrada)
+                self._condicion.notify()
+                return
+        self._sacar(entrada, 'descartadas')
+        self._cerrar(conexion)
+
+    def vaciar(self):
+        """Cierra las conexiones libres (las en uso se cierran al devolverse)."""
+        with self._condicion:
+            libres, self._libres = list(self._libres), deque()
+            self._contadores['descartadas'] += len(libres)
+        for entrada in libres:
+            self._cerrar(entrada.conexion)
+
+    def estadisticas(self):
+        with self._condicion:
+            return {
+                'maximo': self.maximo,
+                'en_uso': len(self._en_uso) + self._abriendo,
+                'libres': len(self._libres),
+                **self._contadores,
+                'tiempo_espera_s': round(self._tiempo_espera, 6),
+            }
+
+    # ----- Interno -----
+
+    def _reservar(self):
+        """Entrada libre y vigente, o None si hay cupo para abrir una nueva."""
+        vencidas = []
+        inicio = None
+        try:
+            with self._condicion:
+                while True:
+                    ahora = self.reloj()
+                    while self._libres:
+                        entrada = self._libres.pop()
+                        if (ahora - entrada.creada >= self.vida_maxima
+                                or ahora - entrada.devuelta >= self.inactividad_maxima):
+                            self._contadores['descartadas'] += 1
+                            vencidas.append(entrada)
+                            continue
+                        self._en_uso[id(entrada.conexion)] = entrada
+                        return entrada
+                    if len(self._en_uso) + self._abriendo < self.maximo:
+                        self._abriendo += 1
+                        return None
+                    if inicio is None:
+                        inicio = time.monotonic()
+                        self._contadores['esperas'] += 1
+                    restante = self.timeout - (time.monotonic() - inicio)
+                    if restante <= 0:
+                        self._contadores['agotado'] += 1
+                        raise PoolAgotado(
+                            f'Sin conexiones libres tras {self.timeout}s (máximo {self.maximo})'
+                        )
+                    self._condicion.wait(restante)
+        finally:
+            if inicio is not None:
+                with self._condicion:
+                    self._tiempo_espera += time.monotonic() - inicio
+            for entrada in vencidas:
+                self._cerrar(entrada.conexion)
+
+    def _abrir(self):
+        try:
+            conexion = self.crear()
+        except BaseException:
+            with self._condicion:
+                self._abriendo -= 1
+                self._condicion.notify()
+            raise
+        with self._condicion:
+            self._abriendo -= 1
+            self._en_uso[id(conexion)] = _Entrada(conexion, self.reloj())
+            self._contadores['creadas'] += 1
+        return conexion
+
+    def _sacar(self, entrada, contador):
+        with self._condicion:
+            self._en_uso.pop(id(entrada.conexion), None)
+            self._contadores[contador] += 1
+            self._condicion.notify()
+
+    def _cerrar(self, conexion):
+        try:
+            self.cerrar(conexion)
+        except Exception:
+            pass
+
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def _clave(settings_dict):
+    # La base de tests cambia NAME: no debe recibir conexiones de la base real
+    return (os.getpid(),) + tuple(settings_dict.get(k) for k in ('NAME', 'HOST', 'PORT', 'USER'))
+
+
+def estadisticas():
+    """Estadísticas de los pools de este proceso, por base de datos."""
+    pid = os.getpid()
+    with _lock:
+        pools = [(clave, pool) for clave, pool in _pools.items() if clave[0] == pid]
+    return {clave[1]: pool.estadisticas() for clave, pool in pools}
+
+
+def vaciar():
+    """Cierra las conexiones libres de todos los pools de este proceso."""
+    pid = os.getpid()
+    with _lock:
+        pools = [pool for clave, pool in _pools.items() if clave[0] == pid]
+    for pool in pools:
+        pool.vaciar()
+
+
+class PoolMixin:
+    """Mezcla para un `DatabaseWrapper`: conecta desde el pool y devuelve al cerrar.
+
+    Se usa con `CONN_MAX_AGE = 0` para que cada request devuelva su conexión
+    al terminar y otro hilo la pueda usar.
+    """
+
+    def usa_pool(self):
+        """False para conectar y cerrar sin pool, como el backend base."""
+        return True
+
+    def validar_conexion(self, conexion):
+        cursor = conexion.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+
+    def pool(self, conn_params=None):
+        clave = _clave(self.settings_dict)
+        with _lock:
+            pool = _pools.get(clave)
+            if pool is None:
+                if conn_params is None:
+                    return None
+                if any(k[0] != clave[0] for k in _pools):
+                    # Proceso hijo (fork): las conexiones del padre no se tocan
+                    _pools.clear()
+                configuracion = {**CONFIGURACION, **self.settings_dict.get('POOL', {})}
+                crear = super().get_new_connection
+                pool = _pools[clave] = PoolConexiones(
+                    crear=lambda: crear(conn_params),
+                    validar=self.validar_conexion,
+                    cerrar=lambda conexion: conexion.close(),
+                    maximo=configuracion['MAXIMO'],
+                    timeout=configuracion['TIMEOUT'],
+                    vida_maxima=configuracion['VIDA_MAXIMA'],
+                    inactividad_maxima=configuracion['INACTIVIDAD_MAXIMA'],
+                )
+            return pool
+
+    def get_new_connection(self, conn_params):
+        if not self.usa_pool():
+            return super().get_new_connection(conn_params)
+        return self.pool(conn_params).obtener()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = self.pool()
+        if pool is None:
+            return super()._close()
+        pool.devolver(self.connection, reutilizable=self._reutilizable())
+
+    def _reutilizable(self):
+        # Cerrada a mitad de un atomic o tras un error de red: no vuelve al pool
+        if self.in_atomic_block or (self.errors_occurred and not self.is_usable()):
+            return False
+        if not self.autocommit:
+            try:
+                self.connection.rollback()
+            except Exception:
+                return False
+        return True
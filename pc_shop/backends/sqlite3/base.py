@@ -0,0 +1,11 @@
+"""Backend SQLite con el mismo pool que el de MySQL, para desarrollo local y tests."""
+from django.db.backends.sqlite3 import base
+
+from ..pool import PoolMixin
+
+
+class DatabaseWrapper(PoolMixin, base.DatabaseWrapper):
+    def usa_pool(self):
+        # Django no cierra las conexiones a una base en memoria (`close()` las
+        # ignora para no perder los datos): nunca volverían al pool
+        return not self.is_in_memory_db()
@@ -0,0 +1,38 @@
+"""
+Backends de caché que cuentan aciertos y fallos para `/metricas/`.
+
+`CacheMedidoMixin` se antepone a cualquier backend de Django; la serie lleva
+la etiqueta `cache` con el LOCATION del backend (o `default` si no tiene).
+"""
+from django.core.cache.backends.base import BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from pc_shop.metricas import registrar_cache
+
+_AUSENTE = object()
+
+
+class CacheMedidoMixin:
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.nombre_metrica = location or 'default'
+
+    def get(self, key, default=None, version=None):
+        valor = super().get(key, _AUSENTE, version=version)
+        registrar_cache(self.nombre_metrica, valor is not _AUSENTE)
+        return default if valor is _AUSENTE else valor
+
+    def get_many(self, keys, version=None):
+        if super().get_many.__func__ is BaseCache.get_many:
+            # La implementación base llama a get() por clave: ya se cuentan ahí
+            return super().get_many(keys, version=version)
+        keys = list(keys)
+        valores = super().get_many(keys, version=version)
+        registrar_cache(self.nombre_metrica, True, len(valores))
+        registrar_cache(self.nombre_metrica, False, len(keys) - len(valores))
+        return valores
+
+
+class LocMemCacheMedido(CacheMedidoMixin, LocMemCache):
+    """LocMemCache con aciertos y fallos en las métricas."""
@@ -0,0 +1,215 @@
+"""
+Instrumentación SQL por request.
+
+`InstrumentacionSQLMiddleware` cuenta las consultas de cada request y su tiempo
+total y lo devuelve en el encabezado `Server-Timing`, que las herramientas de
+desarrollo del navegador muestran en la pestaña de red:
+
+    Server-Timing: db;dur=12.4;desc="7 consultas", app;dur=31.0
+
+Las requests lentas (`INSTRUMENTACION_SQL['LENTO_MS']`) se registran en el
+logger `pc_shop.sql`, con una muestra de `MUESTREO`, junto con las `TOP`
+sentencias más repetidas: la misma sentencia muchas veces en una request es
+casi siempre un N+1.
+
+Cada vista declara su presupuesto de consultas: `presupuesto_consultas` en la
+clase (un número, o un dict por acción del ViewSet) o el decorador
+`@presupuesto_consultas(...)` en las vistas función (un número, o un dict por
+método HTTP). Las vistas cuyo costo crece con la entrada (p. ej. la carga
+masiva de ventas) declaran la parte fija y suman el resto en cada request con
+`ampliar_presupuesto`. Pasarse del presupuesto se registra siempre; los tests
+de cada app recorren sus rutas y comparan `response.consultas_sql` con él.
+
+Las consultas que hace una respuesta en streaming mientras se envía (p. ej. la
+exportación de ventas) no se cuentan: ocurren después de la vista.
+
+Cada conexión lleva un `execute_wrapper` fijo que pasa las consultas por las
+`Medicion` activas en el contexto (un `ContextVar`). Bajo ASGI las conexiones
+son del hilo donde corre el ORM, no del event loop donde corre el middleware,
+y el contexto sí pasa de uno a otro con `sync_to_async`.
+"""
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('pc_shop.sql')
+
+CONFIGURACION = {
+    'LENTO_MS': 500,
+    'MUESTREO': 1.0,
+    'TOP': 5,
+}
+
+# `IN (%s, %s, ...)` y `VALUES (...), (...)` de largo variable cuentan como la misma sentencia
+_LISTA_PARAMETROS = re.compile(r'\((?:%s|\?)(?:\s*,\s*(?:%s|\?))+\)')
+_FILAS_VALUES = re.compile(r'(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+')
+
+
+def configuracion():
+    return {**CONFIGURACION, **getattr(settings, 'INSTRUMENTACION_SQL', {})}
+
+
+def presupuesto_consultas(presupuesto):
+    """Declara el máximo de consultas de una vista función: un número o {'get': n, 'post': m}."""
+    def decorador(vista):
+        vista.presupuesto_consultas = presupuesto
+        return vista
+    return decorador
+
+
+def presupuesto_de(vista, metodo):
+    """Presupuesto declarado para `vista` con `metodo`, o None si no tiene."""
+    presupuesto = getattr(vista, 'presupuesto_consultas', None)
+    if presupuesto is None:
+        clase = getattr(vista, 'cls', None) or getattr(vista, 'view_class', None)
+        presupuesto = getattr(clase, 'presupuesto_consultas', None)
+    if isinstance(presupuesto, dict):
+        metodo = 'get' if metodo.lower() == 'head' else metodo.lower()
+        # ViewSets: por acción ('list', 'retrieve', ...); el resto por método
+        accion = (getattr(vista, 'actions', None) or {}).get(metodo, metodo)
+        presupuesto = presupuesto.get(accion)
+    return presupuesto
+
+
+def ampliar_presupuesto(request, consultas):
+    """Suma `consultas` al presupuesto declarado, solo para esta request."""
+    # Request de DRF: el middleware ve la HttpRequest que envuelve
+    request = getattr(request, '_request', request)
+    request.presupuesto_consultas_extra = getattr(request, 'presupuesto_consultas_extra', 0) + consultas
+
+
+def normalizar(sql):
+    return _FILAS_VALUES.sub(r'\1...', _LISTA_PARAMETROS.sub('(...)', sql))
+
+
+# Mediciones activas en el contexto (request, hilo o tarea async)
+_activas = ContextVar('pc_shop_mediciones_sql', default=())
+
+
+def _medir(execute, sql, params, many, context):
+    for medicion in _activas.get():
+        execute = partial(medicion, execute)
+    return execute(sql, params, many, context)
+
+
+def _instalar(connection, **kwargs):
+    if _medir not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir)
+
+
+def instalar(**kwargs):
+    """Agrega el wrapper de medición a las conexiones de este hilo que ya existen.
+
+    Las nuevas lo reciben al conectarse (`connection_created`). Se llama al
+    empezar cada request, que bajo ASGI corre en el hilo de las vistas sync.
+    """
+    for conexion in connections.all(initialized_only=True):
+        _instalar(conexion)
+
+
+connection_created.connect(_instalar, dispatch_uid='pc_shop_medir_sql')
+request_started.connect(instalar, dispatch_uid='pc_shop_medir_sql')
+
+
+class Medicion:
+    """Consultas ejecutadas mientras está activa, en todas las conexiones de su contexto."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.sentencias = Counter()
+        self._token = None
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.consultas += 1
+            self.sentencias[normalizar(sql)] += 1
+
+    def __enter__(self):
+        instalar()
+        self._token = _activas.set(_activas.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _activas.reset(self._token)
+
+    def repetidas(self, n):
+        """Las `n` sentencias ejecutadas más de una vez, con sus repeticiones."""
+        return [(sql, veces) for sql, veces in self.sentencias.most_common(n) if veces > 1]
+
+
+class InstrumentacionSQLMiddleware:
+    """Cuenta consultas por request, agrega Server-Timing y registra las lentas y las que exceden presupuesto.
+
+    Sync y async: bajo ASGI no agrega adaptadores entre hilos a las vistas async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        inicio = time.perf_counter()
+        with Medicion() as medicion:
+            response = self.get_response(request)
+        return self.medir(request, response, medicion, inicio)
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        with Medicion() as medicion:
+            response = await self.get_response(request)
+        return self.medir(request, response, medicion, inicio)
+
+    def medir(self, request, response, medicion, inicio):
+        total_ms = (time.perf_counter() - inicio) * 1000
+        db_ms = medicion.tiempo * 1000
+        match = request.resolver_match
+        request.presupuesto_consultas = presupuesto_de(match.func, request.method) if match else None
+        if request.presupuesto_consultas is not None:
+            request.presupuesto_consultas += getattr(request, 'presupuesto_consultas_extra', 0)
+
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{medicion.consultas} consultas", app;dur={total_ms:.1f}'
+        )
+        response.consultas_sql = medicion.consultas
+        response.tiempo_sql = medicion.tiempo
+        response.presupuesto_consultas = request.presupuesto_consultas
+
+        config = configuracion()
+        presupuesto = request.presupuesto_consultas
+        excedido = presupuesto is not None and medicion.consultas > presupuesto
+        lento = total_ms >= config['LENTO_MS'] and random.random() < config['MUESTREO']
+        if excedido or lento:
+            self.registrar(request, response, medicion, total_ms, db_ms, config['TOP'], excedido)
+        return response
+
+    def registrar(self, request, response, medicion, total_ms, db_ms, top, excedido):
+        vista = getattr(request.resolver_match, 'view_name', None) or request.path
+        motivo = (
+            f'excede su presupuesto de {request.presupuesto_consultas} consultas' if excedido else 'lenta'
+        )
+        lineas = [
+            f'{request.method} {request.get_full_path()} ({vista}) {motivo}: {response.status_code}, '
+            f'{total_ms:.0f} ms, {medicion.consultas} consultas en {db_ms:.0f} ms'
+        ]
+        lineas += [f'  {veces}x {sql}' for sql, veces in medicion.repetidas(top)]
+        logger.warning('\n'.join(lineas))
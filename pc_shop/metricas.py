@@ -0,0 +1,312 @@
+"""
+Métricas de la aplicación en formato de texto de Prometheus (`/metricas/`).
+
+`MetricasMiddleware` registra por vista (`VentaViewSet.estadisticas` para las
+acciones de DRF, el nombre de la URL para el resto, p. ej.
+`inventario:lista_productos`):
+
+- requests por método y código de estado, y las que terminan en 5xx,
+- un histograma de latencia,
+- consultas SQL y su tiempo (medidos por `InstrumentacionSQLMiddleware`).
+
+Los cachés de Django con `pc_shop.cache.LocMemCacheMedido` y el caché de
+usuarios JWT cuentan aciertos y fallos; `/metricas/` expone los totales y la
+tasa de aciertos.
+
+Registrar no toma locks: cada hilo suma en su propio `Fragmento` y solo el
+hilo dueño lo escribe. Al exponer se suman los fragmentos (copiar un dict es
+atómico con el GIL).
+
+Con varios procesos en el mismo host (gunicorn/uvicorn con workers), cada
+proceso vuelca sus totales cada `METRICAS['INTERVALO']` segundos a un archivo
+propio en `METRICAS['DIRECTORIO']` y `/metricas/` suma los archivos de todos,
+así que da lo mismo qué worker atiende al scraper. Los archivos de procesos
+que ya terminaron se siguen sumando para que los contadores no retrocedan;
+el directorio se vacía al desplegar (ver README). Sin `DIRECTORIO` se exponen
+solo las métricas del proceso que responde.
+"""
+import atexit
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+CONFIGURACION = {
+    'DIRECTORIO': None,
+    'INTERVALO': 5,
+    'TOKEN': None,
+    # Segundos
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+}
+
+# nombre -> (tipo, ayuda)
+FAMILIAS = {
+    'pc_shop_requests_total': ('counter', 'Requests atendidas por vista, método y código de estado.'),
+    'pc_shop_requests_errores_total': ('counter', 'Requests que terminaron en 5xx, por vista y método.'),
+    'pc_shop_request_duracion_segundos': ('histogram', 'Latencia de las requests por vista.'),
+    'pc_shop_db_consultas_total': ('counter', 'Consultas SQL ejecutadas por vista.'),
+    'pc_shop_db_duracion_segundos_total': ('counter', 'Tiempo en consultas SQL por vista.'),
+    'pc_shop_cache_total': ('counter', 'Lecturas de caché por caché y resultado (acierto o fallo).'),
+    'pc_shop_cache_tasa_aciertos': ('gauge', 'Aciertos sobre lecturas totales de cada caché.'),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def configuracion():
+    return {**CONFIGURACION, **getattr(settings, 'METRICAS', {})}
+
+
+class Fragmento:
+    """Contadores de un hilo: {(nombre, etiquetas): valor}, con etiquetas como tupla de pares."""
+
+    def __init__(self):
+        self.valores = defaultdict(float)
+
+
+class Registro:
+    """Métricas del proceso, repartidas en un fragmento por hilo."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._fragmentos = []
+        self._lock = threading.Lock()  # solo para registrar fragmentos nuevos
+        self._archivo = None
+        self._ultimo_volcado = 0.0
+
+    def _fragmento(self):
+        fragmento = getattr(self._local, 'fragmento', None)
+        if fragmento is None:
+            fragmento = self._local.fragmento = Fragmento()
+            with self._lock:
+                self._fragmentos.append(fragmento)
+        return fragmento
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        self._fragmento().valores[nombre, tuple(sorted(etiquetas.items()))] += valor
+
+    def observar(self, nombre, valor, buckets, **etiquetas):
+        """Histograma: cada observación suma en el primer bucket que la contiene (acumulados al exponer)."""
+        valores = self._fragmento().valores
+        base = tuple(sorted(etiquetas.items()))
+        limite = next((b for b in buckets if valor <= b), '+Inf')
+        valores[f'{nombre}_bucket', base + (('le', str(limite)),)] += 1
+        valores[f'{nombre}_sum', base] += valor
+        valores[f'{nombre}_count', base] += 1
+
+    def totales(self):
+        """Suma de los fragmentos de todos los hilos de este proceso."""
+        with self._lock:
+            fragmentos = list(self._fragmentos)
+        totales = defaultdict(float)
+        for fragmento in fragmentos:
+            for clave, valor in dict(fragmento.valores).items():
+                totales[clave] += valor
+        return totales
+
+    def reiniciar(self):
+        with self._lock:
+            self._fragmentos = []
+            self._local = threading.local()
+        self._archivo = None
+
+    # ----- varios procesos -----
+
+    def archivo(self, directorio):
+        # Un archivo por proceso; el uuid evita pisar el de un proceso anterior con el mismo pid
+        if self._archivo is None:
+            self._archivo = Path(directorio) / f'metricas_{os.getpid()}_{uuid.uuid4().hex[:8]}.json'
+        return self._archivo
+
+    def volcar(self, forzar=False):
+        """Escribe los totales del proceso en su archivo, a lo más cada INTERVALO segundos."""
+        config = configuracion()
+        if not config['DIRECTORIO']:
+            return
+        ahora = time.monotonic()
+        if not forzar and ahora - self._ultimo_volcado < config['INTERVALO']:
+            return
+        self._ultimo_volcado = ahora
+        archivo = self.archivo(config['DIRECTORIO'])
+        filas = [[nombre, list(etiquetas), valor] for (nombre, etiquetas), valor in self.totales().items()]
+        temporal = archivo.with_suffix(f'.{threading.get_ident()}.tmp')
+        temporal.write_text(json.dumps(filas))
+        os.replace(temporal, archivo)  # quien lee ve el archivo anterior o el nuevo, nunca uno a medias
+
+    def agregados(self):
+        """Totales de todos los procesos del host (o solo de este, sin DIRECTORIO)."""
+        directorio = configuracion()['DIRECTORIO']
+        if not directorio:
+            return self.totales()
+        self.volcar(forzar=True)
+        totales = defaultdict(float)
+        for archivo in Path(directorio).glob('metricas_*.json'):
+            try:
+                filas = json.loads(archivo.read_text())
+            except (OSError, ValueError):
+                continue
+            for nombre, etiquetas, valor in filas:
+                totales[nombre, tuple(tuple(par) for par in etiquetas)] += valor
+        return totales
+
+
+registro = Registro()
+atexit.register(lambda: registro.volcar(forzar=True))
+# Un worker creado con fork empieza de cero: los totales heredados son del padre
+os.register_at_fork(after_in_child=registro.reiniciar)
+
+
+def registrar_cache(cache, acierto, cantidad=1):
+    if cantidad:
+        registro.incrementar('pc_shop_cache_total', cantidad, cache=cache, resultado='acierto' if acierto else 'fallo')
+
+
+# ----- exposición -----
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares) + '}'
+
+
+def _valor(valor):
+    return str(int(valor)) if float(valor).is_integer() else repr(valor)
+
+
+def _orden(fila):
+    # Series juntas y, en los histogramas, los buckets de menor a mayor
+    nombre, etiquetas, _ = fila
+    base = tuple((clave, str(valor)) for clave, valor in etiquetas if clave != 'le')
+    le = dict(etiquetas).get('le')
+    return base, nombre, float('inf') if le == '+Inf' else float(le or 0)
+
+
+def _acumular_buckets(totales, buckets):
+    """Los buckets se guardan por rango; Prometheus los espera acumulados (le = menor o igual)."""
+    limites = [str(b) for b in buckets] + ['+Inf']
+    series = defaultdict(dict)
+    for (nombre, etiquetas), valor in totales.items():
+        if nombre.endswith('_bucket'):
+            base = tuple(par for par in etiquetas if par[0] != 'le')
+            series[nombre, base][dict(etiquetas)['le']] = valor
+    acumulados = {}
+    for (nombre, base), por_limite in series.items():
+        suma = 0
+        for limite in limites:
+            suma += por_limite.get(limite, 0)
+            acumulados[nombre, base + (('le', limite),)] = suma
+    return acumulados
+
+
+def texto_metricas(totales, buckets):
+    """Formato de exposición de texto de Prometheus para `totales`."""
+    series = {clave: valor for clave, valor in totales.items() if not clave[0].endswith('_bucket')}
+    series.update(_acumular_buckets(totales, buckets))
+
+    # Tasa de aciertos por caché, desde los totales ya sumados entre procesos
+    lecturas = defaultdict(lambda: [0, 0])
+    for (nombre, etiquetas), valor in series.items():
+        if nombre == 'pc_shop_cache_total':
+            pares = dict(etiquetas)
+            lecturas[pares['cache']][pares['resultado'] == 'acierto'] += valor
+    for cache, (fallos, aciertos) in lecturas.items():
+        if aciertos + fallos:
+            series['pc_shop_cache_tasa_aciertos', (('cache', cache),)] = aciertos / (aciertos + fallos)
+
+    lineas = []
+    for familia, (tipo, ayuda) in FAMILIAS.items():
+        nombres = (f'{familia}_bucket', f'{familia}_sum', f'{familia}_count') if tipo == 'histogram' else (familia,)
+        filas = sorted(
+            ((nombre, etiquetas, valor) for (nombre, etiquetas), valor in series.items() if nombre in nombres),
+            key=_orden,
+        )
+        if not filas:
+            continue
+        lineas.append(f'# HELP {familia} {ayuda}')
+        lineas.append(f'# TYPE {familia} {tipo}')
+        lineas += [f'{nombre}{_etiquetas(etiquetas)} {_valor(valor)}' for nombre, etiquetas, valor in filas]
+    return '\n'.join(lineas) + '\n'
+
+
+def vista_metricas(request):
+    """Métricas de todos los workers del host. Con METRICAS['TOKEN'] pide `Authorization: Bearer <token>`;
+    sin él, solo usuarios staff."""
+    config = configuracion()
+    if config['TOKEN']:
+        permitido = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {config["TOKEN"]}')
+    else:
+        permitido = request.user.is_authenticated and request.user.is_staff
+    if not permitido:
+        return HttpResponse('No autorizado\n', status=403, content_type='text/plain; charset=utf-8')
+    return HttpResponse(texto_metricas(registro.agregados(), config['BUCKETS']), content_type=CONTENT_TYPE)
+
+
+# ----- recolección -----
+
+def nombre_vista(request, view_func):
+    """`Clase.accion` para ViewSets de DRF, `Clase` para otras vistas de clase, nombre de la URL para el resto."""
+    acciones = getattr(view_func, 'actions', None)
+    clase = getattr(view_func, 'cls', None)
+    if clase is not None and acciones:
+        return f'{clase.__name__}.{acciones.get(request.method.lower(), request.method.lower())}'
+    if clase is not None and not getattr(clase, '__module__', '').startswith('rest_framework.decorators'):
+        return clase.__name__
+    match = request.resolver_match
+    return (match.view_name if match else None) or getattr(view_func, '__name__', 'desconocida')
+
+
+class MetricasMiddleware:
+    """Registra latencia, estado y consultas de cada request. Va antes que InstrumentacionSQLMiddleware.
+
+    Sync y async: bajo ASGI no agrega adaptadores entre hilos a las vistas async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.buckets = configuracion()['BUCKETS']
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        inicio = time.perf_counter()
+        response = self.get_response(request)
+        self.registrar(request, response, time.perf_counter() - inicio)
+        return response
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        response = await self.get_response(request)
+        self.registrar(request, response, time.perf_counter() - inicio)
+        return response
+
+    def registrar(self, request, response, duracion):
+        # Sin vista resuelta (404 de ruta, redirecciones de CommonMiddleware) todo va a una sola serie
+        match = request.resolver_match
+        vista = nombre_vista(request, match.func) if match else 'sin_vista'
+        registro.incrementar(
+            'pc_shop_requests_total', vista=vista, metodo=request.method, estado=response.status_code
+        )
+        if response.status_code >= 500:
+            registro.incrementar('pc_shop_requests_errores_total', vista=vista, metodo=request.method)
+        registro.observar('pc_shop_request_duracion_segundos', duracion, self.buckets, vista=vista)
+        consultas = getattr(response, 'consultas_sql', None)
+        if consultas is not None:
+            registro.incrementar('pc_shop_db_consultas_total', consultas, vista=vista)
+            registro.incrementar('pc_shop_db_duracion_segundos_total', response.tiempo_sql, vista=vista)
+        registro.volcar()
@@ -0,0 +1,100 @@
+"""
+Utilidades para los tests de presupuesto de consultas de cada app.
+
+`PresupuestoConsultasMixin` recorre las rutas de un namespace (`espacio`) y
+verifica que cada vista declare su presupuesto (ver `pc_shop/instrumentacion.py`)
+y que las respuestas no lo excedan. Las consultas las cuenta el middleware, así
+que incluyen sesión, autenticación y cachés: los tests limpian el caché y el
+índice de búsqueda antes de medir para contar el peor caso, y
+`assertEscriturasMedidas` comprueba que el recorrido midió todos los métodos
+que escriben.
+"""
+from django.core.cache import cache
+from django.urls import URLResolver, get_resolver, reverse
+
+from inventario.busqueda import indice
+from pc_shop.instrumentacion import presupuesto_de
+
+
+def _patrones(patrones, espacio=None):
+    for patron in patrones:
+        if isinstance(patron, URLResolver):
+            yield from _patrones(patron.url_patterns, patron.namespace or espacio)
+        elif patron.name:
+            yield espacio, patron
+
+
+def metodos(vista):
+    """Métodos HTTP que atiende `vista` (los de su presupuesto, o GET, para las vistas función)."""
+    acciones = getattr(vista, 'actions', None)
+    if acciones:
+        return sorted(metodo.upper() for metodo in acciones if metodo != 'head')
+    clase = getattr(vista, 'cls', None) or getattr(vista, 'view_class', None)
+    if clase is not None:
+        return sorted(
+            metodo.upper() for metodo in clase.http_method_names
+            if hasattr(clase, metodo) and metodo not in ('head', 'options')
+        )
+    presupuesto = getattr(vista, 'presupuesto_consultas', None)
+    if isinstance(presupuesto, dict):
+        return sorted(metodo.upper() for metodo in presupuesto)
+    return ['GET']
+
+
+class PresupuestoConsultasMixin:
+    """Para TestCase: rutas de `espacio` y aserciones sobre su presupuesto de consultas."""
+
+    espacio = None
+    # (nombre, método) que no pueden responder bien en el recorrido, con el motivo en un comentario
+    escrituras_sin_medir = ()
+
+    def rutas(self):
+        """{nombre: (vista, usa_pk)} de las rutas del namespace, sin las variantes con formato."""
+        rutas = {}
+        for espacio, patron in _patrones(get_resolver().url_patterns):
+            argumentos = set(patron.pattern.regex.groupindex)
+            if espacio == self.espacio and 'format' not in argumentos:
+                rutas.setdefault(patron.name, (patron.callback, 'pk' in argumentos))
+        return rutas
+
+    def assertRutasConPresupuesto(self):
+        sin_presupuesto = [
+            f'{nombre} {metodo}'
+            for nombre, (vista, _) in self.rutas().items()
+            for metodo in metodos(vista)
+            if presupuesto_de(vista, metodo) is None
+        ]
+        self.assertEqual(sin_presupuesto, [], 'Rutas sin presupuesto de consultas')
+
+    def assertEscriturasMedidas(self):
+        """Todos los métodos que escriben, de todas las rutas, pasaron por `medir` en este test."""
+        medidas = getattr(self, 'medidas', set())
+        sin_medir = [
+            f'{nombre} {metodo}'
+            for nombre, (vista, _) in self.rutas().items()
+            for metodo in metodos(vista)
+            if metodo != 'GET' and (nombre, metodo) not in medidas
+            and (nombre, metodo) not in self.escrituras_sin_medir
+        ]
+        self.assertEqual(sin_medir, [], 'Escrituras sin medir')
+
+    def limpiar_caches(self):
+        cache.clear()
+        indice.invalidar()
+
+    def medir(self, metodo, nombre, pk=None, cliente=None, **kwargs):
+        """Hace la request con los cachés vacíos y verifica que responda bien sin exceder su presupuesto."""
+        self.limpiar_caches()
+        url = reverse(f'{self.espacio}:{nombre}', kwargs={'pk': pk} if pk is not None else None)
+        response = getattr(cliente or self.client, metodo.lower())(url, **kwargs)
+        self.assertDentroDelPresupuesto(response, f'{metodo} {nombre}')
+        self.__dict__.setdefault('medidas', set()).add((nombre, metodo))
+        return response
+
+    def assertDentroDelPresupuesto(self, response, descripcion=''):
+        self.assertLess(response.status_code, 400, descripcion)
+        self.assertIsNotNone(response.presupuesto_consultas, f'{descripcion}: sin presupuesto')
+        self.assertLessEqual(
+            response.consultas_sql, response.presupuesto_consultas,
+            f'{descripcion}: {response.consultas_sql} consultas, presupuesto {response.presupuesto_consultas}'
+        )
@@ -0,0 +1,145 @@
+"""
+Lecturas en réplicas de MySQL y escrituras en la primaria.
+
+`RouterReplicas` manda las lecturas de los modelos de `inventario` y `ventas`
+a una réplica (`REPLICAS['LECTURA']`) y todo lo demás a la primaria. Para que
+cada usuario vea lo que acaba de escribir pese al retraso de replicación, las
+lecturas vuelven a la primaria:
+
+- durante toda request que no sea GET/HEAD/OPTIONS,
+- durante `REPLICAS['VENTANA']` segundos después de la última escritura, en la
+  misma request o en las siguientes del mismo navegador (cookie que pone
+  `PrimariaTrasEscrituraMiddleware`),
+- dentro de un `transaction.atomic()` en la primaria.
+
+Los clientes de la API con JWT no guardan cookies: para ellos la ventana dura
+lo que dura la request que escribió.
+"""
+import math
+import random
+import time
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+CONFIGURACION = {
+    'PRIMARIA': 'default',
+    'LECTURA': [],
+    'APPS': ['inventario', 'ventas'],
+    'VENTANA': 5,
+    'COOKIE': 'usar_primaria',
+}
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+# Asignado por request (hilo o tarea async): hasta cuándo leer de la primaria
+_estado = Local()
+
+
+def configuracion():
+    return {**CONFIGURACION, **getattr(settings, 'REPLICAS', {})}
+
+
+def fijar_primaria(segundos=None):
+    """Lee de la primaria durante `segundos` (o hasta `liberar_primaria()` si es None)."""
+    hasta = math.inf if segundos is None else time.monotonic() + segundos
+    _estado.hasta = max(getattr(_estado, 'hasta', 0), hasta)
+
+
+def liberar_primaria():
+    _estado.hasta = 0
+    _estado.escribio = False
+
+
+def usa_primaria():
+    return getattr(_estado, 'hasta', 0) > time.monotonic()
+
+
+class RouterReplicas:
+    """Router de Django: lecturas a réplicas, escrituras a la primaria."""
+
+    def _enrutado(self, model):
+        return model._meta.app_label in configuracion()['APPS']
+
+    def db_for_read(self, model, **hints):
+        if not self._enrutado(model):
+            return None
+        config = configuracion()
+        if (not config['LECTURA'] or usa_primaria()
+                or connections[config['PRIMARIA']].in_atomic_block):
+            return config['PRIMARIA']
+        return random.choice(config['LECTURA'])
+
+    def db_for_write(self, model, **hints):
+        if not self._enrutado(model):
+            return None
+        config = configuracion()
+        _estado.escribio = True
+        fijar_primaria(config['VENTANA'])
+        return config['PRIMARIA']
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas son copias de la primaria: todo es la misma base
+        config = configuracion()
+        bases = {config['PRIMARIA'], *config['LECTURA']}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación
+        if db in configuracion()['LECTURA']:
+            return False
+        return None
+
+
+class PrimariaTrasEscrituraMiddleware:
+    """Fija la primaria en requests que escriben y en las siguientes `VENTANA` segundos.
+
+    Sync y async: bajo ASGI no agrega adaptadores entre hilos a las vistas async.
+    El estado es un `Local` de asgiref, que pasa entre la tarea async y el hilo
+    de las vistas sync de la misma request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = self.preparar(request)
+        try:
+            response = self.get_response(request)
+            escribio = getattr(_estado, 'escribio', False)
+        finally:
+            liberar_primaria()
+        return self.responder(request, response, config, escribio)
+
+    async def __acall__(self, request):
+        config = self.preparar(request)
+        try:
+            response = await self.get_response(request)
+            escribio = getattr(_estado, 'escribio', False)
+        finally:
+            liberar_primaria()
+        return self.responder(request, response, config, escribio)
+
+    def preparar(self, request):
+        config = configuracion()
+        liberar_primaria()
+        if request.method not in METODOS_SEGUROS or config['COOKIE'] in request.COOKIES:
+            fijar_primaria()
+        return config
+
+    def responder(self, request, response, config, escribio):
+        if escribio or request.method not in METODOS_SEGUROS:
+            response.set_cookie(
+                config['COOKIE'], '1', max_age=config['VENTANA'], httponly=True, samesite='Lax'
+            )
+        return response
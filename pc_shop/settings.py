@@ -47,10 +47,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Primero, para medir también sesión y autenticación; métricas antes que
+    # instrumentación porque usa las consultas que esta cuenta
+    'pc_shop.metricas.MetricasMiddleware',
+    'pc_shop.instrumentacion.InstrumentacionSQLMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'pc_shop.replicas.PrimariaTrasEscrituraMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -85,12 +90,64 @@ WSGI_APPLICATION = 'pc_shop.wsgi.application'
 # Lee los datos de conexión desde tu archivo .env
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'pc_shop.backends.mysql',  # django.db.backends.mysql + pool de conexiones
         'NAME': 'base_pcshop',         # <--- CAMBIO
         'USER': 'root',         # <--- CAMBIO
         'PASSWORD':'Contra.12', # <--- CAMBIO
         'HOST': 'localhost',
         'PORT': '3306',
+        # Cada request devuelve su conexión al pool al terminar
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAXIMO': 10,               # conexiones por proceso (>= hilos del worker)
+            'TIMEOUT': 5,               # segundos de espera por una conexión libre
+            'VIDA_MAXIMA': 1800,        # segundos antes de reabrir una conexión
+            'INACTIVIDAD_MAXIMA': 300,  # menor que wait_timeout de MySQL
+        },
+    }
+}
+
+# Réplica de lectura (opcional): con DB_REPLICA_HOST en .env las lecturas de
+# inventario y ventas van a la réplica (ver pc_shop/replicas.py)
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', '3306'),
+        # En tests la réplica es la misma base de tests que default
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['pc_shop.replicas.RouterReplicas']
+
+REPLICAS = {
+    'PRIMARIA': 'default',
+    'LECTURA': [alias for alias in DATABASES if alias != 'default'],
+    'APPS': ['inventario', 'ventas'],
+    'VENTANA': 5,  # segundos leyendo de la primaria tras una escritura
+}
+
+# Consultas por request (pc_shop/instrumentacion.py): Server-Timing en cada
+# respuesta y log de las requests lentas con sus sentencias repetidas
+INSTRUMENTACION_SQL = {
+    'LENTO_MS': 500,
+    'MUESTREO': 1.0,  # fracción de las requests lentas que se registran
+    'TOP': 5,         # sentencias repetidas por request en el log
+}
+
+# /metricas/ en formato Prometheus (pc_shop/metricas.py). Con varios workers
+# en el host, DIRECTORIO debe ser un directorio local compartido por todos
+# (y vaciarse al desplegar) para que cualquier worker responda con el total.
+METRICAS = {
+    'DIRECTORIO': os.getenv('METRICAS_DIRECTORIO') or None,
+    'INTERVALO': 5,                         # segundos entre volcados de cada proceso
+    'TOKEN': os.getenv('METRICAS_TOKEN'),   # Bearer del scraper; sin él, solo staff
+}
+
+# Caché local con aciertos/fallos en las métricas (pc_shop/cache.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'pc_shop.cache.LocMemCacheMedido',
     }
 }
 
@@ -132,13 +189,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Configuración REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication con el usuario en caché (ver apirest/autenticacion.py)
+        'apirest.autenticacion.JWTAutenticacionCacheada',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'apirest.pagination.PaginacionPorNumero',
     'PAGE_SIZE': 20,
 }
 
@@ -162,3 +220,15 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
 }
+
+# Caché de usuarios autenticados por JWT (apirest/autenticacion.py).
+# Con varios procesos, apuntar CACHE a un caché compartido (Redis/Memcached)
+# para que editar, desactivar o eliminar un usuario, o cambiarle la contraseña,
+# se note en todos de inmediato. Sin él, los demás procesos siguen aceptando
+# sus tokens con los datos anteriores hasta TTL segundos.
+# MAXIMO acota los usuarios en memoria de cada proceso.
+JWT_CACHE_USUARIOS = {
+    'MAXIMO': 10000,
+    'TTL': 60,
+    'CACHE': None,
+}
@@ -0,0 +1,583 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections, router, transaction
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import ResolverMatch, reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from inventario.models import Categoria, Marca, Producto, Proveedor, VersionTabla
+from pc_shop import instrumentacion, metricas, replicas
+from pc_shop.backends import pool as pool_conexiones
+from pc_shop.backends.pool import PoolAgotado, PoolConexiones
+from pc_shop.cache import CacheMedidoMixin
+
+
+class ConexionFalsa:
+    def __init__(self, numero):
+        self.numero = numero
+        self.cerrada = False
+        self.sana = True
+
+    def close(self):
+        self.cerrada = True
+
+
+def resuelta(request, vista):
+    """`request` como la deja el handler al resolver la URL hacia `vista`."""
+    request.resolver_match = ResolverMatch(vista, (), {}, url_name=vista.__name__)
+    return request
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+class PoolConexionesTestCase(SimpleTestCase):
+    """Tests del pool con una fábrica de conexiones falsas"""
+    
+    def crear_pool(self, **kwargs):
+        self.creadas = []
+        
+        def crear():
+            conexion = ConexionFalsa(len(self.creadas))
+            self.creadas.append(conexion)
+            return conexion
+        
+        def validar(conexion):
+            if not conexion.sana:
+                raise OSError('conexión caída')
+        
+        return PoolConexiones(crear, validar, lambda c: c.close(), **kwargs)
+    
+    def test_reutiliza_conexiones(self):
+        pool = self.crear_pool(maximo=2)
+        a = pool.obtener()
+        pool.devolver(a)
+        self.assertIs(pool.obtener(), a)
+        self.assertEqual(len(self.creadas), 1)
+        stats = pool.estadisticas()
+        self.assertEqual((stats['creadas'], stats['reutilizadas'], stats['en_uso']), (1, 1, 1))
+    
+    def test_acotado_espera_y_timeout(self):
+        pool = self.crear_pool(maximo=2, timeout=0.05)
+        a, b = pool.obtener(), pool.obtener()
+        with self.assertRaises(PoolAgotado):
+            pool.obtener()
+        
+        # Una conexión devuelta mientras otro hilo espera le llega a ese hilo
+        pool.timeout = 2
+        threading.Timer(0.05, pool.devolver, args=[a]).start()
+        self.assertIs(pool.obtener(), a)
+        
+        stats = pool.estadisticas()
+        self.assertEqual(stats['creadas'], 2)
+        self.assertEqual(stats['esperas'], 2)
+        self.assertEqual(stats['agotado'], 1)
+        self.assertGreater(stats['tiempo_espera_s'], 0.05)
+    
+    def test_nunca_supera_el_maximo(self):
+        pool = self.crear_pool(maximo=3, timeout=5)
+        maximo_visto = []
+        
+        def trabajar():
+            for _ in range(20):
+                conexion = pool.obtener()
+                maximo_visto.append(pool.estadisticas()['en_uso'])
+                time.sleep(0.001)
+                pool.devolver(conexion)
+        
+        hilos = [threading.Thread(target=trabajar) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertLessEqual(max(maximo_visto), 3)
+        self.assertLessEqual(len(self.creadas), 3)
+        self.assertEqual(pool.estadisticas()['en_uso'], 0)
+    
+    def test_descarta_conexion_caida_al_entregar(self):
+        pool = self.crear_pool(maximo=1)
+        a = pool.obtener()
+        pool.devolver(a)
+        a.sana = False
+        b = pool.obtener()
+        self.assertIsNot(b, a)
+        self.assertTrue(a.cerrada)
+        self.assertEqual(pool.estadisticas()['fallidas'], 1)
+    
+    def test_vida_maxima_e_inactividad(self):
+        reloj = Reloj()
+        pool = self.crear_pool(maximo=2, vida_maxima=100, inactividad_maxima=10, reloj=reloj)
+        a = pool.obtener()
+        pool.devolver(a)
+        
+        reloj.ahora = 11
+        b = pool.obtener()
+        self.assertIsNot(b, a)
+        self.assertTrue(a.cerrada)
+        
+        # Vencida mientras estaba en uso: se cierra al devolverla
+        reloj.ahora = 120
+        pool.devolver(b)
+        self.assertTrue(b.cerrada)
+        stats = pool.estadisticas()
+        self.assertEqual((stats['descartadas'], stats['libres'], stats['en_uso']), (2, 0, 0))
+    
+    def test_devolver_no_reutilizable(self):
+        pool = self.crear_pool(maximo=1)
+        a = pool.obtener()
+        pool.devolver(a, reutilizable=False)
+        self.assertTrue(a.cerrada)
+        self.assertIsNot(pool.obtener(), a)
+
+
+class BackendConPoolTestCase(SimpleTestCase):
+    """El DatabaseWrapper con pool, sobre SQLite en un archivo temporal"""
+    
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(lambda: [os.remove(os.path.join(directorio, f)) for f in os.listdir(directorio)])
+        self.handler = ConnectionHandler({
+            'default': {},
+            'pool': {
+                'ENGINE': 'pc_shop.backends.sqlite3',
+                'NAME': os.path.join(directorio, 'pool.sqlite3'),
+                'POOL': {'MAXIMO': 2, 'TIMEOUT': 0.1},
+            }
+        })
+        self.addCleanup(self.handler.close_all)
+        self.addCleanup(pool_conexiones.vaciar)
+    
+    def conectar(self):
+        conexion = self.handler.create_connection('pool')
+        conexion.ensure_connection()
+        return conexion
+    
+    def test_cerrar_devuelve_al_pool(self):
+        primera = self.conectar()
+        cruda = primera.connection
+        primera.close()
+        
+        segunda = self.conectar()
+        self.assertIs(segunda.connection, cruda)
+        with segunda.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+        segunda.close()
+        
+        stats = pool_conexiones.estadisticas()[segunda.settings_dict['NAME']]
+        self.assertEqual((stats['creadas'], stats['reutilizadas'], stats['libres']), (1, 1, 1))
+    
+    def test_acotado_por_proceso(self):
+        a, b = self.conectar(), self.conectar()
+        cruda = a.connection
+        with self.assertRaises(PoolAgotado):
+            self.conectar()
+        a.close()
+        c = self.conectar()
+        self.assertIs(c.connection, cruda)
+        b.close()
+        c.close()
+    
+    def test_cerrada_dentro_de_atomic_no_vuelve(self):
+        conexion = self.conectar()
+        cruda = conexion.connection
+        conexion.set_autocommit(False)
+        conexion.in_atomic_block = True
+        conexion.close()
+        conexion.in_atomic_block = False
+        self.assertIsNot(self.conectar().connection, cruda)
+
+    def test_base_en_memoria_no_usa_el_pool(self):
+        # Django no cierra las conexiones en memoria: con pool, cada hilo dejaría una tomada
+        handler = ConnectionHandler({'default': {}, 'memoria': {
+            'ENGINE': 'pc_shop.backends.sqlite3',
+            'NAME': 'file:pool_memoria?mode=memory&cache=shared',
+            'POOL': {'MAXIMO': 2, 'TIMEOUT': 0.1},
+        }})
+        errores = []
+
+        def usar():
+            conexion = handler['memoria']
+            try:
+                with conexion.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            except Exception as error:
+                errores.append(error)
+            finally:
+                conexion.close()
+                if conexion.connection is not None:
+                    conexion.connection.close()
+
+        for _ in range(5):
+            hilo = threading.Thread(target=usar)
+            hilo.start()
+            hilo.join()
+        self.assertEqual(errores, [])
+        self.assertNotIn(handler.settings['memoria']['NAME'], pool_conexiones.estadisticas())
+
+
+@override_settings(REPLICAS={'PRIMARIA': 'prueba_primaria', 'LECTURA': ['prueba_replica'], 'VENTANA': 5})
+class RouterReplicasTestCase(SimpleTestCase):
+    """Lecturas a la réplica y escrituras a la primaria, con dos bases SQLite"""
+    # Alias creados en setUpClass: '__all__' los incluye al validar
+    databases = '__all__'
+    alias = ('prueba_primaria', 'prueba_replica')
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.directorio = tempfile.mkdtemp()
+        for alias in cls.alias:
+            connections.settings[alias] = {
+                **connections.settings['default'],
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(cls.directorio, f'{alias}.sqlite3'),
+            }
+            with connections[alias].schema_editor() as editor:
+                for modelo in (Marca, Proveedor, Categoria, Producto, VersionTabla):
+                    editor.create_model(modelo)
+        super().setUpClass()
+    
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in cls.alias:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        shutil.rmtree(cls.directorio)
+    
+    def setUp(self):
+        for alias in self.alias:
+            Marca.objects.using(alias).all().delete()
+        Marca.objects.using('prueba_primaria').create(nombre='En primaria')
+        Marca.objects.using('prueba_replica').create(nombre='En réplica')
+        replicas.liberar_primaria()
+        self.addCleanup(replicas.liberar_primaria)
+    
+    def leidas(self):
+        return list(Marca.objects.values_list('nombre', flat=True))
+    
+    def test_lecturas_van_a_la_replica(self):
+        self.assertEqual(self.leidas(), ['En réplica'])
+        self.assertEqual(router.db_for_write(Marca), 'prueba_primaria')
+    
+    def test_modelos_fuera_de_las_apps_no_se_enrutan(self):
+        self.assertIsNone(replicas.RouterReplicas().db_for_read(User))
+        self.assertEqual(router.db_for_read(User), 'default')
+    
+    def test_primaria_tras_escribir_durante_la_ventana(self):
+        Marca.objects.create(nombre='Nueva')
+        self.assertEqual(sorted(self.leidas()), ['En primaria', 'Nueva'])
+        
+        ahora = time.monotonic()
+        with mock.patch('pc_shop.replicas.time.monotonic', return_value=ahora + 6):
+            self.assertEqual(self.leidas(), ['En réplica'])
+    
+    def test_primaria_dentro_de_atomic(self):
+        with transaction.atomic(using='prueba_primaria'):
+            self.assertEqual(self.leidas(), ['En primaria'])
+        self.assertEqual(self.leidas(), ['En réplica'])
+    
+    def test_replicas_no_migran(self):
+        self.assertFalse(router.allow_migrate('prueba_replica', 'inventario'))
+        self.assertTrue(router.allow_migrate('prueba_primaria', 'inventario'))
+    
+    def test_middleware(self):
+        leidas = []
+        
+        def vista(request):
+            if request.method == 'POST':
+                Marca.objects.create(nombre='Desde POST')
+            leidas.append(self.leidas())
+            return HttpResponse()
+        
+        middleware = replicas.PrimariaTrasEscrituraMiddleware(vista)
+        factory = RequestFactory()
+        
+        respuesta = middleware(factory.post('/'))
+        self.assertEqual(sorted(leidas[-1]), ['Desde POST', 'En primaria'])
+        self.assertEqual(respuesta.cookies['usar_primaria']['max-age'], 5)
+        # El estado no pasa a la request siguiente del mismo hilo
+        self.assertFalse(replicas.usa_primaria())
+        
+        respuesta = middleware(factory.get('/'))
+        self.assertEqual(leidas[-1], ['En réplica'])
+        self.assertNotIn('usar_primaria', respuesta.cookies)
+        
+        request = factory.get('/')
+        request.COOKIES['usar_primaria'] = '1'
+        middleware(request)
+        self.assertEqual(sorted(leidas[-1]), ['Desde POST', 'En primaria'])
+    
+    async def test_middleware_async(self):
+        leidas = []
+        
+        async def vista(request):
+            if 'escribir' in request.GET:
+                # La escritura corre en el hilo del ORM; la marca vuelve a la request
+                await Marca.objects.acreate(nombre=request.GET['escribir'])
+            leidas.append([nombre async for nombre in Marca.objects.values_list('nombre', flat=True)])
+            return HttpResponse()
+        
+        middleware = replicas.PrimariaTrasEscrituraMiddleware(vista)
+        self.assertTrue(iscoroutinefunction(middleware))
+        factory = RequestFactory()
+        
+        respuesta = await middleware(factory.get('/'))
+        self.assertEqual(leidas[-1], ['En réplica'])
+        self.assertNotIn('usar_primaria', respuesta.cookies)
+        
+        respuesta = await middleware(factory.get('/', {'escribir': 'Desde GET'}))
+        self.assertEqual(sorted(leidas[-1]), ['Desde GET', 'En primaria'])
+        self.assertEqual(respuesta.cookies['usar_primaria']['max-age'], 5)
+        self.assertFalse(replicas.usa_primaria())
+
+
+class InstrumentacionSQLTestCase(TestCase):
+    """Tests del middleware de consultas por request"""
+
+    def setUp(self):
+        self.marcas = [Marca.objects.create(nombre=f'Marca {i}') for i in range(3)]
+
+    def procesar(self, vista, metodo='get'):
+        request = getattr(RequestFactory(), metodo)('/prueba/')
+        return instrumentacion.InstrumentacionSQLMiddleware(vista)(resuelta(request, vista))
+
+    def test_server_timing(self):
+        def vista(request):
+            list(Marca.objects.all())
+            Marca.objects.count()
+            return HttpResponse('ok')
+
+        response = self.procesar(vista)
+        self.assertEqual(response.consultas_sql, 2)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="2 consultas", app;dur=[\d.]+$')
+
+    @override_settings(INSTRUMENTACION_SQL={'LENTO_MS': 0, 'MUESTREO': 1.0, 'TOP': 2})
+    def test_registra_lentas_con_sentencias_repetidas(self):
+        def vista(request):
+            # N+1: una consulta por marca
+            for marca in Marca.objects.all():
+                marca.productos.count()
+            Producto.objects.filter(id__in=[1, 2]).exists()
+            Producto.objects.filter(id__in=[1, 2, 3]).exists()
+            return HttpResponse('ok')
+
+        with self.assertLogs('pc_shop.sql', 'WARNING') as logs:
+            self.procesar(vista)
+        mensaje = logs.output[0]
+        self.assertIn('lenta', mensaje)
+        self.assertIn('6 consultas', mensaje)
+        self.assertIn('  3x SELECT COUNT(*)', mensaje)
+        # Las listas IN de distinto largo cuentan como la misma sentencia
+        self.assertIn('IN (...) LIMIT 1', mensaje.splitlines()[2])
+
+    def test_presupuesto_excedido(self):
+        @instrumentacion.presupuesto_consultas({'get': 1, 'post': 5})
+        def vista(request):
+            list(Marca.objects.all())
+            Marca.objects.count()
+            return HttpResponse('ok')
+
+        with self.assertLogs('pc_shop.sql', 'WARNING') as logs:
+            response = self.procesar(vista)
+        self.assertEqual(response.presupuesto_consultas, 1)
+        self.assertIn('excede su presupuesto de 1 consultas', logs.output[0])
+
+        with self.assertNoLogs('pc_shop.sql', 'WARNING'):
+            response = self.procesar(vista, 'post')
+        self.assertEqual(response.presupuesto_consultas, 5)
+
+    def test_ampliar_presupuesto(self):
+        @instrumentacion.presupuesto_consultas(1)
+        def vista(request):
+            instrumentacion.ampliar_presupuesto(request, 2)
+            list(Marca.objects.all())
+            Marca.objects.count()
+            return HttpResponse('ok')
+
+        with self.assertNoLogs('pc_shop.sql', 'WARNING'):
+            response = self.procesar(vista)
+        self.assertEqual(response.presupuesto_consultas, 3)
+
+    def test_presupuesto_de_viewsets(self):
+        from apirest.views import MarcaViewSet
+        lista = MarcaViewSet.as_view({'get': 'list', 'post': 'create'})
+        detalle = MarcaViewSet.as_view({'get': 'retrieve', 'delete': 'destroy'})
+        self.assertEqual(instrumentacion.presupuesto_de(lista, 'GET'), MarcaViewSet.presupuesto_consultas['list'])
+        self.assertEqual(instrumentacion.presupuesto_de(lista, 'HEAD'), MarcaViewSet.presupuesto_consultas['list'])
+        self.assertEqual(instrumentacion.presupuesto_de(detalle, 'DELETE'), MarcaViewSet.presupuesto_consultas['destroy'])
+        self.assertIsNone(instrumentacion.presupuesto_de(lambda request: None, 'GET'))
+
+    async def test_middleware_async(self):
+        async def vista(request):
+            return HttpResponse('ok')
+
+        middleware = instrumentacion.InstrumentacionSQLMiddleware(vista)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(resuelta(RequestFactory().get('/prueba/'), vista))
+        self.assertEqual(response.consultas_sql, 0)
+
+    async def test_cuenta_las_consultas_de_las_rutas_async(self):
+        # Bajo ASGI el ORM corre en otro hilo que el middleware
+        usuario = await User.objects.acreate(username='async')
+        token = RefreshToken.for_user(usuario).access_token
+        sync = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+        esperado = await sync_to_async(sync.get)(reverse('api:productos-list'))
+        response = await AsyncClient().get(
+            reverse('api:async-productos-list'), headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.consultas_sql, 0)
+        self.assertEqual(response.presupuesto_consultas, esperado.presupuesto_consultas)
+
+
+def _registrar_en_otro_proceso(directorio):
+    with override_settings(METRICAS={'DIRECTORIO': directorio}):
+        metricas.registro.incrementar('pc_shop_requests_total', 5, vista='X.list', metodo='GET', estado=200)
+        metricas.registro.volcar(forzar=True)
+
+
+class MetricasTestCase(TestCase):
+    """Tests del registro de métricas y de /metricas/"""
+
+    def setUp(self):
+        metricas.registro.reiniciar()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.staff = User.objects.create_user(username='staff', password='x', is_staff=True)
+
+    def texto(self):
+        return metricas.texto_metricas(metricas.registro.agregados(), metricas.CONFIGURACION['BUCKETS'])
+
+    def test_fragmentos_por_hilo(self):
+        def registrar():
+            for _ in range(1000):
+                metricas.registro.incrementar('pc_shop_db_consultas_total', vista='v')
+
+        hilos = [threading.Thread(target=registrar) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertIn('pc_shop_db_consultas_total{vista="v"} 4000\n', self.texto())
+
+    def test_histograma_acumulado(self):
+        for segundos in (0.003, 0.02, 0.02, 30):
+            metricas.registro.observar('pc_shop_request_duracion_segundos', segundos, (0.01, 0.1), vista='v')
+        texto = metricas.texto_metricas(metricas.registro.totales(), (0.01, 0.1))
+        self.assertIn(
+            'pc_shop_request_duracion_segundos_bucket{vista="v",le="0.01"} 1\n'
+            'pc_shop_request_duracion_segundos_bucket{vista="v",le="0.1"} 3\n'
+            'pc_shop_request_duracion_segundos_bucket{vista="v",le="+Inf"} 4\n'
+            'pc_shop_request_duracion_segundos_count{vista="v"} 4\n'
+            'pc_shop_request_duracion_segundos_sum{vista="v"} 30.043\n',
+            texto
+        )
+        self.assertIn('# TYPE pc_shop_request_duracion_segundos histogram', texto)
+
+    def test_suma_procesos_del_host(self):
+        with override_settings(METRICAS={'DIRECTORIO': self.directorio}):
+            metricas.registro.incrementar('pc_shop_requests_total', 2, vista='X.list', metodo='GET', estado=200)
+            proceso = multiprocessing.get_context('fork').Process(
+                target=_registrar_en_otro_proceso, args=(self.directorio,)
+            )
+            proceso.start()
+            proceso.join()
+            self.assertEqual(proceso.exitcode, 0)
+            # El hijo no arrastra los 2 del padre: 2 + 5
+            self.assertIn('pc_shop_requests_total{estado="200",metodo="GET",vista="X.list"} 7\n', self.texto())
+            self.assertEqual(len(os.listdir(self.directorio)), 2)
+
+    def test_aciertos_de_cache(self):
+        cache = caches.create_connection('default')
+        self.assertIsInstance(cache, CacheMedidoMixin)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+        cache.get_many(['a', 'b'])
+        texto = self.texto()
+        self.assertIn('pc_shop_cache_total{cache="default",resultado="acierto"} 3\n', texto)
+        self.assertIn('pc_shop_cache_total{cache="default",resultado="fallo"} 2\n', texto)
+        self.assertIn('pc_shop_cache_tasa_aciertos{cache="default"} 0.6\n', texto)
+
+    def test_vista_metricas(self):
+        self.client.force_login(self.staff)
+        Marca.objects.create(nombre='Marca')
+        self.client.get(reverse('inventario:lista_marcas'))
+        api = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.staff).access_token}')
+        api.get(reverse('api:ventas-estadisticas'))
+        api.get(reverse('api:ventas-estadisticas'))
+        api.post(reverse('api:ventas-list'), {})
+
+        response = self.client.get(reverse('metricas'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = response.content.decode()
+        self.assertIn('pc_shop_requests_total{estado="200",metodo="GET",vista="VentaViewSet.estadisticas"} 2\n', texto)
+        self.assertIn('pc_shop_requests_total{estado="400",metodo="POST",vista="VentaViewSet.create"} 1\n', texto)
+        self.assertIn('pc_shop_requests_total{estado="200",metodo="GET",vista="inventario:lista_marcas"} 1\n', texto)
+        self.assertIn('pc_shop_request_duracion_segundos_count{vista="VentaViewSet.estadisticas"} 2\n', texto)
+        self.assertRegex(texto, r'pc_shop_db_consultas_total\{vista="inventario:lista_marcas"\} [1-9]')
+
+    def test_errores(self):
+        def falla(request):
+            return HttpResponse(status=503)
+
+        middleware = metricas.MetricasMiddleware(falla)
+        middleware(resuelta(RequestFactory().get('/x/'), falla))
+        self.assertIn('pc_shop_requests_errores_total{metodo="GET",vista="falla"} 1\n', self.texto())
+
+    async def test_middleware_async(self):
+        async def falla(request):
+            return HttpResponse(status=503)
+
+        middleware = metricas.MetricasMiddleware(falla)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(resuelta(RequestFactory().get('/x/'), falla))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('pc_shop_requests_errores_total{metodo="GET",vista="falla"} 1\n', self.texto())
+
+    def test_acceso(self):
+        url = reverse('metricas')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(METRICAS={'TOKEN': 'secreto'}):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+
+
+@override_settings(DEBUG=True)
+class MiddlewareAsyncTestCase(SimpleTestCase):
+    """Bajo ASGI los middlewares del proyecto no agregan adaptadores entre hilos"""
+    middlewares = (
+        'pc_shop.metricas.MetricasMiddleware',
+        'pc_shop.instrumentacion.InstrumentacionSQLMiddleware',
+        'pc_shop.replicas.PrimariaTrasEscrituraMiddleware',
+    )
+
+    def test_sin_adaptadores(self):
+        # Con DEBUG, el handler registra cada middleware que tuvo que adaptar
+        with self.assertLogs('django.request', 'DEBUG') as registro:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('fin')
+        adaptados = [linea for linea in registro.output if any(m in linea for m in self.middlewares)]
+        self.assertEqual(adaptados, [])
@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from pc_shop.metricas import vista_metricas
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metricas/', vista_metricas, name='metricas'),
     # La app principal sigue disponible en la raíz
     path('', include('app_shop.urls')),
     # Auth (login/logout)
@@ -0,0 +1,41 @@
+"""
+Filtros del libro de ventas (`app_shop_venta`) que comparten la API, la
+exportación y las estadísticas.
+
+Los días se cuentan en la zona horaria del proyecto, pero el filtro no usa
+`fecha__date`: envolver la columna en una función (`DATE(CONVERT_TZ(fecha, ...))`)
+impide usar cualquier índice sobre `fecha`. En su lugar, los días
+[fecha_desde, fecha_hasta] se traducen al rango semiabierto de instantes
+[inicio de fecha_desde, inicio del día siguiente a fecha_hasta), calculado en
+Python con la zona horaria (correcto también en los cambios de horario).
+
+Los índices que usan estos filtros están en `Venta.Meta.indexes` (migración
+ventas 0005) y `verificar_indices_ventas` muestra el plan de cada combinación.
+"""
+from datetime import timedelta
+
+from ventas.rollups import inicio_del_dia
+
+# Filtros por columna que acepta `filtrar_ventas` (el de fechas va aparte)
+FILTROS = ('vendedor', 'cliente', 'producto')
+
+
+def rango_fechas(fecha_desde=None, fecha_hasta=None):
+    """Filtros `fecha__gte` / `fecha__lt` para los días locales [fecha_desde, fecha_hasta]."""
+    filtros = {}
+    if fecha_desde:
+        filtros['fecha__gte'] = inicio_del_dia(fecha_desde)
+    if fecha_hasta:
+        filtros['fecha__lt'] = inicio_del_dia(fecha_hasta + timedelta(days=1))
+    return filtros
+
+
+def filtrar_ventas(queryset, vendedor=None, cliente=None, producto=None, fecha_desde=None, fecha_hasta=None):
+    """Aplica a `queryset` los filtros del listado de ventas (fechas como `date`, inclusivas)."""
+    if vendedor:
+        queryset = queryset.filter(vendedor_id=vendedor)
+    if cliente:
+        queryset = queryset.filter(cliente_id=cliente)
+    if producto:
+        queryset = queryset.filter(producto_id=producto)
+    return queryset.filter(**rango_fechas(fecha_desde, fecha_hasta))
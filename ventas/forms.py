@@ -1,6 +1,8 @@
 from django import forms
 from .models import Cliente, Venta
 from inventario.models import Producto
+from inventario.autocompletar import AutocompletarSelect
+from inventario.stock import StockInsuficiente
 
 class ClienteForm(forms.ModelForm):
     class Meta:
@@ -20,7 +22,19 @@ class VentaForm(forms.ModelForm):
         model = Venta
         fields = ['cliente', 'producto', 'cantidad']
         widgets = {
-            'cliente': forms.Select(attrs={'class': 'form-select'}),
-            'producto': forms.Select(attrs={'class': 'form-select'}),
+            'cliente': AutocompletarSelect('ventas:autocompletar_clientes', attrs={'class': 'form-select'}),
+            'producto': AutocompletarSelect('inventario:autocompletar_productos', attrs={'class': 'form-select'}),
             'cantidad': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
         }
+
+    def guardar(self, **campos):
+        """Guarda la venta con `campos` adicionales (p. ej. vendedor); None si no hay stock suficiente."""
+        venta = self.save(commit=False)
+        for campo, valor in campos.items():
+            setattr(venta, campo, valor)
+        try:
+            venta.save()
+        except StockInsuficiente as error:
+            self.add_error('cantidad', f'Stock insuficiente: quedan {error.disponible} unidades.')
+            return None
+        return venta
@@ -0,0 +1,164 @@
+"""
+Carga masiva de ventas (cierres de turno de los puntos de venta).
+
+`registrar_lote` valida todas las filas contra una sola lectura de los
+productos y clientes referenciados, calcula los totales en memoria e inserta
+con `bulk_create` dentro de una transacción. Como `bulk_create` no dispara
+señales, los resúmenes por cliente y los acumulados diarios se actualizan aquí
+con una operación por cliente y por día × producto, no por venta.
+
+El stock se descuenta con un UPDATE condicional por cada producto del lote que
+lo controla (ver `inventario.stock`), en la misma transacción: si las unidades
+de un producto superan su stock, todas sus filas se rechazan.
+
+MySQL no devuelve los ids de `bulk_create` (`can_return_rows_from_bulk_insert`).
+Cada venta del lote lleva el mismo token en `Venta.lote`, y después del INSERT
+se releen los ids de ese token en orden. No depende de qué más se inserte en
+paralelo ni de que haya filas iguales. El orden sí vale: InnoDB asigna los
+auto-incrementos de cada INSERT crecientes en el orden de sus filas con
+cualquier `innodb_autoinc_lock_mode` (el modo 2 puede dejar huecos, no
+desordenarlos), y los de un INSERT posterior son mayores.
+"""
+import uuid
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from inventario import stock
+from inventario.models import Producto
+from ventas import resumenes, rollups
+from ventas.models import Cliente, Venta
+
+BATCH_SIZE = 500
+
+
+def registrar_lote(vendedor, filas, todo_o_nada=False):
+    """Crea las ventas de `filas` (dicts con cliente, producto y cantidad) para `vendedor`.
+
+    Devuelve un resultado por fila, en el mismo orden: las filas con errores
+    se informan y no se insertan. Con `todo_o_nada`, un solo error cancela el lote.
+    """
+    precios = dict(
+        Producto.objects.filter(pk__in={f['producto'] for f in filas}).values_list('id', 'precio')
+    )
+    clientes = set(
+        Cliente.objects.filter(pk__in={f['cliente'] for f in filas}).values_list('id', flat=True)
+    )
+
+    resultados = []
+    ventas = []
+    for fila in filas:
+        errores = {}
+        if fila['cliente'] not in clientes:
+            errores['cliente'] = [f'Cliente {fila["cliente"]} no existe.']
+        if fila['producto'] not in precios:
+            errores['producto'] = [f'Producto {fila["producto"]} no existe.']
+        if errores:
+            resultados.append({'estado': 'error', 'errores': errores})
+            continue
+        venta = Venta(
+            vendedor=vendedor,
+            cliente_id=fila['cliente'],
+            producto_id=fila['producto'],
+            cantidad=fila['cantidad'],
+            precio_unitario=precios[fila['producto']],
+            total_venta=precios[fila['producto']] * fila['cantidad'],
+        )
+        ventas.append(venta)
+        resultados.append({'estado': 'creada', 'venta': venta})
+
+    if todo_o_nada and len(ventas) < len(filas):
+        return _omitir(resultados), []
+
+    with transaction.atomic():
+        unidades = defaultdict(int)
+        for venta in ventas:
+            unidades[venta.producto_id] += venta.cantidad
+        controlados, sin_stock = stock.vender_lote(unidades)
+        if sin_stock:
+            ventas = _rechazar_sin_stock(resultados, sin_stock)
+            if todo_o_nada:
+                transaction.set_rollback(True)
+                return _omitir(resultados), []
+        lote = uuid.uuid4().hex
+        for venta in ventas:
+            venta.lote = lote
+        Venta.objects.bulk_create(ventas, batch_size=BATCH_SIZE)
+        if ventas and not connection.features.can_return_rows_from_bulk_insert:
+            _asignar_ids(ventas, lote)
+        stock.registrar_ventas(ventas, controlados, batch_size=BATCH_SIZE)
+        _actualizar_resumenes(ventas)
+    return resultados, ventas
+
+
+def consultas_maximas(filas):
+    """Tope de consultas de `registrar_lote(vendedor, filas)`, para el presupuesto de la vista.
+
+    Fijas: precios, clientes, productos con stock, SAVEPOINT, ROLLBACK TO y
+    RELEASE, y la relectura de ids. Por cada `BATCH_SIZE` filas, el INSERT de
+    las ventas y el de sus movimientos de stock. Por cliente, su resumen, y por
+    producto, su acumulado del día: un UPDATE, o además SAVEPOINT, INSERT y
+    RELEASE si la fila es nueva. Por producto, también su stock: el UPDATE y,
+    si no alcanza, la lectura del disponible.
+    """
+    lotes = -(-len(filas) // BATCH_SIZE)
+    clientes = len({fila['cliente'] for fila in filas})
+    productos = len({fila['producto'] for fila in filas})
+    return 7 + 2 * lotes + 4 * clientes + 6 * productos
+
+
+def _asignar_ids(ventas, lote):
+    """Completa el `pk` de `ventas`, recién insertadas con `bulk_create` sin ids devueltos."""
+    ids = list(Venta.objects.filter(lote=lote).order_by('id').values_list('id', flat=True))
+    if len(ids) != len(ventas):
+        raise RuntimeError(f'Se insertaron {len(ventas)} ventas del lote {lote} y se releyeron {len(ids)}')
+    for venta, pk in zip(ventas, ids):
+        venta.pk = pk
+
+
+def _omitir(resultados):
+    for resultado in resultados:
+        if resultado['estado'] == 'creada':
+            resultado.clear()
+            resultado['estado'] = 'omitida'
+    return resultados
+
+
+def _rechazar_sin_stock(resultados, sin_stock):
+    """Marca como error las filas de los productos de `sin_stock`; devuelve las ventas que quedan."""
+    ventas = []
+    for resultado in resultados:
+        if resultado['estado'] != 'creada':
+            continue
+        venta = resultado['venta']
+        error = sin_stock.get(venta.producto_id)
+        if error is None:
+            ventas.append(venta)
+            continue
+        resultado.clear()
+        resultado.update(estado='error', errores={'cantidad': [
+            f'Stock insuficiente del producto {error.producto_id}: '
+            f'el lote pide {error.solicitado}, hay {error.disponible}.'
+        ]})
+    return ventas
+
+
+def _actualizar_resumenes(ventas):
+    por_cliente = defaultdict(list)
+    por_dia = defaultdict(list)
+    for venta in ventas:
+        por_cliente[venta.cliente_id].append(venta)
+        clave = (rollups.dia_local(venta.fecha), venta.vendedor_id, venta.producto_id)
+        por_dia[clave].append(venta)
+
+    for cliente_id, grupo in por_cliente.items():
+        fechas = [v.fecha for v in grupo]
+        resumenes.registrar_ventas(
+            cliente_id, len(grupo), sum(v.total_venta or 0 for v in grupo), min(fechas), max(fechas)
+        )
+    for (_, vendedor_id, producto_id), grupo in por_dia.items():
+        rollups.sumar(
+            grupo[0].fecha, vendedor_id, producto_id,
+            sum(v.total_venta or 0 for v in grupo), sum(v.cantidad for v in grupo),
+            ventas=len(grupo),
+        )
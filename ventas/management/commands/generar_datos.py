@@ -0,0 +1,388 @@
+import bisect
+import itertools
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from inventario import precios
+from inventario.busqueda import indice
+from inventario.models import Categoria, Marca, MovimientoStock, PrecioProducto, Producto, Proveedor, StockProducto
+from inventario.versiones import TABLAS_CATALOGO, incrementar
+from ventas import ranking
+from ventas.models import Cliente, ClienteResumen, DetalleVenta, Venta, VentaResumenDiario
+from ventas.resumenes import invalidar_total_clientes, reconstruir_resumenes
+from ventas.rollups import dia_local, inicio_del_dia, reconstruir_rollups
+
+# Peso relativo de cada mes: marzo escolar, CyberDay en junio, Black Friday y Navidad
+ESTACIONALIDAD_MES = {
+    1: 0.80, 2: 0.75, 3: 1.05, 4: 0.90, 5: 0.95, 6: 1.15,
+    7: 0.95, 8: 0.90, 9: 1.00, 10: 1.00, 11: 1.35, 12: 1.60,
+}
+# Lunes a domingo
+ESTACIONALIDAD_DIA = (0.90, 0.90, 0.95, 1.00, 1.15, 1.25, 0.85)
+# 0 a 23 h, hora de Chile
+ESTACIONALIDAD_HORA = (
+    0.05, 0.02, 0.01, 0.01, 0.01, 0.02, 0.05, 0.15, 0.40, 0.70, 1.00, 1.10,
+    1.30, 1.25, 1.00, 0.95, 1.00, 1.10, 1.35, 1.45, 1.30, 1.00, 0.60, 0.25,
+)
+# Unidades por venta: casi siempre una
+CANTIDADES = ((1, 0.70), (2, 0.18), (3, 0.07), (4, 0.03), (5, 0.02))
+
+# Orden de eliminación por prefijo, después de las ventas
+ELIMINABLES = (
+    (Producto, 'productos'), (Cliente, 'clientes'),
+    (Marca, 'marcas'), (Proveedor, 'proveedores'), (Categoria, 'categorías'),
+)
+
+# Estado de cada proceso que genera ventas (ver _inicializar_worker)
+_worker = {}
+
+
+def acumulados(pesos):
+    return list(itertools.accumulate(pesos))
+
+
+def elegir(rng, acumulado):
+    """Índice elegido con probabilidad proporcional a su peso."""
+    return bisect.bisect_right(acumulado, rng.random() * acumulado[-1])
+
+
+def pesos_zipf(n, exponente):
+    """Pesos 1/k^s: el producto de rango k se vende 1/k^s veces lo que el primero."""
+    return [1 / k ** exponente for k in range(1, n + 1)]
+
+
+def digito_verificador(numero):
+    suma, factor = 0, 2
+    for digito in reversed(str(numero)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {11: '0', 10: 'K'}.get(resto, str(resto))
+
+
+@contextmanager
+def fechas_explicitas():
+    """Permite fijar `Venta.fecha` en `bulk_create` (el campo es auto_now_add)."""
+    campo = Venta._meta.get_field('fecha')
+    campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        campo.auto_now_add = True
+
+
+def borrar_ids(modelo, ids):
+    """DELETE directo de las filas `ids`: sin recolectar relaciones ni enviar señales."""
+    conexion = connections[router.db_for_write(modelo)]
+    tabla = conexion.ops.quote_name(modelo._meta.db_table)
+    columna = conexion.ops.quote_name(modelo._meta.pk.column)
+    marcadores = ', '.join(['%s'] * len(ids))
+    with conexion.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {tabla} WHERE {columna} IN ({marcadores})', ids)
+
+
+def _inicializar_worker(parametros):
+    django.setup()
+    _worker.update(parametros)
+    _worker['dias_acumulado'] = acumulados(parametros['pesos_dias'])
+    _worker['horas_acumulado'] = acumulados(ESTACIONALIDAD_HORA)
+    _worker['productos_acumulado'] = acumulados(pesos_zipf(len(parametros['productos']), parametros['zipf']))
+    _worker['clientes_acumulado'] = acumulados(
+        pesos_zipf(len(parametros['clientes']), parametros['zipf_clientes'])
+    )
+    _worker['cantidades_acumulado'] = acumulados(peso for _, peso in CANTIDADES)
+
+
+def _generar_bloque(numero, cantidad):
+    """Inserta `cantidad` ventas; el bloque `numero` siempre genera las mismas filas."""
+    w = _worker
+    rng = random.Random(f'{w["semilla"]}:ventas:{numero}')
+    ventas = []
+    for _ in range(cantidad):
+        producto_id, precio = w['productos'][elegir(rng, w['productos_acumulado'])]
+        unidades = CANTIDADES[elegir(rng, w['cantidades_acumulado'])][0]
+        dia = w['inicios_dias'][elegir(rng, w['dias_acumulado'])]
+        fecha = dia + timedelta(hours=elegir(rng, w['horas_acumulado']), seconds=rng.randrange(3600))
+        ventas.append(Venta(
+            vendedor_id=rng.choice(w['vendedores']),
+            cliente_id=w['clientes'][elegir(rng, w['clientes_acumulado'])],
+            producto_id=producto_id,
+            cantidad=unidades,
+            precio_unitario=precio,
+            total_venta=precio * unidades,
+            fecha=fecha,
+        ))
+    with fechas_explicitas(), transaction.atomic():
+        Venta.objects.bulk_create(ventas, batch_size=w['batch_size'])
+    return cantidad
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos para pruebas de carga: marcas, proveedores, categorías, productos, '
+        'clientes, vendedores y ventas con popularidad Zipf y estacionalidad por mes, día y hora. '
+        'Todo se nombra con --prefijo y se elimina con --eliminar. '
+        'Ej: generar_datos --ventas 1000000 --clientes 200000 --productos 50000 --procesos 4'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefijo', default='ZZ_GEN_', help='Prefijo de nombres y usuarios (default: ZZ_GEN_)')
+        parser.add_argument('--ventas', type=int, default=10000, help='Ventas a generar (default: 10000)')
+        parser.add_argument('--clientes', type=int, default=2000, help='Clientes (default: 2000)')
+        parser.add_argument('--productos', type=int, default=500, help='Productos (default: 500)')
+        parser.add_argument('--vendedores', type=int, default=10, help='Usuarios vendedores (default: 10)')
+        parser.add_argument('--marcas', type=int, default=30, help='Marcas (default: 30)')
+        parser.add_argument('--proveedores', type=int, default=15, help='Proveedores (default: 15)')
+        parser.add_argument('--categorias', type=int, default=20, help='Categorías (default: 20)')
+        parser.add_argument('--dias', type=int, default=365, help='Días hacia atrás desde hoy (default: 365)')
+        parser.add_argument('--zipf', type=float, default=1.0,
+                            help='Exponente de popularidad de productos (default: 1.0)')
+        parser.add_argument('--zipf-clientes', type=float, default=0.6,
+                            help='Exponente de frecuencia de compra de clientes (default: 0.6)')
+        parser.add_argument('--rut-base', type=int, default=90000000,
+                            help='Primer RUT de los clientes generados (default: 90000000)')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla aleatoria (default: 42)')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Filas por bloque y transacción (default: 10000)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Filas por INSERT dentro de cada bloque (default: 1000)')
+        parser.add_argument('--procesos', type=int, default=1,
+                            help='Procesos que insertan ventas en paralelo (default: 1)')
+        parser.add_argument('--sin-resumenes', action='store_true',
+                            help='No reconstruye resúmenes de clientes ni acumulados diarios')
+        parser.add_argument('--eliminar', action='store_true',
+                            help='Elimina los datos con --prefijo en lugar de generarlos')
+
+    def handle(self, *args, **options):
+        self.prefijo = options['prefijo']
+        if not self.prefijo:
+            raise CommandError('--prefijo no puede estar vacío')
+        self.chunk_size = options['chunk_size']
+        self.batch_size = options['batch_size']
+        inicio = time.perf_counter()
+        if options['eliminar']:
+            self.eliminar()
+        else:
+            self.generar(options)
+        self.stdout.write(self.style.SUCCESS(f'Listo en {time.perf_counter() - inicio:.1f}s'))
+
+    def informar(self, nombre, filas, inicio):
+        segundos = time.perf_counter() - inicio
+        velocidad = filas / segundos if segundos else 0
+        self.stdout.write(f'{nombre}: {filas} filas en {segundos:.1f}s ({velocidad:.0f} filas/s)')
+
+    # ----- generación -----
+
+    def generar(self, options):
+        if Producto.objects.filter(nombre__startswith=self.prefijo).exists() or \
+                Cliente.objects.filter(nombre__startswith=self.prefijo).exists():
+            raise CommandError(f'Ya hay datos con el prefijo {self.prefijo}; elimínalos con --eliminar')
+        if min(options['productos'], options['clientes'], options['vendedores']) < 1 and options['ventas']:
+            raise CommandError('Para generar ventas se necesita al menos un producto, cliente y vendedor')
+        rng = random.Random(options['semilla'])
+        p = self.prefijo
+
+        marcas = self.insertar(Marca, 'marcas', (Marca(nombre=f'{p}MARCA_{i}') for i in range(options['marcas'])))
+        proveedores = self.insertar(Proveedor, 'proveedores', (
+            Proveedor(nombre=f'{p}PROV_{i}', email=f'prov{i}@ejemplo.cl') for i in range(options['proveedores'])
+        ))
+        categorias = self.insertar(Categoria, 'categorías', (
+            Categoria(nombre=f'{p}CAT_{i}', descripcion='Categoría generada') for i in range(options['categorias'])
+        ))
+        self.insertar(Producto, 'productos', (
+            self.producto(rng, i, marcas, proveedores, categorias) for i in range(options['productos'])
+        ))
+        self.insertar(Cliente, 'clientes', (
+            Cliente(
+                rut=f'{n}-{digito_verificador(n)}',
+                nombre=f'{p}CLIENTE_{i}',
+                apellido=rng.choice(('González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Silva')),
+                email=f'cliente{i}@ejemplo.cl',
+            )
+            for i, n in enumerate(range(options['rut_base'], options['rut_base'] + options['clientes']))
+        ))
+        sin_clave = make_password(None)
+        self.insertar(User, 'vendedores', (
+            User(username=f'{p}vendedor_{i}', password=sin_clave, is_active=True)
+            for i in range(options['vendedores'])
+        ))
+        # bulk_create no dispara señales (índice de búsqueda, versiones del catálogo, total de clientes, historial de precios)
+        indice.invalidar()
+        incrementar(*TABLAS_CATALOGO)
+        invalidar_total_clientes()
+        precios.registrar_lote(dict(
+            Producto.objects.filter(nombre__startswith=p).values_list('id', 'precio')
+        ))
+
+        if options['ventas']:
+            self.generar_ventas(rng, options)
+
+    def insertar(self, modelo, etiqueta, objetos):
+        """bulk_create por bloques; devuelve los ids creados (releídos por prefijo)."""
+        inicio = time.perf_counter()
+        total = 0
+        while True:
+            bloque = list(itertools.islice(objetos, self.chunk_size))
+            if not bloque:
+                break
+            with transaction.atomic():
+                modelo.objects.bulk_create(bloque, batch_size=self.batch_size)
+            total += len(bloque)
+        self.informar(etiqueta, total, inicio)
+        # MySQL no devuelve los ids de bulk_create
+        campo = 'username' if modelo is User else 'nombre'
+        return list(
+            modelo.objects.filter(**{f'{campo}__startswith': self.prefijo}).order_by('id').values_list('id', flat=True)
+        )
+
+    def producto(self, rng, i, marcas, proveedores, categorias):
+        # Precios log-normales: la mayoría entre $10.000 y $150.000, pocos muy caros
+        precio = max(990, round(rng.lognormvariate(10.6, 1.0), -1))
+        return Producto(
+            nombre=f'{self.prefijo}PROD_{i}',
+            precio=Decimal(precio),
+            descripcion='Producto generado para pruebas de carga',
+            marca_id=rng.choice(marcas) if marcas else None,
+            proveedor_id=rng.choice(proveedores) if proveedores else None,
+            categoria_id=rng.choice(categorias) if categorias else None,
+        )
+
+    def pesos_dias(self, dias):
+        """Inicio (aware) de cada día del período y su peso estacional."""
+        hoy = dia_local(timezone.now())
+        inicios, pesos = [], []
+        for atras in range(dias - 1, -1, -1):
+            dia = hoy - timedelta(days=atras)
+            inicios.append(inicio_del_dia(dia))
+            pesos.append(ESTACIONALIDAD_MES[dia.month] * ESTACIONALIDAD_DIA[dia.weekday()])
+        return inicios, pesos
+
+    def generar_ventas(self, rng, options):
+        productos = list(
+            Producto.objects.filter(nombre__startswith=self.prefijo).order_by('id').values_list('id', 'precio')
+        )
+        # El rango de popularidad no sigue el orden de los ids
+        rng.shuffle(productos)
+        clientes = list(
+            Cliente.objects.filter(nombre__startswith=self.prefijo).order_by('id').values_list('id', flat=True)
+        )
+        rng.shuffle(clientes)
+        inicios, pesos = self.pesos_dias(options['dias'])
+        parametros = {
+            'semilla': options['semilla'],
+            'productos': productos,
+            'clientes': clientes,
+            'vendedores': list(
+                User.objects.filter(username__startswith=self.prefijo).values_list('id', flat=True)
+            ),
+            'inicios_dias': inicios,
+            'pesos_dias': pesos,
+            'zipf': options['zipf'],
+            'zipf_clientes': options['zipf_clientes'],
+            'batch_size': self.batch_size,
+        }
+        total = options['ventas']
+        bloques = [
+            (numero, min(self.chunk_size, total - desde))
+            for numero, desde in enumerate(range(0, total, self.chunk_size))
+        ]
+
+        inicio = time.perf_counter()
+        insertadas = 0
+        if options['procesos'] > 1:
+            # Los hijos abren sus propias conexiones
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['procesos'], initializer=_inicializar_worker, initargs=(parametros,)
+            ) as pool:
+                futuros = [pool.submit(_generar_bloque, *bloque) for bloque in bloques]
+                for futuro in as_completed(futuros):
+                    insertadas += futuro.result()
+                    self.progreso(insertadas, total, inicio)
+        else:
+            _inicializar_worker(parametros)
+            for bloque in bloques:
+                insertadas += _generar_bloque(*bloque)
+                self.progreso(insertadas, total, inicio)
+        self.informar('ventas', insertadas, inicio)
+
+        if not options['sin_resumenes']:
+            self.reconstruir_resumenes(inicios[0], inicios[-1])
+
+    def progreso(self, insertadas, total, inicio):
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(f'  {insertadas}/{total} ventas ({insertadas / segundos:.0f} filas/s)')
+
+    def reconstruir_resumenes(self, desde, hasta):
+        inicio = time.perf_counter()
+        clientes = 0
+        for clientes in reconstruir_resumenes(
+            chunk_size=1000, clientes=Cliente.objects.filter(nombre__startswith=self.prefijo)
+        ):
+            pass
+        self.informar('resúmenes de clientes', clientes, inicio)
+
+        inicio = time.perf_counter()
+        filas = sum(f for _, _, f in reconstruir_rollups(desde.date(), hasta.date() + timedelta(days=1)))
+        self.informar('acumulados diarios', filas, inicio)
+
+    # ----- eliminación -----
+
+    def eliminar(self):
+        p = self.prefijo
+        ventas = Venta.objects.filter(
+            Q(producto__nombre__startswith=p) | Q(cliente__nombre__startswith=p) | Q(vendedor__username__startswith=p)
+        )
+        inicio = time.perf_counter()
+        eliminadas = 0
+        while True:
+            ids = list(ventas.order_by().values_list('id', flat=True)[:self.chunk_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                DetalleVenta.objects.filter(venta_id__in=ids).delete()
+                # Sin señales por venta: los resúmenes se eliminan más abajo
+                borrar_ids(Venta, ids)
+            eliminadas += len(ids)
+        self.informar('ventas (eliminadas)', eliminadas, inicio)
+
+        ClienteResumen.objects.filter(cliente__nombre__startswith=p).delete()
+        # Tablas sin FK en la base: no las borra la eliminación de los productos
+        productos = Producto.objects.filter(nombre__startswith=p).values('id')
+        for modelo in (PrecioProducto, StockProducto, MovimientoStock):
+            modelo.objects.filter(producto_id__in=productos).delete()
+        VentaResumenDiario.objects.filter(
+            Q(vendedor__username__startswith=p) | Q(producto__nombre__startswith=p)
+        ).delete()
+        for modelo, etiqueta in ELIMINABLES:
+            inicio = time.perf_counter()
+            filas = modelo.objects.filter(nombre__startswith=p)
+            total = 0
+            while True:
+                ids = list(filas.order_by().values_list('id', flat=True)[:self.chunk_size])
+                if not ids:
+                    break
+                borrar_ids(modelo, ids)
+                total += len(ids)
+            self.informar(f'{etiqueta} (eliminados)', total, inicio)
+        # Pocos usuarios: delete() normal para limpiar permisos, grupos y tokens
+        usuarios, _ = User.objects.filter(username__startswith=p).delete()
+        self.stdout.write(f'vendedores (eliminados): {usuarios} filas con sus relaciones')
+
+        indice.invalidar()
+        incrementar(*TABLAS_CATALOGO)
+        invalidar_total_clientes()
+        # Las ventas se eliminaron sin señales: los rankings no lo saben
+        ranking.invalidar()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from ventas.models import Venta
+from ventas.precios import reconstruir_precios
+
+
+class Command(BaseCommand):
+    help = (
+        'Fija el precio unitario de las ventas registradas antes de que se guardara, a partir del '
+        'historial de precios y del total de cada venta. Recorre el libro por bloques de id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Ventas procesadas por bloque y transacción (default: 10000)',
+        )
+        parser.add_argument(
+            '--todas', action='store_true',
+            help='Recalcula también las ventas que ya tienen precio unitario',
+        )
+
+    def handle(self, *args, **options):
+        ventas = Venta.objects.all() if options['todas'] else Venta.objects.filter(precio_unitario__isnull=True)
+        total = ventas.count()
+        actualizadas = 0
+        for ultimo_id, actualizadas in reconstruir_precios(options['chunk_size'], options['todas']):
+            self.stdout.write(f'Hasta la venta {ultimo_id}: {actualizadas}/{total} ventas con precio')
+        self.stdout.write(self.style.SUCCESS(f'Precio unitario fijado en {actualizadas} ventas'))
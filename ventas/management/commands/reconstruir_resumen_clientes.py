@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from ventas.models import Cliente
+from ventas.resumenes import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla de resúmenes de compras por cliente desde el libro de ventas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Clientes procesados por bloque (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        total = Cliente.objects.count()
+        procesados = 0
+        for procesados in reconstruir_resumenes(chunk_size=options['chunk_size']):
+            self.stdout.write(f'{procesados}/{total} clientes procesados')
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes reconstruidos para {procesados} clientes'))
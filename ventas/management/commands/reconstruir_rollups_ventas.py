@@ -0,0 +1,21 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from ventas.rollups import reconstruir_rollups
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los acumulados diarios de ventas (día × vendedor × producto) desde el libro.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primer día (YYYY-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Último día, inclusive (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        hasta = options['hasta'] + timedelta(days=1) if options['hasta'] else None
+        total = 0
+        for inicio, fin, filas in reconstruir_rollups(options['desde'], hasta):
+            total += filas
+            self.stdout.write(f'{inicio} .. {fin - timedelta(days=1)}: {filas} filas')
+        self.stdout.write(self.style.SUCCESS(f'Acumulados reconstruidos: {total} filas'))
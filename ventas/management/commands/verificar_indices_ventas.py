@@ -0,0 +1,99 @@
+import json
+from datetime import timedelta
+from itertools import combinations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+from django.utils import timezone
+
+from ventas.filtros import FILTROS, filtrar_ventas
+from ventas.models import Venta
+from ventas.rollups import dia_local
+
+TABLA = Venta._meta.db_table
+
+
+def _tablas_mysql(nodo):
+    """Accesos a tablas del plan EXPLAIN FORMAT=JSON de MySQL."""
+    if isinstance(nodo, dict):
+        if 'table_name' in nodo:
+            yield nodo
+        for valor in nodo.values():
+            yield from _tablas_mysql(valor)
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            yield from _tablas_mysql(valor)
+
+
+def analizar_plan(vendor, queryset):
+    """(plan, índice usado o None, ordena aparte) del acceso a app_shop_venta en `queryset`."""
+    if vendor == 'mysql':
+        plan = queryset.explain(format='json')
+        datos = json.loads(plan)
+        acceso = next((t for t in _tablas_mysql(datos) if t['table_name'] == TABLA), {})
+        indice = acceso.get('key') if acceso.get('access_type') != 'ALL' else None
+        return plan, indice, 'using_filesort' in plan
+    plan = queryset.explain()
+    lineas = [linea for linea in plan.splitlines() if TABLA in linea]
+    indice = None
+    for linea in lineas:
+        # SQLite: "SEARCH app_shop_venta USING INDEX venta_vendedor_fecha_idx (...)"
+        if ' INDEX ' in linea:
+            indice = linea.split(' INDEX ', 1)[1].split()[0]
+        elif 'INTEGER PRIMARY KEY' in linea:
+            indice = 'PRIMARY'
+    return plan, indice, 'TEMP B-TREE FOR ORDER BY' in plan
+
+
+class Command(BaseCommand):
+    help = (
+        'Muestra el plan (EXPLAIN) de la consulta del listado de ventas para cada combinación '
+        'de filtros y falla si alguna recorre app_shop_venta completa.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help='Largo del rango de fechas (default: 30)')
+        parser.add_argument('--plan', action='store_true', help='Imprime el plan completo de cada consulta')
+
+    def handle(self, *args, **options):
+        alias = router.db_for_read(Venta)
+        vendor = connections[alias].vendor
+        # Valores reales si hay ventas; el plan no depende de ellos, pero las estadísticas sí
+        ultima = Venta.objects.using(alias).order_by('-fecha').first()
+        valores = {filtro: getattr(ultima, f'{filtro}_id', None) or 1 for filtro in FILTROS}
+        hasta = dia_local(ultima.fecha if ultima else timezone.now())
+        valores['fecha_desde'] = hasta - timedelta(days=options['dias'])
+        valores['fecha_hasta'] = hasta
+
+        claves = FILTROS + ('fecha',)
+        sin_indice = []
+        for n in range(len(claves) + 1):
+            for combinacion in combinations(claves, n):
+                filtros = {
+                    clave: valores[clave] for clave in combinacion if clave != 'fecha'
+                }
+                if 'fecha' in combinacion:
+                    filtros.update(fecha_desde=valores['fecha_desde'], fecha_hasta=valores['fecha_hasta'])
+                # La misma consulta que la primera página del listado de la API
+                queryset = filtrar_ventas(
+                    Venta.objects.using(alias).select_related('vendedor', 'cliente', 'producto'), **filtros
+                ).order_by('-fecha', '-id')[:50]
+                plan, indice, ordena = analizar_plan(vendor, queryset)
+
+                nombre = ' + '.join(combinacion) or '(sin filtros)'
+                # Sin filtros basta con recorrer el índice de fecha en orden
+                if indice is None and combinacion:
+                    sin_indice.append(nombre)
+                    estado = self.style.ERROR('recorre la tabla')
+                else:
+                    estado = f'índice {indice or "-"}'
+                self.stdout.write(f'{nombre}: {estado}{", ordena aparte" if ordena else ""}')
+                if options['plan']:
+                    self.stdout.write(plan)
+
+        if sin_indice:
+            raise CommandError(
+                f'{len(sin_indice)} combinaciones sin índice en {TABLA}; '
+                'ejecutar migrate ventas para crear los índices de Venta.Meta.indexes'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Todas las combinaciones de filtros usan un índice de {TABLA}'))
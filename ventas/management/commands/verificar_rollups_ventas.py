@@ -0,0 +1,30 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventas.rollups import diferencias_rollups
+
+
+class Command(BaseCommand):
+    help = 'Compara los acumulados diarios de ventas con el libro y lista las diferencias.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primer día (YYYY-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Último día, inclusive (YYYY-MM-DD)')
+        parser.add_argument('--max', type=int, default=50, help='Diferencias a mostrar (default: 50)')
+
+    def handle(self, *args, **options):
+        hasta = options['hasta'] + timedelta(days=1) if options['hasta'] else None
+        encontradas = 0
+        for (dia, vendedor_id, producto_id), esperado, actual in diferencias_rollups(options['desde'], hasta):
+            encontradas += 1
+            if encontradas <= options['max']:
+                self.stdout.write(
+                    f'{dia} vendedor={vendedor_id} producto={producto_id}: '
+                    f'libro={esperado} acumulado={actual}'
+                )
+        if encontradas:
+            raise CommandError(
+                f'{encontradas} diferencias; ejecutar reconstruir_rollups_ventas para corregirlas'
+            )
+        self.stdout.write(self.style.SUCCESS('Los acumulados cuadran con el libro de ventas'))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClienteResumen',
+            fields=[
+                ('cliente', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='ventas.cliente')),
+                ('compras_count', models.PositiveIntegerField(default=0)),
+                ('total_comprado', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('primera_compra', models.DateTimeField(blank=True, null=True)),
+                ('ultima_compra', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'ventas_clienteresumen',
+            },
+        ),
+    ]
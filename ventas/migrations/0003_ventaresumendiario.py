@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0001_initial'),
+        ('ventas', '0002_clienteresumen'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('ventas_count', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=0, default=0, max_digits=16)),
+                ('unidades', models.PositiveBigIntegerField(default=0)),
+                ('producto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventario.producto')),
+                ('vendedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'ventas_ventaresumendiario',
+                'indexes': [models.Index(fields=['vendedor', 'fecha'], name='ventas_resumen_vend_fecha'), models.Index(fields=['producto', 'fecha'], name='ventas_resumen_prod_fecha')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'vendedor', 'producto'), name='ventas_resumen_diario_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+# app_shop_cliente no es administrada por Django: AddIndex no la tocaría,
+# así que los índices se crean con el schema editor directamente.
+INDICES = [
+    models.Index(fields=['nombre'], name='cliente_nombre_idx'),
+    models.Index(fields=['apellido'], name='cliente_apellido_idx'),
+]
+
+
+def crear_indices(apps, schema_editor):
+    Cliente = apps.get_model('ventas', 'Cliente')
+    for indice in INDICES:
+        schema_editor.add_index(Cliente, indice)
+
+
+def eliminar_indices(apps, schema_editor):
+    Cliente = apps.get_model('ventas', 'Cliente')
+    for indice in INDICES:
+        schema_editor.remove_index(Cliente, indice)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0003_ventaresumendiario'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+# app_shop_venta no es administrada por Django: AddIndex no la tocaría,
+# así que los índices se crean con el schema editor directamente.
+INDICES = [
+    models.Index(fields=['fecha'], name='venta_fecha_idx'),
+    models.Index(fields=['vendedor', 'fecha'], name='venta_vendedor_fecha_idx'),
+    models.Index(fields=['cliente', 'fecha'], name='venta_cliente_fecha_idx'),
+    models.Index(fields=['producto', 'fecha'], name='venta_producto_fecha_idx'),
+]
+
+
+def crear_indices(apps, schema_editor):
+    Venta = apps.get_model('ventas', 'Venta')
+    for indice in INDICES:
+        schema_editor.add_index(Venta, indice)
+
+
+def eliminar_indices(apps, schema_editor):
+    Venta = apps.get_model('ventas', 'Venta')
+    for indice in INDICES:
+        schema_editor.remove_index(Venta, indice)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0004_cliente_indices'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+# Contador de ediciones de ventas para los rankings (ver ventas/ranking.py).
+# Se crea aquí para que la primera edición sea un UPDATE como las demás.
+
+
+def crear_version(apps, schema_editor):
+    VersionTabla = apps.get_model('inventario', 'VersionTabla')
+    VersionTabla.objects.get_or_create(tabla='venta')
+
+
+def eliminar_version(apps, schema_editor):
+    VersionTabla = apps.get_model('inventario', 'VersionTabla')
+    VersionTabla.objects.filter(tabla='venta').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0002_versiontabla'),
+        ('ventas', '0005_venta_indices'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_version, eliminar_version),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+# app_shop_venta no es administrada por Django: AddField solo cambia el estado
+# y la columna se agrega con el schema editor, como los índices de la 0005.
+# Las ventas existentes quedan con precio_unitario NULL hasta
+# `manage.py reconstruir_precios_ventas`.
+
+
+def agregar_columna(apps, schema_editor):
+    Venta = apps.get_model('ventas', 'Venta')
+    schema_editor.add_field(Venta, Venta._meta.get_field('precio_unitario'))
+
+
+def quitar_columna(apps, schema_editor):
+    Venta = apps.get_model('ventas', 'Venta')
+    schema_editor.remove_field(Venta, Venta._meta.get_field('precio_unitario'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_precioproducto'),
+        ('ventas', '0006_version_ventas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='precio_unitario',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(agregar_columna, quitar_columna),
+    ]
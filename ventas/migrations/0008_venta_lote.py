@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+# app_shop_venta no es administrada por Django: la columna y su índice se crean
+# con el schema editor, como en la 0005 y la 0007. Las ventas existentes quedan
+# con lote NULL.
+INDICE = models.Index(fields=['lote'], name='venta_lote_idx')
+
+
+def agregar_columna(apps, schema_editor):
+    Venta = apps.get_model('ventas', 'Venta')
+    schema_editor.add_field(Venta, Venta._meta.get_field('lote'))
+    schema_editor.add_index(Venta, INDICE)
+
+
+def quitar_columna(apps, schema_editor):
+    Venta = apps.get_model('ventas', 'Venta')
+    schema_editor.remove_index(Venta, INDICE)
+    schema_editor.remove_field(Venta, Venta._meta.get_field('lote'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0007_venta_precio_unitario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='lote',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.RunPython(agregar_columna, quitar_columna),
+    ]
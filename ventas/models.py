@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
+from inventario.precios import precio_de_total, precio_vigente
+
 # Clon seguro de los modelos de ventas/cliente definidos originalmente en `app_shop`.
 # Usamos `db_table` apuntando a las tablas existentes y `managed = False` para evitar
 # que Django intente crear/alterar las tablas aquí.
@@ -17,6 +19,11 @@ class Cliente(models.Model):
     class Meta:
         db_table = 'app_shop_cliente'
         managed = False
+        # Tabla no administrada: los índices se crean en la migración 0004
+        indexes = [
+            models.Index(fields=['nombre'], name='cliente_nombre_idx'),
+            models.Index(fields=['apellido'], name='cliente_apellido_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
@@ -35,16 +42,56 @@ class Venta(models.Model):
     cantidad = models.PositiveIntegerField(default=1)
     total_venta = models.DecimalField(max_digits=10, decimal_places=0, blank=True, null=True)
     fecha = models.DateTimeField(auto_now_add=True)
+    # Precio del producto al registrar la venta (columna agregada en la migración 0007);
+    # null en las ventas anteriores hasta `manage.py reconstruir_precios_ventas`
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    # Carga masiva que creó la venta (migración 0008): ahí se releen los ids en MySQL (ver ventas/ingesta.py)
+    lote = models.CharField(max_length=32, blank=True, null=True, editable=False)
 
     class Meta:
         db_table = 'app_shop_venta'
         managed = False
+        # Tabla no administrada: los índices se crean en la migración 0005. Cada
+        # filtro de la API (ventas/filtros.py) combina un id con un rango de fechas;
+        # en InnoDB el índice incluye el id, así que también sirve al orden (-fecha, -id).
+        indexes = [
+            models.Index(fields=['fecha'], name='venta_fecha_idx'),
+            models.Index(fields=['vendedor', 'fecha'], name='venta_vendedor_fecha_idx'),
+            models.Index(fields=['cliente', 'fecha'], name='venta_cliente_fecha_idx'),
+            models.Index(fields=['producto', 'fecha'], name='venta_producto_fecha_idx'),
+            models.Index(fields=['lote'], name='venta_lote_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        venta = super().from_db(db, field_names, values)
+        # Lo leído de la BD: save() ve si cambió el producto sin volver a consultar la venta
+        venta._guardado = {campo: venta.__dict__.get(campo) for campo in ('producto_id', 'cantidad', 'total_venta')}
+        return venta
 
     def save(self, *args, **kwargs):
-        # Calculamos el total antes de guardar; no vamos a crear tablas nuevas.
-        if self.producto and self.producto.precio is not None:
-            self.total_venta = self.producto.precio * self.cantidad
-        super().save(*args, **kwargs)
+        # El total sale del precio fijado al registrar la venta: editarla no la lleva al precio de hoy
+        guardado = getattr(self, '_guardado', {})
+        if self.precio_unitario is None or self.producto_id != guardado.get('producto_id', self.producto_id):
+            self.precio_unitario = self.precio_a_fijar(guardado)
+        if self.precio_unitario is not None:
+            self.total_venta = self.precio_unitario * self.cantidad
+        # Las señales descuentan el stock: si no alcanza, la venta no se guarda
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._guardado = {'producto_id': self.producto_id, 'cantidad': self.cantidad, 'total_venta': self.total_venta}
+
+    def precio_a_fijar(self, guardado):
+        """Precio unitario de una venta nueva, de una que cambia de producto o de una anterior al historial."""
+        if self._state.adding:
+            # El producto suele venir ya cargado del formulario o el serializer
+            return self.producto.precio
+        if self.producto_id == guardado.get('producto_id') and guardado.get('total_venta') is not None \
+                and guardado.get('cantidad'):
+            return precio_de_total(guardado['total_venta'], guardado['cantidad'])
+        # Otro producto: su precio a la fecha de la venta
+        precio = precio_vigente(self.producto_id, self.fecha)
+        return self.producto.precio if precio is None else precio
 
     def __str__(self):
         return f"Venta #{self.pk} - {self.cliente}"
@@ -68,3 +115,61 @@ class DetalleVenta(models.Model):
 from django.db import models
 
 # Create your models here.
+
+
+class ClienteResumen(models.Model):
+    """Resumen de compras por cliente, mantenido por señales sobre `Venta`.
+
+    A diferencia de los modelos anteriores, esta tabla sí es administrada por
+    Django (migración `ventas.0002`). Se reconstruye con
+    `manage.py reconstruir_resumen_clientes`.
+    """
+    # Sin restricción en BD: `app_shop_cliente.id` es BIGINT en la tabla real y
+    # el estado de migraciones lo declara como AutoField.
+    cliente = models.OneToOneField(
+        'ventas.Cliente',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='resumen',
+        db_constraint=False,
+    )
+    compras_count = models.PositiveIntegerField(default=0)
+    total_comprado = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    primera_compra = models.DateTimeField(blank=True, null=True)
+    ultima_compra = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'ventas_clienteresumen'
+
+    def __str__(self):
+        return f"Resumen {self.cliente_id}: {self.compras_count} compras"
+
+
+class VentaResumenDiario(models.Model):
+    """Acumulado de ventas por día (hora de Chile) × vendedor × producto.
+
+    Se mantiene desde las señales de `Venta` (ver `ventas/rollups.py`) y lo usa
+    `VentaViewSet.estadisticas`. Reconstruir con `manage.py reconstruir_rollups_ventas`.
+    """
+    fecha = models.DateField()
+    vendedor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # Sin restricción en BD por la misma razón que ClienteResumen.cliente
+    producto = models.ForeignKey(
+        'inventario.Producto', on_delete=models.CASCADE, related_name='+', db_constraint=False
+    )
+    ventas_count = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=16, decimal_places=0, default=0)
+    unidades = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'ventas_ventaresumendiario'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'vendedor', 'producto'], name='ventas_resumen_diario_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['vendedor', 'fecha'], name='ventas_resumen_vend_fecha'),
+            models.Index(fields=['producto', 'fecha'], name='ventas_resumen_prod_fecha'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} vendedor={self.vendedor_id} producto={self.producto_id}"
@@ -0,0 +1,75 @@
+"""
+Precio unitario de las ventas (`Venta.precio_unitario`).
+
+Las ventas nuevas fijan el precio del producto al registrarse (`Venta.save`,
+`ventas.ingesta`) y su total sale de ese precio, así que editarlas no las
+lleva al precio de hoy. Las anteriores a la columna (migración ventas 0007)
+la reconstruyen con `reconstruir_precios` (`manage.py reconstruir_precios_ventas`):
+
+- el precio del historial vigente en la fecha de la venta, si por la cantidad
+  da el total guardado (es el precio exacto, con centavos);
+- si no, el total guardado dividido por la cantidad: el total se calculó con
+  un precio anterior al historial, que empieza en la migración inventario 0005;
+- sin total, el precio del historial.
+
+El total guardado no cambia, así que los resúmenes y acumulados siguen valiendo.
+"""
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+
+from inventario.precios import historial, precio_de_total, precio_en
+from ventas.models import Venta
+
+BATCH_SIZE = 1000
+
+
+def _pesos(valor):
+    # total_venta no tiene decimales
+    return Decimal(valor).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+
+
+def precio_reconstruido(precios, producto_id, fecha, cantidad, total_venta):
+    """Precio unitario de una venta guardada, con el `historial` de su producto; None si no hay datos."""
+    vigente = precio_en(precios, producto_id, fecha)
+    if total_venta is None or not cantidad:
+        return vigente
+    if vigente is not None and _pesos(vigente * cantidad) == _pesos(total_venta):
+        return vigente
+    return precio_de_total(total_venta, cantidad)
+
+
+def reconstruir_precios(chunk_size=10000, todas=False):
+    """Fija el precio unitario de las ventas que no lo tienen (o de `todas`) por bloques de id.
+
+    Cada bloque lee sus ventas y el historial de sus productos y, en su propia
+    transacción y sin señales, hace un UPDATE ... WHERE id IN (...) por precio
+    (las ventas de un bloque repiten pocos precios; `bulk_update` arma un CASE
+    por fila y es varias veces más lento). Genera
+    `(ultimo_id, actualizadas)` después de cada bloque.
+    """
+    ventas = Venta.objects.all() if todas else Venta.objects.filter(precio_unitario__isnull=True)
+    ultimo_id = 0
+    actualizadas = 0
+    while True:
+        filas = list(
+            ventas.filter(id__gt=ultimo_id)
+            .order_by('id')
+            .values_list('id', 'producto_id', 'fecha', 'cantidad', 'total_venta')[:chunk_size]
+        )
+        if not filas:
+            break
+        precios = historial({producto_id for _, producto_id, _, _, _ in filas})
+        por_precio = defaultdict(list)
+        for venta_id, producto_id, fecha, cantidad, total_venta in filas:
+            precio = precio_reconstruido(precios, producto_id, fecha, cantidad, total_venta)
+            if precio is not None:
+                por_precio[precio].append(venta_id)
+        with transaction.atomic():
+            for precio, ids in por_precio.items():
+                for inicio in range(0, len(ids), BATCH_SIZE):
+                    Venta.objects.filter(id__in=ids[inicio:inicio + BATCH_SIZE]).update(precio_unitario=precio)
+                actualizadas += len(ids)
+        ultimo_id = filas[-1][0]
+        yield ultimo_id, actualizadas
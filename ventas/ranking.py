@@ -0,0 +1,229 @@
+"""
+Rankings (top N) de productos, clientes y vendedores por ingresos o unidades.
+
+Las ventanas habituales (hoy, 7 días, 30 días y el año en curso, en días de
+hora local) se responden desde `TotalesVentanas`: cada proceso mantiene, por
+dimensión, solo los totales de cada ventana en memoria y los pone al día
+antes de cada consulta leyendo solo las ventas nuevas (`id` mayor que la
+última aplicada). El top N sale de esos totales con `heapq.nlargest`.
+
+Cada dimensión se reconstruye por separado, en su primera consulta después de
+un cambio: al cambiar el día local (una consulta agrupada por tramo de días),
+al editar o eliminar ventas, que incrementa la versión `venta` de
+`VersionTabla` (ver `ventas/signals.py`), y cada `RECONSTRUIR_CADA` segundos,
+lo que cubre las ventas que se confirman fuera de orden de `id` y los cambios
+hechos sin señales (`QuerySet.update`). `invalidar()` fuerza la reconstrucción.
+
+Los rangos arbitrarios, o con filtros del listado, son una sola consulta
+agrupada con LIMIT. En ambos casos la respuesta queda en el caché de Django
+con una clave que incluye la última venta y la versión `venta`, así que una
+venta nueva la invalida.
+"""
+import hashlib
+import heapq
+import json
+import threading
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Max, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventario.models import Producto
+from inventario.versiones import incrementar, versiones
+from ventas.filtros import filtrar_ventas
+from ventas.models import Cliente, Venta
+from ventas.rollups import dia_local, zona_horaria
+
+DIMENSIONES = {'productos': 'producto', 'clientes': 'cliente', 'vendedores': 'vendedor'}
+CRITERIOS = ('ingresos', 'unidades')
+VENTANAS = ('hoy', '7d', '30d', 'anio')
+MAX_N = 100
+TIMEOUT = 300
+RECONSTRUIR_CADA = 600
+
+TABLA_VERSION = 'venta'
+
+
+def inicio_ventana(ventana, hoy):
+    """Primer día de `ventana` si hoy es `hoy` (el último es `hoy`)."""
+    if ventana == 'anio':
+        return date(hoy.year, 1, 1)
+    return hoy - timedelta(days={'hoy': 0, '7d': 6, '30d': 29}[ventana])
+
+
+def _version():
+    return versiones((TABLA_VERSION,))[TABLA_VERSION]
+
+
+def registrar_edicion():
+    """Las ventas editadas o eliminadas obligan a reconstruir los totales en todos los procesos."""
+    incrementar(TABLA_VERSION)
+
+
+class TotalesVentanas:
+    """Totales por ventana de una dimensión. Usar las instancias de `totales`."""
+
+    def __init__(self, campo):
+        self.campo = campo
+        self._lock = threading.RLock()
+        self._ventanas = {}  # ventana -> {id: [ingresos, unidades]}
+        self._hoy = None
+        self._ultimo_id = 0
+        self._version = None
+        self._construido_en = None
+
+    @staticmethod
+    def _sumar(totales, pk, ingresos, unidades):
+        actual = totales.setdefault(pk, [0, 0])
+        actual[0] += ingresos
+        actual[1] += unidades
+
+    def _reconstruir(self, hoy, version):
+        ultimo_id = Venta.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+        # Tramos entre los inicios de ventana, del más reciente al más antiguo; a
+        # inicios de año la ventana de 30 días empieza antes que la del año
+        inicios = sorted({inicio_ventana(ventana, hoy) for ventana in VENTANAS}, reverse=True)
+        ventanas_tramo = [[v for v in VENTANAS if inicio_ventana(v, hoy) <= inicio] for inicio in inicios]
+        tramo = Case(
+            *[When(dia__gte=inicio, then=Value(i)) for i, inicio in enumerate(inicios)],
+            output_field=IntegerField(),
+        )
+        filas = (
+            filtrar_ventas(Venta.objects.filter(id__lte=ultimo_id), fecha_desde=inicios[-1], fecha_hasta=hoy)
+            .annotate(dia=TruncDate('fecha', tzinfo=zona_horaria()))
+            .annotate(tramo=tramo)
+            .order_by()
+            .values_list('tramo', self.campo)
+            .annotate(ingresos=Sum('total_venta'), unidades=Sum('cantidad'))
+        )
+        self._ventanas = {ventana: {} for ventana in VENTANAS}
+        for i, pk, ingresos, unidades in filas:
+            for ventana in ventanas_tramo[i]:
+                self._sumar(self._ventanas[ventana], pk, ingresos or 0, unidades or 0)
+        self._hoy = hoy
+        self._ultimo_id = ultimo_id
+        self._version = version
+        self._construido_en = time.monotonic()
+
+    def _aplicar_nuevas(self):
+        nuevas = Venta.objects.filter(id__gt=self._ultimo_id).order_by('id').values_list(
+            'id', 'fecha', self.campo, 'total_venta', 'cantidad'
+        )
+        for venta_id, fecha, pk, total_venta, cantidad in nuevas:
+            self._ultimo_id = venta_id
+            dia = dia_local(fecha)
+            for ventana in VENTANAS:
+                if inicio_ventana(ventana, self._hoy) <= dia <= self._hoy:
+                    self._sumar(self._ventanas[ventana], pk, total_venta or 0, cantidad)
+
+    def sincronizar(self, hoy):
+        """Pone los totales al día con el libro al día `hoy`; devuelve `(ultimo_id, version)`."""
+        version = _version()
+        with self._lock:
+            vencido = (
+                self._construido_en is None
+                or version != self._version
+                or hoy != self._hoy
+                or time.monotonic() - self._construido_en > RECONSTRUIR_CADA
+            )
+            if vencido:
+                self._reconstruir(hoy, version)
+            else:
+                self._aplicar_nuevas()
+            return self._ultimo_id, self._version
+
+    def top(self, ventana, criterio, n):
+        """[(id, ingresos, unidades)] de los `n` con mayor `criterio` en `ventana` (empates por id)."""
+        i = CRITERIOS.index(criterio)
+        with self._lock:
+            mejores = heapq.nlargest(
+                n, self._ventanas[ventana].items(), key=lambda item: (item[1][i], -item[0])
+            )
+        return [(pk, ingresos, unidades) for pk, (ingresos, unidades) in mejores]
+
+    def invalidar(self):
+        with self._lock:
+            self._construido_en = None
+
+
+totales = {campo: TotalesVentanas(f'{campo}_id') for campo in DIMENSIONES.values()}
+
+
+def invalidar():
+    """Fuerza la reconstrucción de los totales en todos los procesos (cada dimensión en su próxima consulta)."""
+    registrar_edicion()
+    for totales_dimension in totales.values():
+        totales_dimension.invalidar()
+
+
+def _top_consulta(campo, criterio, n, filtros):
+    """Top N con una sola consulta agrupada con LIMIT."""
+    return list(
+        filtrar_ventas(Venta.objects.all(), **filtros)
+        .order_by()
+        .values_list(f'{campo}_id')
+        .annotate(ingresos=Sum('total_venta'), unidades=Sum('cantidad'))
+        .order_by(f'-{criterio}', f'{campo}_id')[:n]
+    )
+
+
+def _nombres(campo, ids):
+    if campo == 'producto':
+        return dict(Producto.objects.filter(id__in=ids).values_list('id', 'nombre'))
+    if campo == 'cliente':
+        return {
+            pk: f'{nombre} {apellido}'
+            for pk, nombre, apellido in Cliente.objects.filter(id__in=ids).values_list('id', 'nombre', 'apellido')
+        }
+    return dict(User.objects.filter(id__in=ids).values_list('id', 'username'))
+
+
+def _clave(firma, parametros):
+    resumen = hashlib.sha1(json.dumps(parametros, sort_keys=True, default=str).encode()).hexdigest()
+    return f'ventas:ranking:{firma[0]}.{firma[1]}:{resumen}'
+
+
+def ranking(por, criterio='ingresos', n=10, ventana=None, **filtros):
+    """Top `n` de `por` ('productos', 'clientes' o 'vendedores') ordenado por `criterio`.
+
+    Con `ventana` ('hoy', '7d', '30d' o 'anio') usa los totales en memoria; si
+    no, agrupa el libro con `filtros` (los de `filtrar_ventas`). Devuelve
+    `{'desde', 'hasta', 'resultados'}`, con `resultados` como lista de
+    `{'posicion', 'id', 'nombre', 'ingresos', 'unidades'}`.
+    """
+    campo = DIMENSIONES[por]
+    filtros = {nombre: valor for nombre, valor in filtros.items() if valor}
+    parametros = {'por': por, 'criterio': criterio, 'n': n, 'ventana': ventana, **filtros}
+    if ventana:
+        hoy = timezone.localdate()
+        firma = totales[campo].sincronizar(hoy)
+        parametros['hoy'] = hoy
+        desde, hasta = inicio_ventana(ventana, hoy), hoy
+    else:
+        firma = (Venta.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0, _version())
+        desde, hasta = filtros.get('fecha_desde'), filtros.get('fecha_hasta')
+
+    clave = _clave(firma, parametros)
+    resultado = cache.get(clave)
+    if resultado is not None:
+        return resultado
+
+    if ventana:
+        filas = totales[campo].top(ventana, criterio, n)
+    else:
+        filas = _top_consulta(campo, criterio, n, filtros)
+    nombres = _nombres(campo, [pk for pk, _, _ in filas])
+    resultado = {
+        'desde': desde,
+        'hasta': hasta,
+        'resultados': [
+            {'posicion': i, 'id': pk, 'nombre': nombres.get(pk), 'ingresos': ingresos, 'unidades': unidades}
+            for i, (pk, ingresos, unidades) in enumerate(filas, start=1)
+        ],
+    }
+    cache.set(clave, resultado, TIMEOUT)
+    return resultado
@@ -0,0 +1,138 @@
+"""
+Mantenimiento de `ClienteResumen` (compras por cliente).
+
+- Una venta nueva suma sus valores al resumen con un UPDATE atómico (F()).
+- Editar o eliminar una venta recalcula solo el resumen del cliente afectado.
+- `reconstruir_resumenes` recalcula todo por bloques de clientes.
+- `total_clientes` cuenta los clientes desde el caché de Django: en InnoDB,
+  COUNT(*) recorre la tabla completa. Las altas y bajas lo invalidan al
+  confirmarse (ver `ventas/signals.py`); con un caché por proceso, los demás
+  procesos pueden ver el total anterior hasta `TIMEOUT_TOTAL_CLIENTES` segundos.
+
+Las operaciones masivas que no disparan señales (`QuerySet.update`,
+`bulk_create`, ...) deben llamar a estas funciones o reconstruir después.
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import Greatest, Least
+
+from ventas.models import Cliente, ClienteResumen, Venta
+
+TIMEOUT_TOTAL_CLIENTES = 300
+_CLAVE_TOTAL_CLIENTES = 'ventas:total_clientes'
+
+
+def total_clientes():
+    """Cantidad de clientes, desde el caché si está."""
+    return cache.get_or_set(_CLAVE_TOTAL_CLIENTES, Cliente.objects.count, TIMEOUT_TOTAL_CLIENTES)
+
+
+def invalidar_total_clientes():
+    cache.delete(_CLAVE_TOTAL_CLIENTES)
+
+
+def registrar_venta(cliente_id, total_venta, fecha):
+    """Suma una venta nueva al resumen del cliente."""
+    registrar_ventas(cliente_id, 1, total_venta, fecha, fecha)
+
+
+def registrar_ventas(cliente_id, compras, total, primera, ultima):
+    """Suma `compras` ventas nuevas (de `primera` a `ultima`) al resumen del cliente."""
+    total = total or 0
+    actualizados = ClienteResumen.objects.filter(cliente_id=cliente_id).update(
+        compras_count=F('compras_count') + compras,
+        total_comprado=F('total_comprado') + total,
+        primera_compra=Least('primera_compra', primera),
+        ultima_compra=Greatest('ultima_compra', ultima),
+    )
+    if actualizados:
+        return
+    try:
+        with transaction.atomic():
+            ClienteResumen.objects.create(
+                cliente_id=cliente_id,
+                compras_count=compras,
+                total_comprado=total,
+                primera_compra=primera,
+                ultima_compra=ultima,
+            )
+    except IntegrityError:
+        # Otro proceso creó la fila entre el UPDATE y el INSERT
+        registrar_ventas(cliente_id, compras, total, primera, ultima)
+
+
+def _agregados_por_cliente(cliente_ids):
+    return (
+        Venta.objects.filter(cliente_id__in=cliente_ids)
+        .order_by()
+        .values('cliente_id')
+        .annotate(
+            compras_count=Count('id'),
+            total_comprado=Sum('total_venta'),
+            primera_compra=Min('fecha'),
+            ultima_compra=Max('fecha'),
+        )
+    )
+
+
+def _resumen_desde_agregado(fila):
+    return ClienteResumen(
+        cliente_id=fila['cliente_id'],
+        compras_count=fila['compras_count'],
+        total_comprado=fila['total_comprado'] or 0,
+        primera_compra=fila['primera_compra'],
+        ultima_compra=fila['ultima_compra'],
+    )
+
+
+def recalcular_cliente(cliente_id):
+    """Recalcula el resumen de un cliente desde el libro de ventas.
+
+    Un cliente sin ventas no tiene fila de resumen.
+    """
+    fila = next(iter(_agregados_por_cliente([cliente_id])), None)
+    if fila is None:
+        ClienteResumen.objects.filter(cliente_id=cliente_id).delete()
+        return
+    resumen = _resumen_desde_agregado(fila)
+    ClienteResumen.objects.update_or_create(
+        cliente_id=cliente_id,
+        defaults={
+            'compras_count': resumen.compras_count,
+            'total_comprado': resumen.total_comprado,
+            'primera_compra': resumen.primera_compra,
+            'ultima_compra': resumen.ultima_compra,
+        },
+    )
+
+
+def reconstruir_resumenes(chunk_size=1000, clientes=None):
+    """Reconstruye los resúmenes recorriendo los clientes por bloques de id.
+
+    `clientes` limita la reconstrucción a un queryset (por defecto, todos).
+    Genera el número de clientes procesados después de cada bloque.
+    """
+    todos = clientes is None
+    clientes = Cliente.objects.all() if todos else clientes
+    ultimo_id = 0
+    procesados = 0
+    while True:
+        ids = list(
+            clientes.filter(id__gt=ultimo_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        resumenes = [_resumen_desde_agregado(fila) for fila in _agregados_por_cliente(ids)]
+        with transaction.atomic():
+            ClienteResumen.objects.filter(cliente_id__in=ids).delete()
+            ClienteResumen.objects.bulk_create(resumenes)
+        ultimo_id = ids[-1]
+        procesados += len(ids)
+        yield procesados
+    if not todos:
+        return
+    # Filas huérfanas de clientes ya eliminados
+    ClienteResumen.objects.exclude(cliente_id__in=Cliente.objects.values('id')).delete()
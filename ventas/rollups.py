@@ -0,0 +1,223 @@
+"""
+Mantenimiento de `VentaResumenDiario` (ventas por día × vendedor × producto).
+
+Los días se cuentan en la zona horaria del proyecto (America/Santiago), igual
+que los filtros de fecha de la API (`ventas/filtros.py`), así que un rango de
+fechas sobre el libro de ventas y sobre los acumulados selecciona las mismas
+ventas.
+
+- `sumar` / `restar` aplican una venta a su fila con UPDATE atómico (F()).
+  `restar` nunca deja una columna en negativo: si la fila no alcanza a cubrir
+  la venta (quedó desfasada del libro), la recalcula desde el libro. Si la
+  fila no existe (p. ej. se eliminó en cascada con su producto), no la crea.
+- `reconstruir_rollups` recalcula por bloques de un mes desde el libro.
+- `diferencias_rollups` compara los acumulados con el libro (verificación).
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ventas.models import Venta, VentaResumenDiario
+
+
+def zona_horaria():
+    return timezone.get_default_timezone()
+
+
+def dia_local(fecha):
+    return timezone.localtime(fecha, zona_horaria()).date()
+
+
+def inicio_del_dia(dia):
+    """Instante (aware) en que comienza `dia` en hora local."""
+    return timezone.make_aware(datetime.combine(dia, time.min), zona_horaria())
+
+
+def sumar(fecha, vendedor_id, producto_id, total_venta, cantidad, ventas=1):
+    """Suma una (o varias) ventas a la fila de su día, creándola si no existe."""
+    dia = dia_local(fecha)
+    total_venta = total_venta or 0
+    actualizados = VentaResumenDiario.objects.filter(
+        fecha=dia, vendedor_id=vendedor_id, producto_id=producto_id
+    ).update(
+        ventas_count=F('ventas_count') + ventas,
+        ingresos=F('ingresos') + total_venta,
+        unidades=F('unidades') + cantidad,
+    )
+    if actualizados:
+        return
+    try:
+        with transaction.atomic():
+            VentaResumenDiario.objects.create(
+                fecha=dia, vendedor_id=vendedor_id, producto_id=producto_id,
+                ventas_count=ventas, ingresos=total_venta, unidades=cantidad,
+            )
+    except IntegrityError:
+        # Otro proceso creó la fila entre el UPDATE y el INSERT
+        sumar(fecha, vendedor_id, producto_id, total_venta, cantidad, ventas)
+
+
+def restar(fecha, vendedor_id, producto_id, total_venta, cantidad, venta_id=None):
+    """Descuenta una venta de la fila de su día; elimina la fila si queda vacía.
+
+    `venta_id` es la venta que se descuenta: si hay que recalcular la fila, no
+    se cuenta (al editarla, el libro ya tiene sus valores nuevos).
+    """
+    dia = dia_local(fecha)
+    filas = VentaResumenDiario.objects.filter(fecha=dia, vendedor_id=vendedor_id, producto_id=producto_id)
+    descontadas = filas.filter(ventas_count__gte=1, unidades__gte=cantidad).update(
+        ventas_count=F('ventas_count') - 1,
+        ingresos=F('ingresos') - (total_venta or 0),
+        unidades=F('unidades') - cantidad,
+    )
+    if descontadas:
+        filas.filter(ventas_count=0).delete()
+    elif filas.exists():
+        # No alcanza a cubrir la venta: quedó desfasada del libro
+        recalcular_fila(dia, vendedor_id, producto_id, excluir=venta_id)
+
+
+def recalcular_fila(dia, vendedor_id, producto_id, excluir=None):
+    """Recalcula la fila de `dia` × vendedor × producto desde el libro, sin la venta `excluir`."""
+    ventas = Venta.objects.filter(
+        fecha__gte=inicio_del_dia(dia), fecha__lt=inicio_del_dia(dia + timedelta(days=1)),
+        vendedor_id=vendedor_id, producto_id=producto_id,
+    )
+    if excluir is not None:
+        ventas = ventas.exclude(pk=excluir)
+    agregados = ventas.aggregate(ventas_count=Count('id'), ingresos=Sum('total_venta'), unidades=Sum('cantidad'))
+    if not agregados['ventas_count']:
+        VentaResumenDiario.objects.filter(fecha=dia, vendedor_id=vendedor_id, producto_id=producto_id).delete()
+        return
+    VentaResumenDiario.objects.update_or_create(
+        fecha=dia, vendedor_id=vendedor_id, producto_id=producto_id,
+        defaults={
+            'ventas_count': agregados['ventas_count'],
+            'ingresos': agregados['ingresos'] or 0,
+            'unidades': agregados['unidades'] or 0,
+        },
+    )
+
+
+def _agregados_libro(desde, hasta):
+    """Agregados del libro por día × vendedor × producto en [desde, hasta)."""
+    return (
+        Venta.objects.filter(fecha__gte=inicio_del_dia(desde), fecha__lt=inicio_del_dia(hasta))
+        .annotate(dia=TruncDate('fecha', tzinfo=zona_horaria()))
+        .order_by()
+        .values('dia', 'vendedor_id', 'producto_id')
+        .annotate(
+            ventas_count=Count('id'),
+            ingresos=Sum('total_venta'),
+            unidades=Sum('cantidad'),
+        )
+    )
+
+
+def _meses(desde, hasta):
+    """Bloques [inicio, fin) de a lo más un mes calendario que cubren [desde, hasta)."""
+    inicio = desde
+    while inicio < hasta:
+        siguiente = (inicio.replace(day=1) + timedelta(days=32)).replace(day=1)
+        fin = min(siguiente, hasta)
+        yield inicio, fin
+        inicio = fin
+
+
+def _rango_completo():
+    """Días [primero, último + 1) cubiertos por el libro o por los acumulados."""
+    limites = []
+    primera = Venta.objects.order_by('fecha').values_list('fecha', flat=True).first()
+    if primera is not None:
+        ultima = Venta.objects.order_by('-fecha').values_list('fecha', flat=True).first()
+        limites += [dia_local(primera), dia_local(ultima)]
+    rollups = VentaResumenDiario.objects.aggregate(primera=Min('fecha'), ultima=Max('fecha'))
+    limites += [dia for dia in rollups.values() if dia is not None]
+    if not limites:
+        return None
+    return min(limites), max(limites) + timedelta(days=1)
+
+
+def _resolver_rango(desde, hasta):
+    if desde and hasta:
+        return desde, hasta
+    rango = _rango_completo()
+    if rango is None:
+        return None
+    return desde or rango[0], hasta or rango[1]
+
+
+def reconstruir_rollups(desde=None, hasta=None):
+    """Recalcula los acumulados de [desde, hasta) mes a mes.
+
+    Sin fechas, cubre todo el libro y los acumulados existentes. Genera cada bloque procesado
+    como `(inicio, fin, filas_creadas)`.
+    """
+    rango = _resolver_rango(desde, hasta)
+    if rango is None:
+        return
+    desde, hasta = rango
+    for inicio, fin in _meses(desde, hasta):
+        filas = [
+            VentaResumenDiario(
+                fecha=fila['dia'],
+                vendedor_id=fila['vendedor_id'],
+                producto_id=fila['producto_id'],
+                ventas_count=fila['ventas_count'],
+                ingresos=fila['ingresos'] or 0,
+                unidades=fila['unidades'] or 0,
+            )
+            for fila in _agregados_libro(inicio, fin)
+        ]
+        with transaction.atomic():
+            VentaResumenDiario.objects.filter(fecha__gte=inicio, fecha__lt=fin).delete()
+            VentaResumenDiario.objects.bulk_create(filas, batch_size=1000)
+        yield inicio, fin, len(filas)
+
+
+def diferencias_rollups(desde=None, hasta=None):
+    """Compara acumulados y libro en [desde, hasta); genera las filas que no cuadran.
+
+    Cada diferencia es `(clave, esperado, actual)` con
+    `clave = (dia, vendedor_id, producto_id)` y valores
+    `(ventas_count, ingresos, unidades)`; `None` indica que la fila falta.
+    """
+    rango = _resolver_rango(desde, hasta)
+    if rango is None:
+        return
+    desde, hasta = rango
+    for inicio, fin in _meses(desde, hasta):
+        esperado = {
+            (f['dia'], f['vendedor_id'], f['producto_id']):
+                (f['ventas_count'], f['ingresos'] or 0, f['unidades'] or 0)
+            for f in _agregados_libro(inicio, fin)
+        }
+        actual = {
+            (f.fecha, f.vendedor_id, f.producto_id): (f.ventas_count, f.ingresos, f.unidades)
+            for f in VentaResumenDiario.objects.filter(fecha__gte=inicio, fecha__lt=fin)
+        }
+        for clave in sorted(esperado.keys() | actual.keys()):
+            if esperado.get(clave) != actual.get(clave):
+                yield clave, esperado.get(clave), actual.get(clave)
+
+
+def estadisticas(vendedor=None, producto=None, fecha_desde=None, fecha_hasta=None):
+    """Totales de ventas sumando filas de acumulados (fechas inclusivas, en hora local)."""
+    filas = VentaResumenDiario.objects.all()
+    if vendedor:
+        filas = filas.filter(vendedor_id=vendedor)
+    if producto:
+        filas = filas.filter(producto_id=producto)
+    if fecha_desde:
+        filas = filas.filter(fecha__gte=fecha_desde)
+    if fecha_hasta:
+        filas = filas.filter(fecha__lte=fecha_hasta)
+    totales = filas.aggregate(
+        total_ventas=Sum('ventas_count'),
+        total_ingresos=Sum('ingresos'),
+        total_unidades=Sum('unidades'),
+    )
+    return {clave: valor or 0 for clave, valor in totales.items()}
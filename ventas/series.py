@@ -0,0 +1,180 @@
+"""
+Series de tiempo de ventas (ingresos, cantidad de ventas y unidades por período).
+
+Cada serie es una sola consulta agrupada con `Trunc*` en la base de datos, en
+la zona horaria del proyecto, y los períodos sin ventas se completan con ceros
+en Python. Por día, semana o mes se agrupan los acumulados diarios
+(`VentaResumenDiario`), igual que `VentaViewSet.estadisticas`; por hora, o con
+filtro de cliente (que los acumulados no separan), se agrupa el libro de ventas
+con los mismos filtros del listado.
+
+Por hora, los períodos son horas de reloj local: en el cambio de horario de
+abril la hora repetida es un solo período y en el de septiembre la hora que no
+existe no aparece.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from ventas.filtros import filtrar_ventas
+from ventas.models import Venta, VentaResumenDiario
+from ventas.rollups import inicio_del_dia, zona_horaria
+
+INTERVALOS = ('hora', 'dia', 'semana', 'mes')
+_TRUNC = {'hora': 'hour', 'dia': 'day', 'semana': 'week', 'mes': 'month'}
+
+# Períodos por serie; más que esto pide un intervalo mayor o un rango menor
+MAX_PUNTOS = 5000
+
+
+class SerieDemasiadoLarga(ValueError):
+    pass
+
+
+def _agrupar_libro(intervalo, filtros):
+    if intervalo == 'hora':
+        periodo = Trunc('fecha', 'hour', tzinfo=zona_horaria())
+    else:
+        periodo = Trunc('fecha', _TRUNC[intervalo], output_field=DateField(), tzinfo=zona_horaria())
+    return (
+        filtrar_ventas(Venta.objects.all(), **filtros)
+        .annotate(periodo=periodo)
+        .order_by()
+        .values('periodo')
+        .annotate(ventas_count=Count('id'), ingresos=Sum('total_venta'), unidades=Sum('cantidad'))
+    )
+
+
+def _agrupar_acumulados(intervalo, vendedor, producto, fecha_desde, fecha_hasta):
+    filas = VentaResumenDiario.objects.all()
+    if vendedor:
+        filas = filas.filter(vendedor_id=vendedor)
+    if producto:
+        filas = filas.filter(producto_id=producto)
+    if fecha_desde:
+        filas = filas.filter(fecha__gte=fecha_desde)
+    if fecha_hasta:
+        filas = filas.filter(fecha__lte=fecha_hasta)
+    return (
+        filas.annotate(periodo=Trunc('fecha', _TRUNC[intervalo]))
+        .order_by()
+        .values('periodo')
+        .annotate(ventas_count=Sum('ventas_count'), ingresos=Sum('ingresos'), unidades=Sum('unidades'))
+    )
+
+
+def _clave(intervalo, periodo):
+    # Por hora, la hora de reloj local (el valor viene en la zona del proyecto)
+    return timezone.make_naive(periodo, zona_horaria()) if intervalo == 'hora' else periodo
+
+
+def _inicio(intervalo, dia):
+    """Primer período del intervalo que contiene el día `dia`."""
+    if intervalo == 'hora':
+        return timezone.make_naive(inicio_del_dia(dia), zona_horaria())
+    if intervalo == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if intervalo == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def _fin(intervalo, dia):
+    """Último período del intervalo que contiene el día `dia`."""
+    if intervalo == 'hora':
+        ultima_hora = inicio_del_dia(dia + timedelta(days=1)) - timedelta(hours=1)
+        return timezone.make_naive(ultima_hora, zona_horaria())
+    return _inicio(intervalo, dia)
+
+
+def _periodos(intervalo, primero, ultimo):
+    """Claves de los períodos [primero, ultimo] del intervalo, en orden."""
+    if intervalo == 'hora':
+        # Por instantes (en UTC: sumar a un datetime local suma horas de reloj),
+        # para saltar o no repetir las horas del cambio de horario
+        zona = zona_horaria()
+        instante = timezone.make_aware(primero, zona).astimezone(dt_timezone.utc)
+        fin = timezone.make_aware(ultimo, zona).astimezone(dt_timezone.utc)
+        anterior = None
+        while instante <= fin:
+            hora = timezone.make_naive(instante, zona)
+            if hora != anterior:
+                yield hora
+            anterior = hora
+            instante += timedelta(hours=1)
+        return
+    periodo = primero
+    while periodo <= ultimo:
+        yield periodo
+        if intervalo == 'mes':
+            periodo = (periodo + timedelta(days=32)).replace(day=1)
+        else:
+            periodo += timedelta(days=7 if intervalo == 'semana' else 1)
+
+
+def _cantidad_periodos(intervalo, primero, ultimo):
+    if intervalo == 'hora':
+        return int((ultimo - primero).total_seconds() // 3600) + 1
+    if intervalo == 'mes':
+        return (ultimo.year - primero.year) * 12 + ultimo.month - primero.month + 1
+    return (ultimo - primero).days // (7 if intervalo == 'semana' else 1) + 1
+
+
+def _verificar_largo(intervalo, primero, ultimo):
+    if _cantidad_periodos(intervalo, primero, ultimo) > MAX_PUNTOS:
+        raise SerieDemasiadoLarga(
+            f'La serie tiene más de {MAX_PUNTOS} períodos; usar un intervalo mayor o un rango menor.'
+        )
+
+
+def serie_ventas(intervalo, vendedor=None, cliente=None, producto=None, fecha_desde=None, fecha_hasta=None):
+    """Puntos `{'periodo', 'ventas_count', 'ingresos', 'unidades'}` de cada período, sin huecos.
+
+    Las fechas son días locales inclusivos (`date`); sin alguna de ellas la
+    serie empieza o termina en el primer o último período con ventas.
+    `periodo` es un `date` (primer día del período) o, por hora, un datetime
+    aware en la zona del proyecto. Lanza `SerieDemasiadoLarga` si el rango
+    excede `MAX_PUNTOS` períodos.
+    """
+    if fecha_desde and fecha_hasta:
+        # Antes de consultar: el rango pedido ya define el largo de la serie
+        _verificar_largo(intervalo, _inicio(intervalo, fecha_desde), _fin(intervalo, fecha_hasta))
+
+    if intervalo == 'hora' or cliente:
+        filas = _agrupar_libro(intervalo, {
+            'vendedor': vendedor, 'cliente': cliente, 'producto': producto,
+            'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta,
+        })
+    else:
+        filas = _agrupar_acumulados(intervalo, vendedor, producto, fecha_desde, fecha_hasta)
+    valores = {_clave(intervalo, fila.pop('periodo')): fila for fila in filas}
+
+    if fecha_desde:
+        primero = _inicio(intervalo, fecha_desde)
+    elif valores:
+        primero = min(valores)
+    else:
+        return []
+    if fecha_hasta:
+        ultimo = _fin(intervalo, fecha_hasta)
+    elif valores:
+        ultimo = max(valores)
+    else:
+        return []
+    _verificar_largo(intervalo, primero, ultimo)
+
+    vacio = {'ventas_count': 0, 'ingresos': 0, 'unidades': 0}
+    puntos = []
+    for periodo in _periodos(intervalo, primero, ultimo):
+        fila = valores.get(periodo, vacio)
+        if intervalo == 'hora':
+            periodo = timezone.make_aware(periodo, zona_horaria())
+        puntos.append({
+            'periodo': periodo,
+            'ventas_count': fila['ventas_count'] or 0,
+            'ingresos': fila['ingresos'] or 0,
+            'unidades': fila['unidades'] or 0,
+        })
+    return puntos
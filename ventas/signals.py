@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from inventario import stock
+from ventas.models import Cliente, Venta
+from ventas import ranking, resumenes, rollups
+
+_CAMPOS_ANTERIORES = ('cliente_id', 'vendedor_id', 'producto_id', 'fecha', 'total_venta', 'cantidad')
+
+
+@receiver(pre_save, sender=Venta)
+def recordar_valores_anteriores(sender, instance, **kwargs):
+    # Al editar hay que descontar la venta tal como estaba guardada
+    instance._valores_anteriores = None
+    if instance.pk:
+        instance._valores_anteriores = (
+            Venta.objects.filter(pk=instance.pk).values(*_CAMPOS_ANTERIORES).first()
+        )
+
+
+@receiver(post_save, sender=Venta)
+def actualizar_resumen_cliente(sender, instance, created, **kwargs):
+    if created:
+        resumenes.registrar_venta(instance.cliente_id, instance.total_venta, instance.fecha)
+        return
+    resumenes.recalcular_cliente(instance.cliente_id)
+    anterior = getattr(instance, '_valores_anteriores', None)
+    if anterior and anterior['cliente_id'] != instance.cliente_id:
+        resumenes.recalcular_cliente(anterior['cliente_id'])
+
+
+@receiver(post_save, sender=Venta)
+def actualizar_rollup_diario(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_valores_anteriores', None)
+    if not created and anterior:
+        rollups.restar(
+            anterior['fecha'], anterior['vendedor_id'], anterior['producto_id'],
+            anterior['total_venta'], anterior['cantidad'], venta_id=instance.pk,
+        )
+    rollups.sumar(
+        instance.fecha, instance.vendedor_id, instance.producto_id,
+        instance.total_venta, instance.cantidad,
+    )
+
+
+@receiver(post_save, sender=Venta)
+def versionar_edicion(sender, instance, created, **kwargs):
+    # Las ventas nuevas los rankings las leen por id; las editadas obligan a reconstruir
+    if not created:
+        ranking.registrar_edicion()
+
+
+@receiver(post_save, sender=Venta)
+def mover_stock(sender, instance, created, **kwargs):
+    # Último receptor: la fila de stock queda bloqueada hasta el commit
+    if created:
+        stock.mover(instance.producto_id, -instance.cantidad, 'venta', instance.pk, instance.vendedor_id)
+        return
+    anterior = getattr(instance, '_valores_anteriores', None)
+    if not anterior:
+        return
+    if anterior['producto_id'] == instance.producto_id:
+        stock.mover(
+            instance.producto_id, anterior['cantidad'] - instance.cantidad, 'edicion',
+            instance.pk, instance.vendedor_id,
+        )
+    else:
+        stock.mover(anterior['producto_id'], anterior['cantidad'], 'edicion', instance.pk, instance.vendedor_id)
+        stock.mover(instance.producto_id, -instance.cantidad, 'edicion', instance.pk, instance.vendedor_id)
+
+
+@receiver(post_delete, sender=Venta)
+def descontar_resumen_cliente(sender, instance, **kwargs):
+    resumenes.recalcular_cliente(instance.cliente_id)
+
+
+@receiver(post_delete, sender=Venta)
+def descontar_rollup_diario(sender, instance, **kwargs):
+    rollups.restar(
+        instance.fecha, instance.vendedor_id, instance.producto_id,
+        instance.total_venta, instance.cantidad, venta_id=instance.pk,
+    )
+
+
+@receiver(post_delete, sender=Venta)
+def versionar_eliminacion(sender, instance, **kwargs):
+    ranking.registrar_edicion()
+
+
+@receiver(post_delete, sender=Venta)
+def devolver_stock(sender, instance, origin=None, **kwargs):
+    # Solo al anular la venta; si cae en cascada con su cliente o producto, el stock no cambia
+    if getattr(origin, 'model', type(origin)) is Venta:
+        stock.mover(instance.producto_id, instance.cantidad, 'anulacion', instance.pk, instance.vendedor_id)
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def invalidar_total_clientes(sender, instance, created=True, **kwargs):
+    # Editar un cliente no cambia el total
+    if created:
+        transaction.on_commit(resumenes.invalidar_total_clientes)
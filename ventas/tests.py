@@ -1,3 +1,600 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count
+from django.db.models.signals import post_delete
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from inventario import stock
+from inventario.models import Marca, MovimientoStock, PrecioProducto, Producto, StockProducto
+from inventario.busqueda import indice
+from ventas.filtros import filtrar_ventas, rango_fechas
+from ventas.management.commands import generar_datos
+from ventas.forms import VentaForm
+from ventas.models import Cliente, ClienteResumen, DetalleVenta, Venta, VentaResumenDiario
+from ventas import ranking
+from ventas.rollups import diferencias_rollups, inicio_del_dia
+from pc_shop.pruebas import PresupuestoConsultasMixin
+
+
+class ClienteResumenTestCase(TestCase):
+    """Tests del resumen de compras por cliente"""
+
+    def setUp(self):
+        self.vendedor = User.objects.create_user(username='vendedor', password='testpass123')
+        self.producto = Producto.objects.create(nombre='Mouse', precio=1000, descripcion='desc')
+        self.cliente = Cliente.objects.create(rut='11111111-1', nombre='Ana', apellido='Pérez')
+        self.otro_cliente = Cliente.objects.create(rut='22222222-2', nombre='Luis', apellido='Soto')
+
+    def vender(self, cliente, cantidad=1):
+        return Venta.objects.create(
+            vendedor=self.vendedor, cliente=cliente, producto=self.producto, cantidad=cantidad
+        )
+
+    def test_crear_venta_suma_al_resumen(self):
+        primera = self.vender(self.cliente, 2)
+        segunda = self.vender(self.cliente, 3)
+        resumen = ClienteResumen.objects.get(cliente=self.cliente)
+        self.assertEqual(resumen.compras_count, 2)
+        self.assertEqual(resumen.total_comprado, 5000)
+        self.assertEqual(resumen.primera_compra, primera.fecha)
+        self.assertEqual(resumen.ultima_compra, segunda.fecha)
+
+    def test_editar_venta_recalcula_ambos_clientes(self):
+        venta = self.vender(self.cliente, 2)
+        self.vender(self.cliente, 1)
+        venta.cliente = self.otro_cliente
+        venta.cantidad = 4
+        venta.save()
+        self.assertEqual(ClienteResumen.objects.get(cliente=self.cliente).total_comprado, 1000)
+        resumen_otro = ClienteResumen.objects.get(cliente=self.otro_cliente)
+        self.assertEqual(resumen_otro.compras_count, 1)
+        self.assertEqual(resumen_otro.total_comprado, 4000)
+
+    def test_eliminar_ultima_venta_elimina_resumen(self):
+        venta = self.vender(self.cliente)
+        venta.delete()
+        self.assertFalse(ClienteResumen.objects.filter(cliente=self.cliente).exists())
+
+    def test_eliminar_cliente_con_ventas(self):
+        self.vender(self.cliente)
+        self.cliente.delete()
+        self.assertFalse(ClienteResumen.objects.exists())
+
+    def test_comando_reconstruye_resumenes(self):
+        self.vender(self.cliente, 2)
+        self.vender(self.otro_cliente, 1)
+        # Cambios que no pasan por las señales
+        Venta.objects.filter(cliente=self.cliente).update(total_venta=9999)
+        ClienteResumen.objects.filter(cliente=self.otro_cliente).delete()
+
+        call_command('reconstruir_resumen_clientes', chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(ClienteResumen.objects.get(cliente=self.cliente).total_comprado, 9999)
+        self.assertEqual(ClienteResumen.objects.get(cliente=self.otro_cliente).compras_count, 1)
+
+
+class VentaResumenDiarioTestCase(TestCase):
+    """Tests de los acumulados diarios de ventas"""
+
+    def setUp(self):
+        self.vendedor = User.objects.create_user(username='vendedor', password='testpass123')
+        self.otro_vendedor = User.objects.create_user(username='otro', password='testpass123')
+        self.producto = Producto.objects.create(nombre='Mouse', precio=1000, descripcion='desc')
+        self.cliente = Cliente.objects.create(rut='11111111-1', nombre='Ana', apellido='Pérez')
+
+    def vender(self, vendedor=None, cantidad=1):
+        return Venta.objects.create(
+            vendedor=vendedor or self.vendedor, cliente=self.cliente,
+            producto=self.producto, cantidad=cantidad,
+        )
+
+    def verificar(self):
+        call_command('verificar_rollups_ventas', stdout=StringIO())
+
+    def test_senales_mantienen_los_acumulados(self):
+        venta = self.vender(cantidad=2)
+        self.vender(cantidad=3)
+        fila = VentaResumenDiario.objects.get()
+        self.assertEqual((fila.ventas_count, fila.ingresos, fila.unidades), (2, 5000, 5))
+
+        venta.vendedor = self.otro_vendedor
+        venta.cantidad = 1
+        venta.save()
+        self.assertEqual(VentaResumenDiario.objects.count(), 2)
+        self.verificar()
+
+        venta.delete()
+        self.assertEqual(VentaResumenDiario.objects.count(), 1)
+        self.verificar()
+
+    def test_restar_no_deja_la_fila_en_negativo(self):
+        # Fila desfasada del libro: descontar la venta la llevaría bajo cero
+        venta = self.vender(cantidad=5)
+        otra = self.vender(cantidad=2)
+        VentaResumenDiario.objects.update(ventas_count=1, unidades=1)
+
+        otra.cantidad = 4
+        otra.save()
+        self.verificar()
+
+        VentaResumenDiario.objects.update(ventas_count=1, unidades=1)
+        venta.delete()
+        fila = VentaResumenDiario.objects.get()
+        self.assertEqual((fila.ventas_count, fila.unidades), (1, 4))
+        self.verificar()
+
+        VentaResumenDiario.objects.all().delete()
+        otra.delete()
+        self.assertFalse(VentaResumenDiario.objects.exists())
+
+    def test_dia_en_hora_de_santiago(self):
+        venta = self.vender()
+        # 01:00 UTC del 2 de enero son las 22:00 del 1 de enero en Santiago (UTC-3)
+        Venta.objects.filter(pk=venta.pk).update(
+            fecha=datetime(2024, 1, 2, 1, 0, tzinfo=dt_timezone.utc)
+        )
+        with self.assertRaises(CommandError):
+            self.verificar()
+        call_command('reconstruir_rollups_ventas', stdout=StringIO())
+        self.assertEqual(VentaResumenDiario.objects.get().fecha, date(2024, 1, 1))
+        self.verificar()
+
+
+class FiltroFechasVentasTestCase(TestCase):
+    """Los días se filtran con rangos semiabiertos de instantes, en hora de Santiago"""
+
+    def setUp(self):
+        vendedor = User.objects.create_user(username='vendedor', password='testpass123')
+        producto = Producto.objects.create(nombre='Mouse', precio=1000, descripcion='desc')
+        cliente = Cliente.objects.create(rut='11111111-1', nombre='Ana', apellido='Pérez')
+        # Alrededor del 8 de septiembre de 2024 (medianoche inexistente: de 00:00 a 01:00,
+        # UTC-4 a UTC-3) y del 7 de abril de 2024 (23:00 a 24:00 del sábado se repite)
+        instantes = [
+            datetime(2024, 9, 8, 3, 59, tzinfo=dt_timezone.utc),   # 7 sep 23:59 local
+            datetime(2024, 9, 8, 4, 0, tzinfo=dt_timezone.utc),    # 8 sep 01:00 local
+            datetime(2024, 9, 9, 2, 59, tzinfo=dt_timezone.utc),   # 8 sep 23:59 local
+            datetime(2024, 9, 9, 3, 0, tzinfo=dt_timezone.utc),    # 9 sep 00:00 local
+            datetime(2024, 4, 7, 2, 30, tzinfo=dt_timezone.utc),   # 6 abr 23:30 local (UTC-3)
+            datetime(2024, 4, 7, 3, 30, tzinfo=dt_timezone.utc),   # 6 abr 23:30 local (UTC-4)
+            datetime(2024, 4, 7, 4, 0, tzinfo=dt_timezone.utc),    # 7 abr 00:00 local
+        ]
+        for instante in instantes:
+            venta = Venta.objects.create(vendedor=vendedor, cliente=cliente, producto=producto)
+            Venta.objects.filter(pk=venta.pk).update(fecha=instante)
+
+    def test_mismas_ventas_que_el_filtro_por_fecha_local(self):
+        dias = [date(2024, 4, 6), date(2024, 4, 7), date(2024, 9, 7), date(2024, 9, 8), date(2024, 9, 9)]
+        for desde in dias:
+            for hasta in dias:
+                with self.subTest(desde=desde, hasta=hasta):
+                    filtradas = filtrar_ventas(Venta.objects.all(), fecha_desde=desde, fecha_hasta=hasta)
+                    esperadas = Venta.objects.filter(fecha__date__gte=desde, fecha__date__lte=hasta)
+                    self.assertEqual(
+                        set(filtradas.values_list('pk', flat=True)), set(esperadas.values_list('pk', flat=True))
+                    )
+        por_dia = {
+            dia: filtrar_ventas(Venta.objects.all(), fecha_desde=dia, fecha_hasta=dia).count() for dia in dias
+        }
+        self.assertEqual(por_dia, {
+            date(2024, 4, 6): 2, date(2024, 4, 7): 1,
+            date(2024, 9, 7): 1, date(2024, 9, 8): 2, date(2024, 9, 9): 1,
+        })
+
+    def test_rango_sin_funciones_sobre_la_columna(self):
+        sql = str(filtrar_ventas(
+            Venta.objects.all(), fecha_desde=date(2024, 9, 8), fecha_hasta=date(2024, 9, 8)
+        ).query)
+        self.assertNotIn('django_datetime_cast_date', sql)
+        rango = rango_fechas(date(2024, 9, 8), date(2024, 9, 8))
+        # El 8 de septiembre parte a la 01:00 local (UTC-3) y dura 23 horas
+        self.assertEqual(
+            {filtro: instante.astimezone(dt_timezone.utc) for filtro, instante in rango.items()},
+            {
+                'fecha__gte': datetime(2024, 9, 8, 4, 0, tzinfo=dt_timezone.utc),
+                'fecha__lt': datetime(2024, 9, 9, 3, 0, tzinfo=dt_timezone.utc),
+            }
+        )
+
+    def test_comando_verifica_indices(self):
+        salida = StringIO()
+        call_command('verificar_indices_ventas', stdout=salida)
+        salida = salida.getvalue()
+        self.assertIn('vendedor + fecha: índice venta_vendedor_fecha_idx', salida)
+        self.assertIn('fecha: índice venta_fecha_idx', salida)
+        self.assertNotIn('recorre la tabla', salida)
+
+
+class RankingVentasTestCase(TestCase):
+    """Los totales en memoria por ventana dan el mismo top N que la consulta agrupada"""
+
+    HOY = date(2024, 3, 15)
+
+    def setUp(self):
+        ranking.invalidar()
+        self.vendedores = [User.objects.create_user(username=f'vendedor{i}', password='x') for i in range(3)]
+        self.productos = [
+            Producto.objects.create(nombre=f'Producto {i}', precio=100 * (i + 1), descripcion='desc')
+            for i in range(4)
+        ]
+        self.clientes = [
+            Cliente.objects.create(rut=f'1111111{i}-1', nombre=f'Cliente{i}', apellido='Prueba') for i in range(3)
+        ]
+        # Ventas repartidas entre fin del año anterior y hoy
+        for i, dias in enumerate([0, 0, 1, 3, 6, 7, 12, 29, 30, 45, 74, 80]):
+            self.vender(i, self.HOY - timedelta(days=dias), cantidad=1 + i % 4)
+
+    def vender(self, i, dia, cantidad=1):
+        venta = Venta.objects.create(
+            vendedor=self.vendedores[i % 3], cliente=self.clientes[(i * 2) % 3],
+            producto=self.productos[i % 4], cantidad=cantidad,
+        )
+        # Al mediodía en Santiago; QuerySet.update no pasa por las señales
+        Venta.objects.filter(pk=venta.pk).update(fecha=inicio_del_dia(dia) + timedelta(hours=12))
+        return venta
+
+    def assertIgualALaConsulta(self, hoy):
+        for campo, totales in ranking.totales.items():
+            totales.sincronizar(hoy)
+            for ventana in ranking.VENTANAS:
+                for criterio in ranking.CRITERIOS:
+                    with self.subTest(campo=campo, ventana=ventana, criterio=criterio, hoy=hoy):
+                        esperado = ranking._top_consulta(campo, criterio, 3, {
+                            'fecha_desde': ranking.inicio_ventana(ventana, hoy), 'fecha_hasta': hoy,
+                        })
+                        self.assertEqual(totales.top(ventana, criterio, 3), esperado)
+
+    def test_ventanas_iguales_a_la_consulta(self):
+        self.assertIgualALaConsulta(self.HOY)
+
+    def test_ventas_nuevas_se_aplican_sin_reconstruir(self):
+        self.assertIgualALaConsulta(self.HOY)
+        with mock.patch.object(ranking.TotalesVentanas, '_reconstruir') as reconstruir:
+            self.vender(1, self.HOY, cantidad=7)
+            self.vender(2, self.HOY - timedelta(days=20), cantidad=2)
+            self.assertIgualALaConsulta(self.HOY)
+        reconstruir.assert_not_called()
+
+    def test_cambio_de_dia_reconstruye(self):
+        self.assertIgualALaConsulta(self.HOY)
+        self.vender(1, self.HOY, cantidad=7)
+        self.assertIgualALaConsulta(self.HOY + timedelta(days=1))
+        self.assertIgualALaConsulta(self.HOY + timedelta(days=9))
+        # A inicios de año la ventana de 30 días toma días del año anterior
+        self.assertIgualALaConsulta(date(2024, 1, 10))
+
+    def test_reconstruye_solo_la_dimension_consultada(self):
+        self.assertIgualALaConsulta(self.HOY)
+        ranking.registrar_edicion()
+        with mock.patch.object(
+            ranking.TotalesVentanas, '_reconstruir', autospec=True, side_effect=ranking.TotalesVentanas._reconstruir
+        ) as reconstruir:
+            ranking.totales['producto'].sincronizar(self.HOY)
+            ranking.totales['producto'].sincronizar(self.HOY)
+        self.assertEqual([llamada.args[0].campo for llamada in reconstruir.call_args_list], ['producto_id'])
+
+    def test_editar_o_eliminar_reconstruye(self):
+        self.assertIgualALaConsulta(self.HOY)
+        venta = Venta.objects.order_by('-fecha').first()
+        venta.cantidad = 9
+        venta.save()
+        self.assertIgualALaConsulta(self.HOY)
+        venta.delete()
+        self.assertIgualALaConsulta(self.HOY)
+
+    def test_rango_arbitrario_con_limit(self):
+        with mock.patch('ventas.ranking.timezone.localdate', return_value=self.HOY):
+            por_ventana = ranking.ranking('productos', 'unidades', n=2, ventana='7d')
+        por_rango = ranking.ranking(
+            'productos', 'unidades', n=2, fecha_desde=self.HOY - timedelta(days=6), fecha_hasta=self.HOY
+        )
+        self.assertEqual(por_ventana, por_rango)
+        self.assertEqual(len(por_rango['resultados']), 2)
+        primero = por_rango['resultados'][0]
+        self.assertEqual((primero['posicion'], primero['nombre'], primero['unidades']), (1, 'Producto 3', 4))
+
+
+class PrecioUnitarioVentaTestCase(TestCase):
+    """Las ventas guardan el precio del producto al registrarse"""
+
+    def setUp(self):
+        self.vendedor = User.objects.create_user(username='vendedor', password='testpass123')
+        self.cliente = Cliente.objects.create(rut='11111111-1', nombre='Ana', apellido='Pérez')
+        self.mouse = Producto.objects.create(nombre='Mouse', precio=1000, descripcion='desc')
+        self.teclado = Producto.objects.create(nombre='Teclado', precio=500, descripcion='desc')
+
+    def vender(self, producto, cantidad=1):
+        return Venta.objects.create(vendedor=self.vendedor, cliente=self.cliente, producto=producto, cantidad=cantidad)
+
+    def cambiar_precio(self, producto, precio):
+        producto.precio = precio
+        producto.save()
+
+    def test_editar_no_cambia_el_precio(self):
+        venta = self.vender(self.mouse, 2)
+        self.assertEqual((venta.precio_unitario, venta.total_venta), (1000, 2000))
+        self.cambiar_precio(self.mouse, 1500)
+
+        self.client.force_login(self.vendedor)
+        self.client.post(reverse('ventas:editar_venta', args=[venta.pk]), {
+            'cliente': self.cliente.pk, 'producto': self.mouse.pk, 'cantidad': 3,
+        })
+        venta.refresh_from_db()
+        self.assertEqual((venta.precio_unitario, venta.total_venta), (1000, 3000))
+
+    def test_guardar_no_lee_el_producto(self):
+        venta = Venta.objects.get(pk=self.vender(self.mouse, 2).pk)
+        venta.cantidad = 4
+        with CaptureQueriesContext(connection) as ctx:
+            venta.save()
+        self.assertFalse([q for q in ctx.captured_queries if 'app_shop_producto' in q['sql']])
+        self.assertEqual(venta.total_venta, 4000)
+
+    def test_cambiar_producto_usa_su_precio_a_la_fecha(self):
+        venta = self.vender(self.mouse, 2)
+        self.cambiar_precio(self.teclado, 800)
+        venta = Venta.objects.get(pk=venta.pk)
+        venta.producto = self.teclado
+        venta.save()
+        # El teclado costaba 500 cuando se hizo la venta
+        self.assertEqual((venta.precio_unitario, venta.total_venta), (500, 1000))
+
+        # Y editar la misma instancia otra vez sigue sabiendo cuál es su producto
+        venta.producto = self.mouse
+        venta.save()
+        self.assertEqual(venta.precio_unitario, 1000)
+
+    def test_venta_anterior_sin_precio_conserva_su_total(self):
+        venta = self.vender(self.mouse, 2)
+        Venta.objects.filter(pk=venta.pk).update(precio_unitario=None, total_venta=1800)
+        self.cambiar_precio(self.mouse, 1500)
+        venta = Venta.objects.get(pk=venta.pk)
+        venta.save()
+        self.assertEqual((venta.precio_unitario, venta.total_venta), (900, 1800))
+
+    def test_comando_reconstruye_precios(self):
+        self.cambiar_precio(self.mouse, Decimal('999.99'))
+        exacta = self.vender(self.mouse, 3)
+        antigua = self.vender(self.mouse, 2)
+        sin_total = self.vender(self.teclado, 1)
+        con_precio = self.vender(self.teclado, 4)
+        Venta.objects.filter(pk__in=[exacta.pk, antigua.pk, sin_total.pk]).update(precio_unitario=None)
+        # Total de un precio anterior al historial, y una venta sin total
+        Venta.objects.filter(pk=antigua.pk).update(total_venta=1700)
+        Venta.objects.filter(pk=sin_total.pk).update(total_venta=None)
+        Venta.objects.filter(pk=con_precio.pk).update(precio_unitario=1)
+
+        salida = StringIO()
+        call_command('reconstruir_precios_ventas', chunk_size=2, stdout=salida)
+        self.assertIn('Precio unitario fijado en 3 ventas', salida.getvalue())
+        precios = dict(Venta.objects.values_list('pk', 'precio_unitario'))
+        self.assertEqual(precios[exacta.pk], Decimal('999.99'))
+        self.assertEqual(precios[antigua.pk], 850)
+        self.assertEqual(precios[sin_total.pk], 500)
+        self.assertEqual(precios[con_precio.pk], 1)
+        # Los totales no cambian
+        self.assertEqual(Venta.objects.get(pk=antigua.pk).total_venta, 1700)
+
+        call_command('reconstruir_precios_ventas', todas=True, stdout=StringIO())
+        self.assertEqual(Venta.objects.get(pk=con_precio.pk).precio_unitario, 500)
+
+
+class AutocompletarVentaTestCase(TestCase):
+    """VentaForm no serializa las tablas completas de clientes y productos"""
+
+    def setUp(self):
+        indice.invalidar()
+        self.vendedor = User.objects.create_user(username='vendedor', password='testpass123')
+        self.client.force_login(self.vendedor)
+        for i in range(30):
+            Cliente.objects.create(rut=f'{10000000 + i}-{i % 10}', nombre=f'Cliente{i}', apellido='Soto')
+            Producto.objects.create(nombre=f'Producto {i}', precio=100, descripcion='')
+        self.ana = Cliente.objects.create(rut='99999999-9', nombre='Ana María', apellido='Pérez')
+        self.mouse = Producto.objects.create(nombre='Mouse Inalámbrico', precio=1000, descripcion='')
+        self.venta = Venta.objects.create(vendedor=self.vendedor, cliente=self.ana, producto=self.mouse)
+
+    def test_widget_solo_renderiza_la_opcion_elegida(self):
+        html = str(VentaForm(instance=self.venta))
+        self.assertEqual(html.count('<option'), 4)  # vacía + elegida, en cada select
+        self.assertIn('Ana María Pérez', html)
+        self.assertIn(f'data-autocompletar="{reverse("ventas:autocompletar_clientes")}"', html)
+
+        html = str(VentaForm())
+        self.assertEqual(html.count('<option'), 2)
+
+    def test_validacion_en_el_servidor(self):
+        form = VentaForm(data={'cliente': 123456, 'producto': self.mouse.id, 'cantidad': 1})
+        self.assertFalse(form.is_valid())
+        self.assertIn('cliente', form.errors)
+        form = VentaForm(data={'cliente': self.ana.id, 'producto': self.mouse.id, 'cantidad': 2})
+        self.assertTrue(form.is_valid())
+
+    def test_autocompletar_clientes_por_prefijo(self):
+        url = reverse('ventas:autocompletar_clientes')
+        datos = self.client.get(url, {'q': 'ana pér'}).json()
+        self.assertEqual(datos['resultados'], [{'id': self.ana.id, 'texto': 'Ana María Pérez'}])
+        self.assertFalse(datos['hay_mas'])
+
+        datos = self.client.get(url, {'q': '9999'}).json()
+        self.assertEqual([r['id'] for r in datos['resultados']], [self.ana.id])
+
+        datos = self.client.get(url, {'q': 'soto', 'limite': 10}).json()
+        self.assertEqual(len(datos['resultados']), 10)
+        self.assertTrue(datos['hay_mas'])
+
+        # 'ría' no es prefijo de ningún campo
+        self.assertEqual(self.client.get(url, {'q': 'ría'}).json()['resultados'], [])
+
+    def test_autocompletar_productos_usa_el_indice(self):
+        url = reverse('inventario:autocompletar_productos')
+        datos = self.client.get(url, {'q': 'inalam'}).json()
+        self.assertEqual(datos['resultados'], [{'id': self.mouse.id, 'texto': 'Mouse Inalámbrico'}])
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        response = self.client.get(reverse('ventas:autocompletar_clientes'), {'q': 'ana'})
+        self.assertEqual(response.status_code, 302)
+
+class GenerarDatosTestCase(TestCase):
+    """Tests del generador de datos sintéticos"""
+    
+    def generar(self, **opciones):
+        salida = StringIO()
+        call_command(
+            'generar_datos', ventas=600, clientes=40, productos=30, vendedores=3, marcas=4,
+            proveedores=2, categorias=3, dias=90, chunk_size=250, batch_size=100,
+            stdout=salida, **opciones
+        )
+        return salida.getvalue()
+    
+    def test_genera_con_distribuciones(self):
+        salida = self.generar()
+        self.assertIn('filas/s', salida)
+        
+        ventas = Venta.objects.filter(producto__nombre__startswith='ZZ_GEN_')
+        self.assertEqual(ventas.count(), 600)
+        self.assertEqual(Producto.objects.filter(nombre__startswith='ZZ_GEN_').count(), 30)
+        self.assertEqual(Cliente.objects.filter(nombre__startswith='ZZ_GEN_').count(), 40)
+        
+        # Popularidad Zipf: el producto más vendido supera varias veces a la mediana
+        por_producto = sorted(
+            (v['n'] for v in ventas.values('producto').annotate(n=Count('id'))), reverse=True
+        )
+        self.assertGreater(por_producto[0], 4 * por_producto[len(por_producto) // 2])
+        
+        # Fechas dentro del período y totales consistentes con el precio
+        ahora = timezone.now()
+        self.assertFalse(ventas.filter(fecha__gt=ahora + timedelta(days=1)).exists())
+        self.assertFalse(ventas.filter(fecha__lt=ahora - timedelta(days=91)).exists())
+        venta = ventas.select_related('producto').first()
+        self.assertEqual(venta.total_venta, venta.producto.precio * venta.cantidad)
+        
+        # Resúmenes y acumulados reconstruidos
+        self.assertEqual(sum(ClienteResumen.objects.values_list('compras_count', flat=True)), 600)
+        self.assertEqual(list(diferencias_rollups()), [])
+    
+    def test_misma_semilla_mismos_datos(self):
+        self.generar(semilla=7)
+        primera = sorted(Venta.objects.values_list('producto__nombre', 'cliente__rut', 'cantidad', 'fecha'))
+        self.generar(eliminar=True)
+        self.generar(semilla=7)
+        segunda = sorted(Venta.objects.values_list('producto__nombre', 'cliente__rut', 'cantidad', 'fecha'))
+        self.assertEqual(primera, segunda)
+    
+    def test_eliminar_por_prefijo(self):
+        producto = Producto.objects.create(nombre='Real', precio=100, descripcion='desc')
+        cliente = Cliente.objects.create(rut='1-9', nombre='Cliente', apellido='Real')
+        vendedor = User.objects.create_user(username='vendedor', password='x')
+        Venta.objects.create(vendedor=vendedor, cliente=cliente, producto=producto)
+        self.generar()
+        generado = Producto.objects.filter(nombre__startswith='ZZ_GEN_').first()
+        stock.ajustar(generado.pk, 10)
+        stock.ajustar(producto.pk, 10)
+        
+        with self.assertRaises(CommandError):
+            self.generar()
+        
+        version = ranking._version()
+        self.generar(eliminar=True)
+        # Los rankings de los demás procesos se reconstruyen sin las ventas eliminadas
+        self.assertGreater(ranking._version(), version)
+        self.assertEqual(Venta.objects.count(), 1)
+        self.assertEqual(Producto.objects.count(), 1)
+        for modelo in (PrecioProducto, StockProducto, MovimientoStock):
+            self.assertEqual(set(modelo.objects.values_list('producto_id', flat=True)), {producto.pk})
+        self.assertEqual(Cliente.objects.count(), 1)
+        self.assertFalse(User.objects.filter(username__startswith='ZZ_GEN_').exists())
+        self.assertEqual(ClienteResumen.objects.count(), 1)
+        self.assertEqual(list(diferencias_rollups()), [])
+
+    def test_borrar_ids_sin_senales(self):
+        marcas = [Marca.objects.create(nombre=f'Marca {i}') for i in range(3)]
+        receptor = mock.Mock()
+        post_delete.connect(receptor, sender=Marca, weak=False)
+        self.addCleanup(post_delete.disconnect, receptor, sender=Marca)
+        with CaptureQueriesContext(connection) as consultas:
+            generar_datos.borrar_ids(Marca, [marcas[0].pk, marcas[2].pk])
+        self.assertEqual(len(consultas), 1)
+        receptor.assert_not_called()
+        self.assertEqual(list(Marca.objects.values_list('nombre', flat=True)), ['Marca 1'])
+
+
+class PresupuestoConsultasVentasTestCase(PresupuestoConsultasMixin, TestCase):
+    """Cada vista de ventas declara su presupuesto de consultas y lo respeta"""
+
+    espacio = 'ventas'
+
+    def setUp(self):
+        self.vendedor = User.objects.create_user(username='vendedor', password='testpass123')
+        self.client.force_login(self.vendedor)
+        self.productos = [Producto.objects.create(nombre=f'Producto {i}', precio=100 * (i + 1), descripcion='')
+                          for i in range(3)]
+        self.clientes = [
+            Cliente.objects.create(rut=f'{10000000 + i}-{i}', nombre=f'Cliente {i}', apellido='Soto')
+            for i in range(8)
+        ]
+        # Más de una página de cada listado: un N+1 se nota como consultas de más
+        self.ventas = [
+            Venta.objects.create(vendedor=self.vendedor, cliente=self.clientes[i % 8], producto=self.productos[i % 3])
+            for i in range(12)
+        ]
+        for producto in self.productos:
+            DetalleVenta.objects.create(venta=self.ventas[0], producto=producto, cantidad=1, precio_unitario=producto.precio)
+
+    def pk(self, nombre):
+        return (self.clientes if nombre.endswith('cliente') else self.ventas)[0].pk
+
+    def test_todas_las_rutas_declaran_presupuesto(self):
+        self.assertRutasConPresupuesto()
+
+    def test_lecturas(self):
+        for nombre, (_, usa_pk) in self.rutas().items():
+            self.medir('GET', nombre, self.pk(nombre) if usa_pk else None)
+            if nombre.startswith(('lista_', 'autocompletar_')):
+                self.medir('GET', nombre, data={'buscar': 'o', 'q': 'c', 'page': 2})
+
+    def test_escrituras(self):
+        venta = {'cliente': self.clientes[0].pk, 'producto': self.productos[0].pk, 'cantidad': 2}
+        self.medir('POST', 'crear_venta', data=venta)
+        self.medir('POST', 'editar_venta', self.ventas[0].pk, data={**venta, 'cantidad': 3})
+        self.medir('POST', 'eliminar_venta', self.ventas[1].pk)
+
+        cliente = {'rut': '20000000-2', 'nombre': 'Nuevo', 'apellido': 'Cliente'}
+        self.medir('POST', 'crear_cliente', data=cliente)
+        self.medir('POST', 'editar_cliente', self.clientes[0].pk, data={**cliente, 'rut': '20000001-1'})
+        # En cascada: sus compras
+        self.medir('POST', 'eliminar_cliente', self.clientes[2].pk)
+
+        self.client.logout()
+        self.medir('POST', 'registro', data={
+            'username': 'nuevo', 'password1': 'clave.segura.123', 'password2': 'clave.segura.123',
+        })
+        self.assertEscriturasMedidas()
+
+    def test_ventas_con_stock(self):
+        # Productos con stock, y clientes y productos sin resumen ni acumulados: el peor caso
+        productos = [Producto.objects.create(nombre=f'Con stock {i}', precio=500, descripcion='') for i in range(3)]
+        for producto in productos:
+            stock.ajustar(producto.pk, 10)
+        cliente = Cliente.objects.create(rut='30000000-3', nombre='Nuevo', apellido='Soto')
+        venta = {'cliente': cliente.pk, 'producto': productos[0].pk, 'cantidad': 2}
+        self.assertEqual(self.medir('POST', 'crear_venta', data=venta).status_code, 302)
+        # Sin stock suficiente: el formulario vuelve con el error
+        self.assertEqual(self.medir('POST', 'crear_venta', data={**venta, 'cantidad': 50}).status_code, 200)
 
-# Create your tests here.
+        # Cambiar cliente y producto recalcula ambos clientes, ambos acumulados y ambos stocks
+        pk = Venta.objects.latest('id').pk
+        otro = Cliente.objects.create(rut='30000001-1', nombre='Otro', apellido='Soto')
+        editada = {**venta, 'cliente': otro.pk, 'producto': productos[1].pk, 'cantidad': 3}
+        self.assertEqual(self.medir('POST', 'editar_venta', pk, data=editada).status_code, 302)
+        editada = {**venta, 'producto': productos[2].pk, 'cantidad': 50}
+        self.assertEqual(self.medir('POST', 'editar_venta', pk, data=editada).status_code, 200)
@@ -9,10 +9,13 @@ urlpatterns = [
     path('', views.lista_ventas, name='lista_ventas'),
     path('crear/', views.crear_venta, name='crear_venta'),
     path('editar/<int:pk>/', views.editar_venta, name='editar_venta'),
+    path('detalle/<int:pk>/', views.detalle_venta, name='detalle_venta'),
     path('eliminar/<int:pk>/', views.eliminar_venta, name='eliminar_venta'),
 
     path('clientes/', views.lista_clientes, name='lista_clientes'),
     path('clientes/crear/', views.crear_cliente, name='crear_cliente'),
     path('clientes/editar/<int:pk>/', views.editar_cliente, name='editar_cliente'),
+    path('clientes/detalle/<int:pk>/', views.detalle_cliente, name='detalle_cliente'),
     path('clientes/eliminar/<int:pk>/', views.eliminar_cliente, name='eliminar_cliente'),
+    path('clientes/autocompletar/', views.autocompletar_clientes, name='autocompletar_clientes'),
 ]
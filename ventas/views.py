@@ -2,12 +2,15 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from ventas.models import Venta, Cliente
 from inventario.models import Producto
+from inventario import autocompletar
+from pc_shop.instrumentacion import presupuesto_consultas
 from ventas.forms import VentaForm, ClienteForm
 from django.contrib.auth import login
 from django.core.paginator import Paginator
 from django.db.models import Q
 
 
+@presupuesto_consultas({'get': 2, 'post': 11})
 def registro(request):
     if request.method == 'POST':
         from app_shop.forms import CustomUserCreationForm
@@ -22,9 +25,10 @@ def registro(request):
     return render(request, 'registration/registro.html', {'form': form})
 
 
+@presupuesto_consultas(4)
 @login_required
 def lista_ventas(request):
-    ventas_list = Venta.objects.all().order_by('-fecha')
+    ventas_list = Venta.objects.select_related('cliente', 'producto', 'vendedor').order_by('-fecha', '-id')
     busqueda = request.GET.get('buscar')
     if busqueda:
         ventas_list = ventas_list.filter(
@@ -37,42 +41,42 @@ def lista_ventas(request):
     return render(request, 'ventas/lista_ventas.html', {'ventas': page_obj})
 
 
+@presupuesto_consultas({'get': 2, 'post': 19})
 @login_required
 def crear_venta(request):
     if request.method == 'POST':
         form = VentaForm(request.POST)
-        if form.is_valid():
-            venta = form.save(commit=False)
-            venta.vendedor = request.user
-            venta.save()
+        if form.is_valid() and form.guardar(vendedor=request.user):
             return redirect('ventas:lista_ventas')
     else:
         form = VentaForm()
     return render(request, 'ventas/crear_venta.html', {'form': form})
 
 
+@presupuesto_consultas({'get': 5, 'post': 36})
 @login_required
 def editar_venta(request, pk):
     venta = get_object_or_404(Venta, pk=pk)
     if request.method == 'POST':
         form = VentaForm(request.POST, instance=venta)
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and form.guardar():
             return redirect('ventas:lista_ventas')
     else:
         form = VentaForm(instance=venta)
     return render(request, 'ventas/editar_venta.html', {'form': form, 'venta': venta})
 
 
+@presupuesto_consultas({'get': 3, 'post': 15})
 @login_required
 def eliminar_venta(request, pk):
-    venta = get_object_or_404(Venta, pk=pk)
+    venta = get_object_or_404(Venta.objects.select_related('cliente'), pk=pk)
     if request.method == 'POST':
         venta.delete()
         return redirect('ventas:lista_ventas')
     return render(request, 'ventas/eliminar_venta.html', {'venta': venta})
 
 
+@presupuesto_consultas(4)
 @login_required
 def lista_clientes(request):
     clientes_list = Cliente.objects.all().order_by('-id')
@@ -89,6 +93,7 @@ def lista_clientes(request):
     return render(request, 'clientes/lista_clientes.html', {'clientes': page_obj})
 
 
+@presupuesto_consultas({'get': 2, 'post': 4})
 @login_required
 def crear_cliente(request):
     if request.method == 'POST':
@@ -101,6 +106,7 @@ def crear_cliente(request):
     return render(request, 'clientes/crear_cliente.html', {'form': form})
 
 
+@presupuesto_consultas({'get': 3, 'post': 5})
 @login_required
 def editar_cliente(request, pk):
     cliente = get_object_or_404(Cliente, pk=pk)
@@ -114,6 +120,7 @@ def editar_cliente(request, pk):
     return render(request, 'clientes/editar_cliente.html', {'form': form})
 
 
+@presupuesto_consultas({'get': 3, 'post': 18})
 @login_required
 def eliminar_cliente(request, pk):
     cliente = get_object_or_404(Cliente, pk=pk)
@@ -123,21 +130,37 @@ def eliminar_cliente(request, pk):
     return render(request, 'clientes/eliminar_cliente.html', {'cliente': cliente})
 
 
+@presupuesto_consultas(3)
+@login_required
+def autocompletar_clientes(request):
+    n = autocompletar.limite(request)
+    clientes = Cliente.objects.order_by('apellido', 'nombre', 'id')
+    texto = request.GET.get('q', '').strip()
+    if texto:
+        clientes = clientes.filter(autocompletar.filtro_prefijo(texto, ['rut', 'nombre', 'apellido']))
+    return autocompletar.respuesta(clientes[:n + 1], n)
+
+
 @login_required
 def detalle_producto(request, pk):
-    producto = get_object_or_404(Producto, pk=pk)
+    producto = get_object_or_404(Producto.objects.select_related('marca', 'proveedor', 'categoria'), pk=pk)
     return render(request, 'productos/detalle_producto.html', {'producto': producto})
 
 
+@presupuesto_consultas(3)
 @login_required
 def detalle_cliente(request, pk):
     cliente = get_object_or_404(Cliente, pk=pk)
     return render(request, 'clientes/detalle_cliente.html', {'cliente': cliente})
 
 
+@presupuesto_consultas(5)
 @login_required
 def detalle_venta(request, pk):
-    venta = get_object_or_404(Venta, pk=pk)
+    venta = get_object_or_404(
+        Venta.objects.select_related('cliente', 'vendedor').prefetch_related('detalles__producto'),
+        pk=pk,
+    )
     return render(request, 'ventas/detalle_venta.html', {'venta': venta})
 from django.shortcuts import render
 